@@ -1,15 +1,37 @@
-from flask import Flask, request, jsonify
+import time
+
+# Measured from the first import so the logs show how long start-up takes
+_process_start = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from intents import determine_intent
-from recommender import (
-    search_recipes_by_ingredients,
-    filter_by_diet,
-    format_recipe_response,
-    get_recipe_by_id,
-    format_recipe_details,
-    get_recipe_count
+from chat_service import (
+    SESSION_HEADER,
+    SESSION_COOKIE,
+    API_INFO,
+    MAX_BATCH_SIZE,
+    build_warmup,
+    handle_chat,
+    handle_chat_batch,
+    health_status,
+    parse_batch,
+    register_gauges,
+    resolve_session_id
 )
+from metrics import CONTENT_TYPE, REGISTRY, observe_request, stage
+from profiling import (
+    PROFILE_HEADER,
+    PROFILE_QUERY_PARAM,
+    REQUEST_ID_HEADER,
+    is_flag_set,
+    profile_call,
+    request_id,
+    should_profile
+)
+from session_store import create_session_backend
 import logging
+import os
 
 app = Flask(__name__)
 
@@ -18,7 +40,8 @@ CORS(app, resources={
     r"/*": {
         "origins": "*",  # For development - restrict in production
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "X-Session-Id", PROFILE_HEADER, REQUEST_ID_HEADER],
+        "expose_headers": ["X-Session-Id", REQUEST_ID_HEADER]
     }
 })
 
@@ -29,14 +52,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Log recipe count at startup
-recipe_count = get_recipe_count()
-logger.info(f"Database contains {recipe_count} recipes")
+# Per-user diet state and last search result ids. Set CHEFBOT_SESSION_BACKEND=sqlite
+# to share sessions between several worker processes
+session_store = create_session_backend()
+register_gauges(session_store)
+
+# Catalog load and index/cache building happen in the background, so the
+# server accepts connections right away; /ready reports when they're done
+warmup = build_warmup(started_at=_process_start)
+
+# Set CHEFBOT_WARMUP=0 to skip it (everything is then built on first use)
+if os.environ.get('CHEFBOT_WARMUP', '1') != '0':
+    warmup.start()
+else:
+    warmup.skip()
+
+
+def get_session_id() -> str:
+    """Session id sent by the client, or a new one if it sent none (or an invalid one)."""
+    return resolve_session_id(request.headers.get(SESSION_HEADER), request.cookies.get(SESSION_COOKIE))
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """Count chat requests and record their latency for /metrics."""
+    if request.path in ('/chat', '/chat/batch'):
+        elapsed = time.perf_counter() - g.request_start
+        observe_request(request.path, g.get('intent', 'none'), response.status_code, elapsed)
+    if 'profile_id' in g:
+        response.headers[REQUEST_ID_HEADER] = g.profile_id
+    return response
+
+
+def with_session(response, session_id: str):
+    """Return the session id to the client in the body, a header and a cookie."""
+    response.headers[SESSION_HEADER] = session_id
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
 
-# Store last search results per session (simple in-memory storage)
-# In production, you'd use Redis or a proper session store
-last_search_results = {}
-user_sessions = {}  # Store user preferences (diet, etc.)
+
+def run_profiled(func, *args):
+    """
+    Call func(*args), under cProfile if the request asks for it (and may) or is sampled; see profiling.py.
+
+    Wraps the same work asgi_app.py profiles (the session/search/reply
+    part, not request parsing or intent detection), so profiles from both
+    servers can be compared.
+    """
+    requested = (
+        is_flag_set(request.headers.get(PROFILE_HEADER))
+        or is_flag_set(request.args.get(PROFILE_QUERY_PARAM))
+    )
+    if not should_profile(requested):
+        return func(*args)
+
+    g.profile_id = request_id(request.headers.get(REQUEST_ID_HEADER))
+    return profile_call(g.profile_id, func, *args)
 
 
 @app.route('/chat', methods=['POST'])
@@ -63,155 +139,22 @@ def chat():
             }), 400
         
         # Process the message through intent detection
-        intent_data = determine_intent(user_message)
+        with stage("determine_intent"):
+            intent_data = determine_intent(user_message)
+        g.intent = intent_data['intent']
         logger.info(f"Detected intent: {intent_data['intent']}")
         
-        # Generate a simple session ID (in production, use proper session management)
-        # For now, we'll use a simple approach - store globally (works for single user testing)
-        session_id = "default"
-        
-        # Initialize session if it doesn't exist
-        if session_id not in user_sessions:
-            user_sessions[session_id] = {
-                'diet_restrictions': [],
-                'last_intent': None
-            }
-        
-        response_text = ""
-        
-        # Handle different intents
-        if intent_data['intent'] == 'greeting':
-            # Show current diet restrictions if any
-            current_diet = user_sessions[session_id]['diet_restrictions']
-            diet_info = f"\n🔖 Active diet filter: {', '.join(current_diet)}" if current_diet else ""
-            
-            response_text = (
-                "Hello! I'm Chefbot 👨‍🍳\n\n"
-                "Tell me what you'd like to cook:\n"
-                "• 'I have [ingredients]' - Find recipes with your ingredients\n"
-                "• 'I want a [diet] meal' - Set diet for next search (one-time use)\n"
-                "• 'I want a [diet] with [ingredients]' - Search with diet filter\n"
-                "• 'remove [diet]' or 'clear diet' - Remove diet restrictions\n\n"
-                f"Example: 'I want a vegan meal' then 'I have rice and beans'{diet_info}\n\n"
-                f"💡 Diet filters auto-clear after each search!"
-            )
-        
-        elif intent_data['intent'] == 'ingredient_search':
-            ingredients = intent_data['ingredients']
-            diet_restrictions = intent_data['diet_restrictions']
-            
-            # If no diet restrictions in current message, use stored ones
-            if not diet_restrictions and user_sessions[session_id]['diet_restrictions']:
-                diet_restrictions = user_sessions[session_id]['diet_restrictions']
-                logger.info(f"Using stored diet restrictions: {diet_restrictions}")
-            
-            # Store diet restrictions if provided
-            if diet_restrictions:
-                user_sessions[session_id]['diet_restrictions'] = diet_restrictions
-            
-            if not ingredients:
-                response_text = "Please tell me what ingredients you have. For example: 'I have chicken, rice, and tomatoes'"
-            else:
-                logger.info(f"Searching recipes for ingredients: {ingredients}, diet: {diet_restrictions}")
-                
-                # Search for more recipes if diet filter is applied (many will be filtered out)
-                search_limit = 20 if diet_restrictions else 10
-                
-                # Search for recipes (no ALL_RECIPES needed - it queries the DB directly)
-                results = search_recipes_by_ingredients(ingredients, max_results=search_limit)
-                logger.info(f"Found {len(results)} recipes before filtering")
-                
-                # Filter by diet if specified
-                if diet_restrictions:
-                    logger.info(f"Applying diet filter: {diet_restrictions}")
-                    results = filter_by_diet(results, diet_restrictions)
-                    logger.info(f"Recipes after diet filter: {len(results)}")
-                
-                # Store results for later detail requests
-                last_search_results[session_id] = results
-                
-                response_text = format_recipe_response(results, ingredients)
-                
-                # Clear diet restrictions after showing recipes (one-time use)
-                if user_sessions[session_id]['diet_restrictions']:
-                    user_sessions[session_id]['diet_restrictions'] = []
-                    logger.info("Auto-cleared diet restrictions after showing results")
-                
-                # Add note if using stored diet preferences
-                if diet_restrictions and not intent_data['diet_restrictions']:
-                    response_text += f"\n\n🔖 Filtered by: {', '.join(diet_restrictions)} (from your previous request)"
-                
-                # Clear diet restrictions after showing recipes (one-time use)
-                if user_sessions[session_id]['diet_restrictions']:
-                    user_sessions[session_id]['diet_restrictions'] = []
-                    logger.info("Auto-cleared diet restrictions after showing results")
-        
-        elif intent_data['intent'] == 'meal_plan':
-            response_text = "Meal planning feature coming soon! For now, tell me what ingredients you have and I'll find recipes for you."
-        
-        elif intent_data['intent'] == 'diet_restrictions':
-            diet = intent_data['diet_restrictions']
-            ingredients = intent_data['ingredients']
-            
-            # Store diet restrictions in session
-            if diet:
-                user_sessions[session_id]['diet_restrictions'] = diet
-                logger.info(f"Stored diet restrictions in session: {diet}")
-            
-            # If they provided ingredients with diet, search now
-            if ingredients:
-                logger.info(f"Searching recipes for ingredients: {ingredients}, diet: {diet}")
-                
-                # Search for more recipes when diet filter is applied
-                search_limit = 20 if diet else 10
-                results = search_recipes_by_ingredients(ingredients, max_results=search_limit)
-                logger.info(f"Found {len(results)} recipes before filtering")
-                
-                if diet:
-                    logger.info(f"Applying diet filter: {diet}")
-                    results = filter_by_diet(results, diet)
-                    logger.info(f"Recipes after diet filter: {len(results)}")
-                
-                # Store results for later detail requests
-                last_search_results[session_id] = results
-                
-                response_text = format_recipe_response(results, ingredients)
-            else:
-                # No ingredients provided, ask for them
-                response_text = f"Got it! I'll look for {', '.join(diet)} recipes. What ingredients do you have?"
-        
-        elif intent_data['intent'] == 'recipe_detail':
-            recipe_number = intent_data.get('recipe_number')
-            
-            # Check if we have stored results
-            if session_id not in last_search_results or not last_search_results[session_id]:
-                response_text = "Please search for recipes first! Try: 'I have chicken and rice'"
-            elif recipe_number < 1 or recipe_number > len(last_search_results[session_id]):
-                response_text = f"Please enter a number between 1 and {len(last_search_results[session_id])}"
-            else:
-                # Get the recipe (subtract 1 for 0-indexed array)
-                recipe = last_search_results[session_id][recipe_number - 1]
-                response_text = format_recipe_details(recipe)
-        
-        elif intent_data['intent'] == 'clear_diet':
-            # Clear stored diet restrictions
-            cleared_diets = user_sessions[session_id]['diet_restrictions'].copy()
-            user_sessions[session_id]['diet_restrictions'] = []
-            logger.info("Cleared diet restrictions from session")
-            
-            if cleared_diets:
-                response_text = f"✅ Removed {', '.join(cleared_diets)} filter. You can now search for any recipes!"
-            else:
-                response_text = "✅ No diet restrictions were active. You can search for any recipes!"
-        
-        else:
-            response_text = "I can help you find recipes! Tell me what ingredients you have, like 'I have chicken and rice'"
+        # Load this user's session once, reply, and save the session back
+        session_id = get_session_id()
+        response_text = run_profiled(handle_chat, session_store, session_id, intent_data)
 
-        return jsonify({
+        response = jsonify({
             "response": response_text, 
             "intent_data": intent_data,
+            "session_id": session_id,
             "error": False
-        }), 200
+        })
+        return with_session(response, session_id), 200
         
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}", exc_info=True)
@@ -222,25 +165,64 @@ def chat():
         }), 500
 
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer many messages at once: {"messages": [{"session_id": ..., "message": ...}, ...]}"""
+    try:
+        items = parse_batch(request.get_json())
+
+        if items is None:
+            logger.warning("Invalid batch received")
+            return jsonify({
+                "response": 'Send {"messages": [{"session_id": ..., "message": ...}, ...]}',
+                "error": True
+            }), 400
+
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                "response": f"Send at most {MAX_BATCH_SIZE} messages per batch.",
+                "error": True
+            }), 413
+
+        g.intent = 'batch'
+        results = run_profiled(handle_chat_batch, session_store, items)
+        return jsonify({"results": results, "error": False}), 200
+
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}", exc_info=True)
+        return jsonify({
+            "response": "Sorry, something went wrong processing your messages!",
+            "error": True,
+            "error_details": str(e)
+        }), 500
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "service": "chefbot-backend"
-    }), 200
+    return jsonify(health_status(session_store)), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request counts, per-stage latency histograms and cache/pool/session gauges (Prometheus format)"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness check: 200 once warm-up finished (or was skipped or failed), 503 with its progress until then"""
+    status = warmup.status()
+    return jsonify(status), 200 if status["ready"] else 503
 
 
 @app.route('/', methods=['GET'])
 def home():
     """Root endpoint"""
-    return jsonify({
-        "message": "Chefbot Backend API",
-        "endpoints": {
-            "/chat": "POST - Send a message to the chatbot",
-            "/health": "GET - Health check"
-        }
-    }), 200
+    return jsonify(API_INFO), 200
+
+
+logger.info(f"App imported in {(time.perf_counter() - _process_start) * 1000:.1f} ms")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,379 @@
+"""
+ASGI version of the chat backend.
+
+Serves the same /chat, /chat/batch, /health, /metrics, /ready and /
+endpoints as app.py, with the same JSON bodies, session header/cookie and
+CORS headers. Intent detection runs on the event loop; everything that
+touches SQLite (sessions, search, recipe loading) runs in a bounded thread
+pool, so one process can hold many open conversations while only
+CHEFBOT_ASGI_THREADS of them use a database connection at a time.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi_app:app --port 8000
+"""
+import time
+
+# Measured from the first import so the logs show how long start-up takes
+_process_start = time.perf_counter()
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from typing import Dict, List, Optional, Tuple
+
+from intents import determine_intent
+from chat_service import (
+    SESSION_HEADER,
+    SESSION_COOKIE,
+    API_INFO,
+    MAX_BATCH_SIZE,
+    build_warmup,
+    handle_chat,
+    handle_chat_batch,
+    health_status,
+    parse_batch,
+    register_gauges,
+    resolve_session_id
+)
+from metrics import CONTENT_TYPE, REGISTRY, observe_request, stage
+from profiling import (
+    PROFILE_HEADER,
+    PROFILE_QUERY_PARAM,
+    REQUEST_ID_HEADER,
+    is_flag_set,
+    profile_call,
+    request_id,
+    should_profile
+)
+from recommender import DB_POOL_SIZE
+from session_store import create_session_backend
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Threads doing database work; more than the connection pool size would only wait on it
+ASGI_THREADS = int(os.environ.get('CHEFBOT_ASGI_THREADS', str(DB_POOL_SIZE)))
+
+# Chat requests (single messages or batches) handled at once; further ones
+# wait on the event loop instead of piling up work (and memory) in the
+# thread pool's queue
+ASGI_MAX_PENDING = int(os.environ.get('CHEFBOT_ASGI_MAX_PENDING', str(ASGI_THREADS * 4)))
+
+# Largest request body accepted (/chat and /chat/batch)
+MAX_BODY_BYTES = 64 * 1024
+MAX_BATCH_BODY_BYTES = 16 * 1024 * 1024
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),  # For development - restrict in production
+    (b"access-control-expose-headers", f"{SESSION_HEADER}, {REQUEST_ID_HEADER}".encode()),
+]
+CORS_PREFLIGHT_HEADERS = CORS_HEADERS + [
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", f"Content-Type, {SESSION_HEADER}, {PROFILE_HEADER}, {REQUEST_ID_HEADER}".encode()),
+]
+
+session_store = create_session_backend()
+register_gauges(session_store)
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="chefbot-db")
+warmup = build_warmup(started_at=_process_start)
+_pending: Optional[asyncio.Semaphore] = None
+_warmup_started = False
+
+
+def _start_warmup() -> None:
+    """Start (or skip) the warm-up; only the first call does anything."""
+    global _warmup_started
+    if _warmup_started:
+        return
+    _warmup_started = True
+    # Set CHEFBOT_WARMUP=0 to skip it (everything is then built on first use)
+    if os.environ.get('CHEFBOT_WARMUP', '1') != '0':
+        warmup.start()
+    else:
+        warmup.skip()
+
+
+def _pending_limit() -> asyncio.Semaphore:
+    """Semaphore bounding the chat requests handed to the thread pool at once."""
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(ASGI_MAX_PENDING)
+    return _pending
+
+
+async def _send_json(send, status: int, body: Dict, headers: List[Tuple[bytes, bytes]] = ()) -> None:
+    payload = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            *CORS_HEADERS,
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _read_body(receive, limit: int = MAX_BODY_BYTES) -> Optional[bytes]:
+    """Request body, or None if it is larger than limit."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b""
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _request_session_id(scope) -> str:
+    """Session id from the X-Session-Id header or the session cookie."""
+    header_value = None
+    cookie_value = None
+    for name, value in scope["headers"]:
+        if name == SESSION_HEADER.lower().encode():
+            header_value = value.decode("latin-1")
+        elif name == b"cookie":
+            cookie = SimpleCookie()
+            cookie.load(value.decode("latin-1"))
+            if SESSION_COOKIE in cookie:
+                cookie_value = cookie[SESSION_COOKIE].value
+    return resolve_session_id(header_value, cookie_value)
+
+
+def _header(scope, name: str) -> Optional[str]:
+    name = name.lower().encode()
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _profile_id(scope) -> Optional[str]:
+    """Request id to profile this request under, or None to run it normally (see profiling.py)."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    requested = (
+        is_flag_set(_header(scope, PROFILE_HEADER))
+        or is_flag_set(query.get(PROFILE_QUERY_PARAM, [None])[0])
+    )
+    if not should_profile(requested):
+        return None
+    return request_id(_header(scope, REQUEST_ID_HEADER))
+
+
+async def _run_in_pool(scope, func, *args):
+    """
+    Run func in the database thread pool, under cProfile if the request is profiled.
+
+    The profile covers the work done in the pool (for /chat, everything
+    but intent detection, which runs on the event loop).
+
+    Returns:
+        (result, extra response headers)
+    """
+    loop = asyncio.get_running_loop()
+    profile_id = _profile_id(scope)
+    if profile_id is None:
+        return await loop.run_in_executor(executor, func, *args), []
+    result = await loop.run_in_executor(executor, profile_call, profile_id, func, *args)
+    return result, [(REQUEST_ID_HEADER.lower().encode(), profile_id.encode())]
+
+
+def _session_headers(session_id: str) -> List[Tuple[bytes, bytes]]:
+    """Return the session id to the client in a header and a cookie."""
+    return [
+        (SESSION_HEADER.lower().encode(), session_id.encode()),
+        (b"set-cookie", f"{SESSION_COOKIE}={session_id}; HttpOnly; Path=/; SameSite=Lax".encode()),
+    ]
+
+
+async def chat(scope, receive, send) -> None:
+    try:
+        body = await _read_body(receive)
+        if body is None:
+            await _send_json(send, 413, {"response": "Message too long.", "error": True})
+            return
+
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+
+        if not isinstance(data, dict):
+            logger.warning("No JSON data received")
+            await _send_json(send, 400, {
+                "response": "No message received. Please send a valid message.",
+                "error": True
+            })
+            return
+
+        user_message = data.get('message', '')
+        logger.info(f"Received message: '{user_message}'")
+
+        if not user_message:
+            logger.warning("Empty message received")
+            await _send_json(send, 400, {"response": "Please enter a message.", "error": True})
+            return
+
+        # Regex intent detection is cheap enough to run on the event loop
+        with stage("determine_intent"):
+            intent_data = determine_intent(user_message)
+        scope["chefbot.intent"] = intent_data['intent']
+        logger.info(f"Detected intent: {intent_data['intent']}")
+
+        session_id = _request_session_id(scope)
+        async with _pending_limit():
+            response_text, headers = await _run_in_pool(scope, handle_chat, session_store, session_id, intent_data)
+
+        await _send_json(send, 200, {
+            "response": response_text,
+            "intent_data": intent_data,
+            "session_id": session_id,
+            "error": False
+        }, _session_headers(session_id) + headers)
+
+    except Exception as e:
+        logger.error(f"Error processing message: {str(e)}", exc_info=True)
+        await _send_json(send, 500, {
+            "response": "Sorry, something went wrong processing your message!",
+            "error": True,
+            "error_details": str(e)
+        })
+
+
+async def chat_batch(scope, receive, send) -> None:
+    try:
+        body = await _read_body(receive, MAX_BATCH_BODY_BYTES)
+        if body is None:
+            await _send_json(send, 413, {"response": "Batch too large.", "error": True})
+            return
+
+        try:
+            items = parse_batch(json.loads(body)) if body else None
+        except ValueError:
+            items = None
+
+        if items is None:
+            logger.warning("Invalid batch received")
+            await _send_json(send, 400, {
+                "response": 'Send {"messages": [{"session_id": ..., "message": ...}, ...]}',
+                "error": True
+            })
+            return
+
+        if len(items) > MAX_BATCH_SIZE:
+            await _send_json(send, 413, {
+                "response": f"Send at most {MAX_BATCH_SIZE} messages per batch.",
+                "error": True
+            })
+            return
+
+        scope["chefbot.intent"] = "batch"
+        # Intent detection for the whole batch runs in the pool with the rest
+        async with _pending_limit():
+            results, headers = await _run_in_pool(scope, handle_chat_batch, session_store, items)
+        await _send_json(send, 200, {"results": results, "error": False}, headers)
+
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}", exc_info=True)
+        await _send_json(send, 500, {
+            "response": "Sorry, something went wrong processing your messages!",
+            "error": True,
+            "error_details": str(e)
+        })
+
+
+async def _observed(handler, scope, receive, send) -> None:
+    """Run a chat handler and record its status and latency for /metrics."""
+    start = time.perf_counter()
+    status = 500
+
+    async def send_and_record(message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_record)
+    finally:
+        observe_request(scope["path"], scope.get("chefbot.intent", "none"), status, time.perf_counter() - start)
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                _start_warmup()
+                logger.info(f"ASGI app started in {(time.perf_counter() - _process_start) * 1000:.1f} ms")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    # Servers without lifespan support start the warm-up on the first request
+    _start_warmup()
+
+    method = scope["method"]
+    path = scope["path"]
+
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_PREFLIGHT_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+    elif path == "/chat" and method == "POST":
+        await _observed(chat, scope, receive, send)
+    elif path == "/chat/batch" and method == "POST":
+        await _observed(chat_batch, scope, receive, send)
+    elif path == "/health" and method == "GET":
+        loop = asyncio.get_running_loop()
+        await _send_json(send, 200, await loop.run_in_executor(executor, health_status, session_store))
+    elif path == "/metrics" and method == "GET":
+        payload = REGISTRY.render().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", CONTENT_TYPE.encode()),
+                (b"content-length", str(len(payload)).encode()),
+                *CORS_HEADERS,
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
+    elif path == "/ready" and method == "GET":
+        status = warmup.status()
+        await _send_json(send, 200 if status["ready"] else 503, status)
+    elif path == "/" and method == "GET":
+        await _send_json(send, 200, API_INFO)
+    elif path in ("/chat", "/chat/batch", "/health", "/metrics", "/ready", "/"):
+        await _send_json(send, 405, {"error": True, "response": "Method not allowed"})
+    else:
+        await _send_json(send, 404, {"error": True, "response": "Not found"})
+
+
+logger.info(f"ASGI app imported in {(time.perf_counter() - _process_start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=8000)
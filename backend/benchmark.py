@@ -0,0 +1,319 @@
+"""
+Benchmark suite for the intent engine and the recommender.
+
+Times every call of each case and reports p50/p95/p99 latency, throughput
+and peak memory (tracemalloc, measured in a separate, shorter pass so it
+doesn't slow the timed one):
+
+    intent/*          determine_intent() on mixed and long messages
+    search/*          search_recipes_by_ingredients() (cache bypassed) with
+                      1-8 common or rare ingredients, with and without diets
+    filter_by_diet/*  the Python diet filter over full recipes
+    recipe/by_id      get_recipe_by_id()
+    format/*          format_recipe_response() and format_recipe_details()
+
+Queries are drawn from the database's own ingredient vocabulary with a
+fixed seed, so runs against the same database are comparable.
+
+Usage:
+    python benchmark.py                              # all cases, print a table
+    python benchmark.py --only search --quick        # a subset, fewer calls
+    python benchmark.py --json results.json          # also write JSON
+    python benchmark.py --baseline results.json      # compare; exit 1 on regressions
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import recommender
+from diets import DIET_RULES
+from intents import determine_intent
+from preprocessing import PREPARATION_WORDS, UNITS
+
+# Results per search, as the chat endpoint asks for
+SEARCH_LIMIT = 10
+
+# Ingredient counts searched for
+INGREDIENT_COUNTS = (1, 2, 4, 8)
+
+# Different inputs per case; calls cycle through them
+INPUTS_PER_CASE = 50
+
+# Calls per case in the memory pass
+MEMORY_CALLS = 20
+
+# Changes smaller than this are never flagged (timer noise on sub-millisecond cases)
+MIN_REGRESSION_MS = 0.05
+MIN_REGRESSION_KIB = 64
+
+INTENT_MESSAGES = [
+    "hi",
+    "hello there!",
+    "I have chicken, rice and broccoli",
+    "what can I make with eggs, spinach, feta and tomatoes",
+    "I want a vegan meal",
+    "I want a keto dinner with beef and cauliflower",
+    "2",
+    "show me recipe 3",
+    "clear diet",
+    "remove vegetarian",
+    "plan my meals for the week",
+    "what's the weather like?",
+]
+
+# Long, ingredient-heavy message (pasted shopping lists)
+LONG_MESSAGE = "I have " + ", ".join(
+    ["chicken", "rice", "garlic", "onion", "tomatoes", "basil", "olive oil", "parmesan", "spinach",
+     "mushrooms", "bell pepper", "zucchini", "carrots", "celery", "thyme", "lemon"] * 4
+) + " and butter"
+
+# Words that are frequent in ingredient lines but not ingredients
+_NOT_INGREDIENTS = UNITS | PREPARATION_WORDS | {
+    "and", "for", "into", "with", "about", "plus", "more", "taste", "divided", "optional",
+    "cut", "whole", "inch", "room", "temperature", "removed", "packed", "additional",
+}
+
+
+class Case:
+    """One benchmark: a function and the inputs it is called with, one per call."""
+
+    def __init__(self, name: str, func: Callable, inputs: Sequence):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_case(case: Case, iterations: int, warmup: int = 5) -> Dict:
+    """
+    Time `iterations` calls of a case, then measure its peak memory.
+
+    Returns:
+        calls, p50/p95/p99/mean latency (ms), throughput (calls/s) and
+        peak traced memory (KiB)
+    """
+    func, inputs = case.func, case.inputs
+    for i in range(min(warmup, len(inputs))):
+        func(inputs[i])
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        for i in range(min(MEMORY_CALLS, iterations)):
+            func(inputs[i % len(inputs)])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": iterations,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 4),
+        "throughput_per_s": round(iterations / elapsed, 1) if elapsed else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def ingredient_pools(limit: int = 60) -> Tuple[List[str], List[str]]:
+    """
+    Common and rare ingredient words from the search index.
+
+    Returns:
+        (the `limit` most frequent ingredient words, the `limit` least
+        frequent ones that still appear in more than one recipe)
+    """
+    words = []
+    for token, doc_freq in recommender.get_ingredient_index().doc_freqs().items():
+        if token.isalpha() and len(token) >= 4 and token not in _NOT_INGREDIENTS:
+            words.append((doc_freq, token))
+
+    words.sort()
+    common = [token for _, token in reversed(words[-limit:])]
+    rare = [token for freq, token in words if freq >= 2][:limit]
+    return common, rare
+
+
+def build_cases(seed: int = 0, engine: str = recommender.SEARCH_ENGINE) -> List[Case]:
+    """All benchmark cases, with inputs drawn from the current database."""
+    rng = random.Random(seed)
+    common, rare = ingredient_pools()
+    diets = list(DIET_RULES)
+
+    def queries(pool: List[str], count: int) -> List[List[str]]:
+        count = min(count, len(pool))
+        return [rng.sample(pool, count) for _ in range(INPUTS_PER_CASE)]
+
+    def searcher(diet_restrictions: Optional[List[str]] = None, ranking: str = "count") -> Callable:
+        def search(ingredients: List[str]):
+            return recommender.search_recipes_by_ingredients(
+                ingredients, max_results=SEARCH_LIMIT, engine=engine,
+                diet_restrictions=diet_restrictions, use_cache=False, ranking=ranking
+            )
+        return search
+
+    cases = [
+        Case("intent/mixed", determine_intent, INTENT_MESSAGES),
+        Case("intent/long_message", determine_intent, [LONG_MESSAGE]),
+    ]
+
+    for count in INGREDIENT_COUNTS:
+        cases.append(Case(f"search/common-{count}", searcher(), queries(common, count)))
+    for count in INGREDIENT_COUNTS:
+        cases.append(Case(f"search/rare-{count}", searcher(), queries(rare, count)))
+    cases.append(Case(f"search/common-4+{diets[0]}", searcher(diets[:1]), queries(common, 4)))
+    cases.append(Case(f"search/common-4+{'+'.join(diets[:2])}", searcher(diets[:2]), queries(common, 4)))
+    cases.append(Case("search/common-4/idf", searcher(ranking="idf"), queries(common, 4)))
+
+    # Full recipes of typical result lists, for the diet filter and formatting
+    result_queries = queries(common, 2)[:10]
+    result_lists = [searcher()(ingredients) for ingredients in result_queries]
+    recipe_ids = sorted({recipe['id'] for results in result_lists for recipe in results})
+    full_recipes = recommender.get_recipes_by_ids(recipe_ids)
+    recipe_sets = [rng.sample(full_recipes, min(30, len(full_recipes))) for _ in range(10)]
+    cases.append(Case(
+        f"filter_by_diet/30x{diets[0]}",
+        lambda recipes: recommender.filter_by_diet(recipes, diets[:1]),
+        recipe_sets
+    ))
+
+    all_ids = list(recommender.get_ingredient_index().doc_lengths)
+    cases.append(Case(
+        "recipe/by_id",
+        recommender.get_recipe_by_id,
+        [rng.choice(all_ids) for _ in range(INPUTS_PER_CASE)]
+    ))
+
+    cases.append(Case(
+        "format/recipe_response",
+        lambda args: recommender.format_recipe_response(*args),
+        list(zip(result_lists, result_queries))
+    ))
+    cases.append(Case("format/recipe_details", recommender.format_recipe_details, full_recipes[:INPUTS_PER_CASE]))
+    return cases
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    A case regresses when its p50, p95 or peak memory grew by more than
+    `threshold` (0.2 = 20%) and by more than the noise floor.
+
+    Returns:
+        One line per regression
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for key, floor in (("p50_ms", MIN_REGRESSION_MS), ("p95_ms", MIN_REGRESSION_MS), ("peak_kib", MIN_REGRESSION_KIB)):
+            before, after = previous.get(key), current.get(key)
+            if not before or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > floor:
+                regressions.append(f"{name}: {key} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None) -> None:
+    header = f"{'case':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}{'peak KiB':>10}"
+    if baseline:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = (
+            f"{name:<34}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+            f"{r['throughput_per_s']:>11.1f}{r['peak_kib']:>10.1f}"
+        )
+        if baseline:
+            previous = baseline.get(name, {}).get("p50_ms")
+            line += f"{(r['p50_ms'] / previous - 1) * 100:>+12.0f}%" if previous else f"{'new':>13}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent detection, search, diet filtering and formatting")
+    parser.add_argument("--db", default=recommender.DB_PATH, help="Path to the recipe database")
+    parser.add_argument("--engine", default=recommender.SEARCH_ENGINE, help="Search engine for the search cases")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per case")
+    parser.add_argument("--quick", action="store_true", help="20 calls per case")
+    parser.add_argument("--only", default="", help="Only cases whose name contains this")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for query sampling")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON from an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Growth flagged as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    recommender.DB_PATH = args.db
+    iterations = 20 if args.quick else args.iterations
+
+    # Build indexes and load diet sets up front so cases time steady-state calls
+    start = time.perf_counter()
+    recipe_count = recommender.get_recipe_count()
+    recommender.get_ingredient_index()
+    recommender.load_diet_filters()
+    cases = [case for case in build_cases(args.seed, args.engine) if args.only in case.name]
+    print(f"{recipe_count} recipes, engine={args.engine}, {iterations} calls per case "
+          f"(set-up {time.perf_counter() - start:.2f}s)\n")
+
+    results = {case.name: run_case(case, iterations) for case in cases}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print_table(results, baseline)
+
+    if args.json:
+        report = {
+            "meta": {
+                "created_at": time.time(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "db_path": args.db,
+                "recipe_count": recipe_count,
+                "engine": args.engine,
+                "iterations": iterations,
+                "seed": args.seed,
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold * 100:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
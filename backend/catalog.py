@@ -0,0 +1,301 @@
+"""
+Incremental catalog updates.
+
+Adds, updates and deletes recipes and keeps everything derived from them
+in step for just those recipes: diet flags (diets.py), canonical
+ingredient ids (preprocessing.py) and the FTS table (kept in sync by its
+triggers, see fts_index.py).
+
+Every ingest bumps the catalog version and logs which recipes changed in
+catalog_changes. Running app processes notice the new version and patch
+their in-memory index, diet sets and search cache for the changed recipes
+only (see recommender._check_db_changed), so searches keep working while
+the catalog is updated.
+
+Separately, triggers count every write to the recipes table in
+catalog_meta, including ones made outside this module (direct SQL,
+diets.py), so index snapshots can tell they are stale without reading
+the table (see ensure_edit_tracking).
+
+Usage:
+    python catalog.py --upsert new_recipes.jsonl    # add/update recipes
+    python catalog.py --delete 12 345               # delete recipes by id
+    python catalog.py                               # print the catalog version
+
+Each JSONL line is a recipe: {"title": ..., "ingredients": ..., "instructions": ...},
+plus "id" to update an existing recipe.
+"""
+import argparse
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from diets import classify_recipes, has_diet_columns
+from preprocessing import has_ingredient_tables, store_recipe_ingredients
+
+CHANGES_TABLE = "catalog_changes"
+
+# Recipe dict key -> recipes table column (same as recommender.RECIPE_COLUMNS)
+RECIPE_FIELDS = {
+    'title': 'Title',
+    'ingredients': 'Ingredients',
+    'instructions': 'Instructions',
+}
+
+# Ids per IN (...) query
+ID_CHUNK_SIZE = 500
+
+# Key/value table holding the edit counter
+META_TABLE = "catalog_meta"
+EDIT_VERSION_KEY = "edit_version"
+
+_BUMP_EDIT_VERSION = f"UPDATE {META_TABLE} SET value = value + 1 WHERE key = '{EDIT_VERSION_KEY}';"
+
+# Bump the edit counter whenever a recipe row is written
+_EDIT_TRIGGERS = {
+    f"{META_TABLE}_{event.lower()}": f"""
+        CREATE TRIGGER IF NOT EXISTS {META_TABLE}_{event.lower()} AFTER {event} ON recipes BEGIN
+            {_BUMP_EDIT_VERSION}
+        END
+    """
+    for event in ("INSERT", "UPDATE", "DELETE")
+}
+
+
+def ensure_changes_table(conn) -> None:
+    """Create the change log if it doesn't exist."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            version INTEGER NOT NULL,
+            recipe_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            changed_at REAL NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CHANGES_TABLE}_version ON {CHANGES_TABLE}(version)")
+
+
+def has_changes_table(conn) -> bool:
+    """Check whether the catalog has a change log."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CHANGES_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def get_catalog_version(conn) -> int:
+    """Current catalog version (0 if the catalog was never updated incrementally)."""
+    if not has_changes_table(conn):
+        return 0
+    return conn.execute(f"SELECT COALESCE(MAX(version), 0) FROM {CHANGES_TABLE}").fetchone()[0]
+
+
+def ensure_edit_tracking(conn) -> None:
+    """
+    Count every write to the recipes table in catalog_meta (see get_edit_version).
+
+    Triggers bump the counter for any INSERT, UPDATE or DELETE, so edits
+    that don't go through ingest_recipes (direct SQL, diets.py) are counted
+    too. The caller commits.
+    """
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (key, value) VALUES ('{EDIT_VERSION_KEY}', 0)")
+    for sql in _EDIT_TRIGGERS.values():
+        conn.execute(sql)
+
+
+def get_edit_version(conn) -> Optional[int]:
+    """
+    Number of writes to the recipes table since edit tracking was set up.
+
+    Returns:
+        The counter, or None if edit tracking isn't set up (then edits
+        can't be detected)
+    """
+    placeholders = ", ".join("?" for _ in _EDIT_TRIGGERS)
+    triggers = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+        list(_EDIT_TRIGGERS)
+    ).fetchone()[0]
+    if triggers != len(_EDIT_TRIGGERS):
+        return None
+    row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = ?", (EDIT_VERSION_KEY,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def changes_since(conn, version: int) -> Optional[Tuple[int, Set[int]]]:
+    """
+    Recipes changed after a catalog version.
+
+    Args:
+        conn: Connection to the recipe database
+        version: Catalog version the caller is up to date with
+
+    Returns:
+        (current version, ids of recipes added/updated/deleted since), or
+        None if the change log doesn't go back that far and the caller has
+        to rebuild from scratch
+    """
+    if not has_changes_table(conn):
+        return None
+
+    oldest, current = conn.execute(f"SELECT MIN(version), MAX(version) FROM {CHANGES_TABLE}").fetchone()
+    if current is None or current < version:
+        return None
+    if current == version:
+        return current, set()
+    if oldest > version + 1:
+        return None
+
+    rows = conn.execute(
+        f"SELECT DISTINCT recipe_id FROM {CHANGES_TABLE} WHERE version > ?", (version,)
+    )
+    return current, {row[0] for row in rows}
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def ingest_recipes(conn, upserts: Iterable[Dict] = (), deletes: Iterable[int] = ()) -> int:
+    """
+    Add, update and delete recipes in one transaction, updating derived data.
+
+    Args:
+        conn: Writable SQLite connection to the recipe database
+        upserts: Recipe dicts with 'title', 'ingredients', 'instructions';
+            ones with an 'id' that exists are updated, the rest are added
+        deletes: Ids of recipes to delete
+
+    Returns:
+        The new catalog version
+    """
+    upserts = list(upserts)
+    deletes = list(dict.fromkeys(deletes))
+    for recipe in upserts:
+        unknown = [key for key in recipe if key != 'id' and key not in RECIPE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown recipe fields: {', '.join(unknown)}")
+
+    ensure_changes_table(conn)
+    conn.commit()
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # one writer at a time; readers keep reading
+        version = get_catalog_version(conn) + 1
+        now = time.time()
+        changes = []
+        upserted_ids = []
+
+        for recipe in upserts:
+            fields = [key for key in RECIPE_FIELDS if key in recipe]
+            values = [recipe[key] for key in fields]
+            recipe_id = recipe.get('id')
+
+            exists = recipe_id is not None and conn.execute(
+                "SELECT 1 FROM recipes WHERE id = ?", (recipe_id,)
+            ).fetchone() is not None
+
+            if exists:
+                if fields:
+                    set_clause = ", ".join(f"{RECIPE_FIELDS[key]} = ?" for key in fields)
+                    conn.execute(f"UPDATE recipes SET {set_clause} WHERE id = ?", values + [recipe_id])
+                changes.append((version, recipe_id, 'update', now))
+            else:
+                columns = [RECIPE_FIELDS[key] for key in fields]
+                if recipe_id is not None:
+                    columns.insert(0, 'id')
+                    values.insert(0, recipe_id)
+                placeholders = ", ".join("?" for _ in columns)
+                recipe_id = conn.execute(
+                    f"INSERT INTO recipes ({', '.join(columns)}) VALUES ({placeholders})", values
+                ).lastrowid
+                changes.append((version, recipe_id, 'add', now))
+            upserted_ids.append(recipe_id)
+
+        for chunk in _chunks(deletes):
+            placeholders = ", ".join("?" for _ in chunk)
+            conn.execute(f"DELETE FROM recipes WHERE id IN ({placeholders})", chunk)
+        changes.extend((version, recipe_id, 'delete', now) for recipe_id in deletes)
+
+        # Derived data, only for the recipes touched here
+        if upserted_ids and has_diet_columns(conn):
+            classify_recipes(conn, upserted_ids, commit=False)
+
+        if has_ingredient_tables(conn):
+            for chunk in _chunks(deletes):
+                placeholders = ", ".join("?" for _ in chunk)
+                conn.execute(f"DELETE FROM recipe_ingredients WHERE recipe_id IN ({placeholders})", chunk)
+            for chunk in _chunks(upserted_ids):
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT id, Ingredients FROM recipes WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                store_recipe_ingredients(conn, rows)
+
+        conn.executemany(
+            f"INSERT INTO {CHANGES_TABLE} (version, recipe_id, action, changed_at) VALUES (?, ?, ?, ?)",
+            changes
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return version
+
+
+def prune_changes(conn, keep_versions: int = 1000) -> int:
+    """
+    Forget old change log entries.
+
+    Processes more than keep_versions behind rebuild from scratch instead
+    of applying changes.
+
+    Returns:
+        Number of log rows deleted
+    """
+    if not has_changes_table(conn):
+        return 0
+    oldest_kept = get_catalog_version(conn) - keep_versions + 1
+    deleted = conn.execute(f"DELETE FROM {CHANGES_TABLE} WHERE version < ?", (oldest_kept,)).rowcount
+    conn.commit()
+    return deleted
+
+
+def main():
+    # Imported here so the CLI follows the same default path as the app
+    from recommender import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Add, update or delete recipes without rebuilding indexes")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the recipe database")
+    parser.add_argument("--upsert", metavar="JSONL", help="File with one recipe per line to add or update")
+    parser.add_argument("--delete", metavar="ID", type=int, nargs="+", default=[], help="Ids of recipes to delete")
+    args = parser.parse_args()
+
+    # isolation_level=None: ingest_recipes manages its own transaction
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        upserts: List[Dict] = []
+        if args.upsert:
+            with open(args.upsert, encoding="utf-8") as f:
+                upserts = [json.loads(line) for line in f if line.strip()]
+
+        if not upserts and not args.delete:
+            print(f"Catalog version {get_catalog_version(conn)}")
+            return
+
+        start = time.perf_counter()
+        version = ingest_recipes(conn, upserts, args.delete)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Upserted {len(upserts)} and deleted {len(args.delete)} recipes "
+            f"in {elapsed:.2f}s; catalog version is now {version}"
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Chat logic shared by the Flask app (app.py) and the ASGI app (asgi_app.py).
+
+Turns a detected intent plus the user's session into a reply, and holds
+the session id, warm-up and health helpers both servers use. Nothing in
+here depends on a web framework.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from intents import determine_intent
+from recommender import (
+    search_recipes_by_ingredients,
+    search_recipes_many,
+    format_recipe_response,
+    get_recipe_by_id,
+    format_recipe_details,
+    get_recipe_count,
+    correct_ingredients,
+    get_ingredient_index,
+    get_spelling_index,
+    load_diet_filters,
+    get_pool_stats,
+    get_search_cache_stats
+)
+from metrics import REGISTRY, SEARCH_RESULTS, stage
+from session_store import SessionBackend, is_valid_session_id, new_session_id
+from warmup import WarmUp
+
+logger = logging.getLogger(__name__)
+
+# Number of recipes shown per search (diet filtering happens in the query,
+# so there is no need to over-fetch)
+SEARCH_LIMIT = 10
+
+# Clients identify their session with this header (or cookie); new clients
+# get an id in the response and send it back on later messages
+SESSION_HEADER = 'X-Session-Id'
+SESSION_COOKIE = 'chefbot_session_id'
+
+# Most messages accepted by one /chat/batch request
+MAX_BATCH_SIZE = 1000
+
+# Searches run during warm-up so the first users hit a warm page cache and result cache
+WARMUP_QUERIES = [
+    ["chicken"],
+    ["chicken", "rice"],
+    ["pasta", "tomato"],
+    ["eggs"],
+    ["beef", "potato"],
+]
+
+
+def resolve_session_id(header_value: Optional[str], cookie_value: Optional[str]) -> str:
+    """Session id sent by the client, or a new one if it sent none (or an invalid one)."""
+    session_id = header_value or cookie_value
+    if is_valid_session_id(session_id):
+        return session_id
+    return new_session_id()
+
+
+def spelling_note(typed, corrected) -> str:
+    """Line telling the user which misspelled ingredients were searched as what."""
+    changes = [f"{new} (you typed {old})" for old, new in zip(typed, corrected) if old != new]
+    if not changes:
+        return ""
+    return f"\n\n🔤 Searched for: {', '.join(changes)}"
+
+
+def planned_search(intent_data: Dict, session: Dict) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    The search respond() will run for a message, without running it.
+
+    Returns:
+        (corrected ingredients, diet restrictions), or None if the message
+        doesn't search
+    """
+    if intent_data['intent'] == 'ingredient_search':
+        if intent_data['ingredients']:
+            diets = intent_data['diet_restrictions'] or session['diet_restrictions']
+            return correct_ingredients(intent_data['ingredients']), diets
+    elif intent_data['intent'] == 'diet_restrictions':
+        if intent_data['ingredients']:
+            return correct_ingredients(intent_data['ingredients']), intent_data['diet_restrictions']
+    return None
+
+
+def respond(intent_data: Dict, session: Dict, search_results: Optional[List[Dict]] = None) -> str:
+    """
+    Build the reply to a message and update the session.
+
+    Args:
+        intent_data: Result of intents.determine_intent() for the message
+        session: The user's session; changed in place
+        search_results: Results of the message's planned_search(), if the
+            caller already ran it (the batch endpoint does); otherwise
+            respond() searches itself
+
+    Returns:
+        The reply text
+    """
+    response_text = ""
+
+    # Handle different intents
+    if intent_data['intent'] == 'greeting':
+        # Show current diet restrictions if any
+        current_diet = session['diet_restrictions']
+        diet_info = f"\n🔖 Active diet filter: {', '.join(current_diet)}" if current_diet else ""
+
+        response_text = (
+            "Hello! I'm Chefbot 👨‍🍳\n\n"
+            "Tell me what you'd like to cook:\n"
+            "• 'I have [ingredients]' - Find recipes with your ingredients\n"
+            "• 'I want a [diet] meal' - Set diet for next search (one-time use)\n"
+            "• 'I want a [diet] with [ingredients]' - Search with diet filter\n"
+            "• 'remove [diet]' or 'clear diet' - Remove diet restrictions\n\n"
+            f"Example: 'I want a vegan meal' then 'I have rice and beans'{diet_info}\n\n"
+            f"💡 Diet filters auto-clear after each search!"
+        )
+
+    elif intent_data['intent'] == 'ingredient_search':
+        ingredients = intent_data['ingredients']
+        diet_restrictions = intent_data['diet_restrictions']
+
+        # If no diet restrictions in current message, use stored ones
+        if not diet_restrictions and session['diet_restrictions']:
+            diet_restrictions = session['diet_restrictions']
+            logger.info(f"Using stored diet restrictions: {diet_restrictions}")
+
+        # Store diet restrictions if provided
+        if diet_restrictions:
+            session['diet_restrictions'] = diet_restrictions
+
+        if not ingredients:
+            response_text = "Please tell me what ingredients you have. For example: 'I have chicken, rice, and tomatoes'"
+        else:
+            # Map typos like "brocoli" to ingredients the recipes actually use
+            typed_ingredients = ingredients
+            ingredients = correct_ingredients(typed_ingredients)
+            logger.info(f"Searching recipes for ingredients: {ingredients}, diet: {diet_restrictions}")
+
+            # Search for recipes; the diet filter is applied inside the query
+            if search_results is None:
+                with stage("search"):
+                    search_results = search_recipes_by_ingredients(
+                        ingredients,
+                        max_results=SEARCH_LIMIT,
+                        diet_restrictions=diet_restrictions
+                    )
+            results = search_results
+            SEARCH_RESULTS.inc(len(results))
+            logger.info(f"Found {len(results)} recipes")
+
+            # Store result ids for later detail requests
+            session['last_result_ids'] = [recipe['id'] for recipe in results]
+
+            with stage("format_response"):
+                response_text = format_recipe_response(results, ingredients)
+            response_text += spelling_note(typed_ingredients, ingredients)
+
+            # Clear diet restrictions after showing recipes (one-time use)
+            if session['diet_restrictions']:
+                session['diet_restrictions'] = []
+                logger.info("Auto-cleared diet restrictions after showing results")
+
+            # Add note if using stored diet preferences
+            if diet_restrictions and not intent_data['diet_restrictions']:
+                response_text += f"\n\n🔖 Filtered by: {', '.join(diet_restrictions)} (from your previous request)"
+
+            # Clear diet restrictions after showing recipes (one-time use)
+            if session['diet_restrictions']:
+                session['diet_restrictions'] = []
+                logger.info("Auto-cleared diet restrictions after showing results")
+
+    elif intent_data['intent'] == 'meal_plan':
+        response_text = "Meal planning feature coming soon! For now, tell me what ingredients you have and I'll find recipes for you."
+
+    elif intent_data['intent'] == 'diet_restrictions':
+        diet = intent_data['diet_restrictions']
+        ingredients = intent_data['ingredients']
+
+        # Store diet restrictions in session
+        if diet:
+            session['diet_restrictions'] = diet
+            logger.info(f"Stored diet restrictions in session: {diet}")
+
+        # If they provided ingredients with diet, search now
+        if ingredients:
+            typed_ingredients = ingredients
+            ingredients = correct_ingredients(typed_ingredients)
+            logger.info(f"Searching recipes for ingredients: {ingredients}, diet: {diet}")
+
+            if search_results is None:
+                with stage("search"):
+                    search_results = search_recipes_by_ingredients(
+                        ingredients,
+                        max_results=SEARCH_LIMIT,
+                        diet_restrictions=diet
+                    )
+            results = search_results
+            SEARCH_RESULTS.inc(len(results))
+            logger.info(f"Found {len(results)} recipes")
+
+            # Store result ids for later detail requests
+            session['last_result_ids'] = [recipe['id'] for recipe in results]
+
+            with stage("format_response"):
+                response_text = format_recipe_response(results, ingredients)
+            response_text += spelling_note(typed_ingredients, ingredients)
+        else:
+            # No ingredients provided, ask for them
+            response_text = f"Got it! I'll look for {', '.join(diet)} recipes. What ingredients do you have?"
+
+    elif intent_data['intent'] == 'recipe_detail':
+        recipe_number = intent_data.get('recipe_number')
+
+        last_result_ids = session['last_result_ids']
+
+        # Check if we have stored results
+        if not last_result_ids:
+            response_text = "Please search for recipes first! Try: 'I have chicken and rice'"
+        elif recipe_number < 1 or recipe_number > len(last_result_ids):
+            response_text = f"Please enter a number between 1 and {len(last_result_ids)}"
+        else:
+            # Sessions only hold recipe ids; load the full recipe now
+            # (subtract 1 for 0-indexed array)
+            with stage("recipe_lookup"):
+                recipe = get_recipe_by_id(last_result_ids[recipe_number - 1])
+
+            if recipe is None:
+                response_text = "Sorry, that recipe is no longer available. Try searching again!"
+            else:
+                with stage("format_response"):
+                    response_text = format_recipe_details(recipe)
+
+    elif intent_data['intent'] == 'clear_diet':
+        # Clear stored diet restrictions
+        cleared_diets = session['diet_restrictions'].copy()
+        session['diet_restrictions'] = []
+        logger.info("Cleared diet restrictions from session")
+
+        if cleared_diets:
+            response_text = f"✅ Removed {', '.join(cleared_diets)} filter. You can now search for any recipes!"
+        else:
+            response_text = "✅ No diet restrictions were active. You can search for any recipes!"
+
+    else:
+        response_text = "I can help you find recipes! Tell me what ingredients you have, like 'I have chicken and rice'"
+
+    session['last_intent'] = intent_data['intent']
+    return response_text
+
+
+def handle_chat(session_store: SessionBackend, session_id: str, intent_data: Dict) -> str:
+    """
+    Load the user's session once, reply to the message and save the session back.
+
+    Runs the database work of a message (session, search, recipe loading),
+    so the ASGI app calls it in its thread pool.
+    """
+    with stage("session_load"):
+        session = session_store.get(session_id)
+    response_text = respond(intent_data, session)
+    with stage("session_save"):
+        session_store.save(session_id, session)
+    return response_text
+
+
+def _batch_error(session_id: str, intent_data: Optional[Dict], error: Exception) -> Dict:
+    """Result for a batch message that failed (the rest of the batch goes on)."""
+    logger.error(f"Error processing batch message: {str(error)}", exc_info=True)
+    return {
+        "session_id": session_id,
+        "response": "Sorry, something went wrong processing your message!",
+        "intent_data": intent_data,
+        "error": True,
+        "error_details": str(error)
+    }
+
+
+def handle_chat_batch(session_store: SessionBackend, items: List[Dict]) -> List[Dict]:
+    """
+    Reply to many messages, possibly from many sessions, in one go.
+
+    Each session's messages are answered in the order given, exactly as if
+    they had been sent to /chat one by one. Messages are processed in
+    rounds (the first message of every session, then the second, ...);
+    within a round the sessions are independent, so all of the round's
+    searches are grouped by diet filter and run through one
+    search_recipes_many() call per group. Sessions are loaded and saved
+    with one get_many()/save_many() call each.
+
+    A message whose planning, search group or reply fails gets an error
+    result; the rest of the batch is still answered and the sessions are
+    saved either way.
+
+    Args:
+        session_store: Session backend
+        items: {"session_id": ..., "message": ...} dicts; items without a
+            (valid) session id each get a new session
+
+    Returns:
+        One result per item, in order: session_id, response, intent_data
+        and error (True for empty messages and messages that failed)
+    """
+    results: List[Optional[Dict]] = [None] * len(items)
+    rounds: List[List[Tuple[int, str, Dict]]] = []
+    turns: Dict[str, int] = {}
+
+    for position, item in enumerate(items):
+        session_id = resolve_session_id(item.get('session_id'), None)
+        message = item.get('message', '')
+        if not isinstance(message, str) or not message:
+            results[position] = {"session_id": session_id, "response": "Please enter a message.", "error": True}
+            continue
+
+        try:
+            with stage("determine_intent"):
+                intent_data = determine_intent(message)
+        except Exception as e:
+            results[position] = _batch_error(session_id, None, e)
+            continue
+        turn = turns.get(session_id, 0)
+        turns[session_id] = turn + 1
+        if turn == len(rounds):
+            rounds.append([])
+        rounds[turn].append((position, session_id, intent_data))
+
+    with stage("session_load"):
+        sessions = session_store.get_many(list(turns))
+
+    # Save whatever was applied even if something below fails, so diet
+    # changes made earlier in the batch aren't lost
+    try:
+        for messages in rounds:
+            # Diet filter -> (positions in this round, ingredient lists)
+            searches: Dict[Tuple[str, ...], Tuple[List[int], List[List[str]]]] = {}
+            for index, (position, session_id, intent_data) in enumerate(messages):
+                try:
+                    plan = planned_search(intent_data, sessions[session_id])
+                except Exception as e:
+                    results[position] = _batch_error(session_id, intent_data, e)
+                    continue
+                if plan is not None:
+                    ingredients, diets = plan
+                    group = searches.setdefault(tuple(diets), ([], []))
+                    group[0].append(index)
+                    group[1].append(ingredients)
+
+            search_results: Dict[int, List[Dict]] = {}
+            for diets, (indexes, queries) in searches.items():
+                try:
+                    with stage("search"):
+                        found = search_recipes_many(queries, max_results=SEARCH_LIMIT, diet_restrictions=list(diets))
+                except Exception as e:
+                    # Only this diet group's messages fail
+                    for index in indexes:
+                        position, session_id, intent_data = messages[index]
+                        results[position] = _batch_error(session_id, intent_data, e)
+                    continue
+                search_results.update(zip(indexes, found))
+
+            for index, (position, session_id, intent_data) in enumerate(messages):
+                if results[position] is not None:
+                    continue
+                try:
+                    response_text = respond(intent_data, sessions[session_id], search_results.get(index))
+                    results[position] = {
+                        "session_id": session_id,
+                        "response": response_text,
+                        "intent_data": intent_data,
+                        "error": False
+                    }
+                except Exception as e:
+                    results[position] = _batch_error(session_id, intent_data, e)
+    finally:
+        with stage("session_save"):
+            session_store.save_many(sessions)
+    logger.info(f"Answered a batch of {len(items)} messages from {len(turns)} sessions in {len(rounds)} rounds")
+    return results
+
+
+def parse_batch(data) -> Optional[List[Dict]]:
+    """
+    Items of a /chat/batch request body, or None if it isn't valid.
+
+    The body is {"messages": [{"session_id": ..., "message": ...}, ...]}
+    or just the list.
+    """
+    items = data.get('messages') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+
+def log_recipe_count() -> None:
+    """Warm-up step: open the catalog and log its size."""
+    logger.info(f"Database contains {get_recipe_count()} recipes")
+
+
+def warm_search_cache() -> None:
+    """Warm-up step: run the most common searches once."""
+    for ingredients in WARMUP_QUERIES:
+        search_recipes_by_ingredients(ingredients, max_results=SEARCH_LIMIT)
+
+
+def build_warmup(started_at: Optional[float] = None) -> WarmUp:
+    """Warm-up steps for a server process: catalog load, indexes, then the result cache."""
+    return WarmUp([
+        ("catalog", log_recipe_count),
+        ("ingredient index", get_ingredient_index),
+        ("diet filters", load_diet_filters),
+        ("spelling index", get_spelling_index),
+        ("search cache", warm_search_cache),
+    ], started_at=started_at)
+
+
+def health_status(session_store: SessionBackend) -> Dict:
+    """Body of the /health endpoint."""
+    return {
+        "status": "healthy",
+        "service": "chefbot-backend",
+        "db_pool": get_pool_stats(),
+        "search_cache": get_search_cache_stats(),
+        "sessions": session_store.stats()
+    }
+
+
+_gauges_registered = False
+
+
+def register_gauges(session_store: SessionBackend) -> None:
+    """Export search cache, connection pool and session counts on /metrics (once per process)."""
+    global _gauges_registered
+    if _gauges_registered:
+        return
+    _gauges_registered = True
+
+    REGISTRY.callback(
+        "chefbot_search_cache_hits_total", "Search cache hits",
+        lambda: get_search_cache_stats()["hits"], kind="counter"
+    )
+    REGISTRY.callback(
+        "chefbot_search_cache_misses_total", "Search cache misses",
+        lambda: get_search_cache_stats()["misses"], kind="counter"
+    )
+    REGISTRY.callback(
+        "chefbot_search_cache_entries", "Searches currently cached",
+        lambda: get_search_cache_stats()["size"]
+    )
+    REGISTRY.callback(
+        "chefbot_db_connections_in_use", "Pooled database connections handed out",
+        lambda: get_pool_stats().get("in_use", 0)
+    )
+    REGISTRY.callback(
+        "chefbot_sessions", "Stored chat sessions",
+        lambda: session_store.stats()["sessions"]
+    )
+
+
+# Body of the / endpoint
+API_INFO = {
+    "message": "Chefbot Backend API",
+    "endpoints": {
+        "/chat": "POST - Send a message to the chatbot",
+        "/chat/batch": "POST - Send many messages (from many sessions) at once",
+        "/health": "GET - Health check",
+        "/metrics": "GET - Prometheus metrics",
+        "/ready": "GET - Readiness (warm-up progress)"
+    }
+}
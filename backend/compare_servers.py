@@ -0,0 +1,206 @@
+"""
+Throughput comparison: Flask (app.py) vs. ASGI (asgi_app.py).
+
+Starts each server in its own process, waits for /ready, then has
+--concurrency clients hold conversations against /chat at the same time
+and reports requests/second, latency percentiles, errors and the server's
+memory use.
+
+Usage:
+    python compare_servers.py
+    python compare_servers.py --concurrency 64 --requests 2000
+    python compare_servers.py --only asgi
+
+Needs uvicorn for the ASGI server (pip install uvicorn).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# One conversation, repeated by every client
+CONVERSATION = [
+    "hi",
+    "I have chicken and rice",
+    "1",
+    "I want a vegan meal",
+    "I have tofu, beans and tomato",
+    "2",
+    "I have eggs and cheese",
+    "clear diet",
+]
+
+
+def _server_command(server: str, target: str, port: int) -> List[str]:
+    if server == "flask":
+        # The development server, threaded, as `python app.py` runs it (minus the debugger)
+        module, attribute = target.split(":")
+        code = (
+            f"import {module}; "
+            f"{module}.{attribute}.run(host='127.0.0.1', port={port}, threaded=True)"
+        )
+        return [sys.executable, "-c", code]
+    return [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"]
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/ready", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{base_url} not ready after {timeout}s")
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_load(base_url: str, concurrency: int, total_requests: int) -> Dict:
+    """
+    Send total_requests chat messages from `concurrency` clients at once.
+
+    Each client has its own session and walks through CONVERSATION in order,
+    starting over at the end.
+
+    Returns:
+        Requests/second, latency percentiles (ms) and error count
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def client(client_id: int) -> None:
+        nonlocal errors
+        session_id = f"loadclient{client_id:04d}"
+        turn = 0
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            body = json.dumps({"message": CONVERSATION[turn % len(CONVERSATION)]}).encode()
+            turn += 1
+            request = urllib.request.Request(
+                base_url + "/chat",
+                data=body,
+                headers={"Content-Type": "application/json", "X-Session-Id": session_id},
+            )
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for client_id in range(concurrency):
+            pool.submit(client, client_id)
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(wall, 2),
+        "requests_per_second": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def benchmark_server(server: str, target: str, port: int, concurrency: int, total_requests: int,
+                     ready_timeout: float) -> Dict:
+    """Start one server, load it, stop it and return its results."""
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(
+        _server_command(server, target, port),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(base_url, process, ready_timeout)
+        rss_before = _rss_mb(process.pid)
+        results = run_load(base_url, concurrency, total_requests)
+        rss_after = _rss_mb(process.pid)
+        if rss_before is not None and rss_after is not None:
+            results["rss_mb"] = round(rss_after, 1)
+            results["rss_growth_mb"] = round(rss_after - rss_before, 1)
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chat throughput of the Flask and ASGI servers")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients sending messages at the same time")
+    parser.add_argument("--requests", type=int, default=1000, help="Messages to send to each server")
+    parser.add_argument("--only", choices=["flask", "asgi"], help="Benchmark just one server")
+    parser.add_argument("--flask-app", default="app:app", help="Flask app to serve (module:attribute)")
+    parser.add_argument("--asgi-app", default="asgi_app:app", help="ASGI app to serve (module:attribute)")
+    parser.add_argument("--port", type=int, default=8600, help="First port to use")
+    parser.add_argument("--ready-timeout", type=float, default=120.0, help="Seconds to wait for /ready")
+    args = parser.parse_args()
+
+    servers = [("flask", args.flask_app), ("asgi", args.asgi_app)]
+    if args.only:
+        servers = [(name, target) for name, target in servers if name == args.only]
+
+    print(f"{args.requests} messages, {args.concurrency} concurrent clients\n")
+    print(f"{'server':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'RSS MB':>9}")
+    print("-" * 61)
+    for offset, (server, target) in enumerate(servers):
+        results = benchmark_server(
+            server, target, args.port + offset, args.concurrency, args.requests, args.ready_timeout
+        )
+        rss = f"{results['rss_mb']:.1f}" if "rss_mb" in results else "-"
+        print(
+            f"{server:<8}{results['requests_per_second']:>9.1f}{results['p50_ms']:>9.1f}"
+            f"{results['p95_ms']:>9.1f}{results['p99_ms']:>9.1f}{results['errors']:>8}{rss:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
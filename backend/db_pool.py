@@ -0,0 +1,125 @@
+"""
+Pool of pre-configured, read-only SQLite connections.
+
+Connections are opened once with a read-only URI and tuned PRAGMAs, then
+handed out to request threads and returned to the pool instead of being
+closed, so each search reuses a warm connection and page cache.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+# PRAGMAs applied to every pooled connection
+READ_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 256 * 1024 * 1024,  # map up to 256 MB of the database file
+    "cache_size": -16000,            # ~16 MB page cache per connection
+    "temp_store": "MEMORY",
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the acquire timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections.
+
+    Connections are created lazily up to `size` and shared across threads
+    (one thread at a time), so they are opened with check_same_thread=False.
+    """
+
+    def __init__(self, db_path: str, size: int = 8, immutable: bool = False, timeout: float = 30.0):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            size: Maximum number of open connections
+            immutable: Open with immutable=1 (skips all locking; only safe
+                when nothing writes to the file while the app is running)
+            timeout: Seconds to wait for a free connection before giving up
+        """
+        self.db_path = db_path
+        self.size = size
+        self.immutable = immutable
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue(maxsize=size)  # LIFO keeps the warmest connection in use
+        self._lock = threading.Lock()
+        self._all = []
+        self._stats = {"created": 0, "acquired": 0, "waits": 0, "timeouts": 0}
+
+    def _uri(self) -> str:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri(), uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in READ_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening a new one if below size."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self._connect()
+                    self._all.append(conn)
+                    self._stats["created"] += 1
+
+        if conn is None:
+            with self._lock:
+                self._stats["waits"] += 1
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout}s")
+
+        with self._lock:
+            self._stats["acquired"] += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool."""
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict:
+        """Pool size and usage counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = len(self._all)
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        return stats
+
+    def close(self) -> None:
+        """Close every connection the pool has opened."""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+            self._idle = queue.LifoQueue(maxsize=self.size)
@@ -0,0 +1,271 @@
+"""
+Diet classification.
+
+Keyword rules that decide whether a recipe fits a diet, plus an offline
+step that stores the result per recipe (is_vegetarian, is_vegan, is_keto)
+so searches can filter by diet in SQL instead of re-scanning recipe text.
+
+Usage:
+    python diets.py              # add/refresh the diet columns
+    python diets.py --db PATH    # use a different database file
+"""
+import argparse
+import re
+import sqlite3
+import time
+from typing import Dict, List, Set
+
+# Expanded meat keywords for vegetarian/vegan
+MEAT_KEYWORDS = [
+    'chicken', 'beef', 'pork', 'lamb', 'turkey', 'duck', 'goose',
+    'meat', 'bacon', 'sausage', 'ham', 'prosciutto', 'salami',
+    'fish', 'salmon', 'tuna', 'cod', 'shrimp', 'crab', 'lobster',
+    'anchovy', 'sardine', 'trout', 'tilapia', 'halibut',
+    'steak', 'ribs', 'chop', 'cutlet', 'ground beef', 'ground pork',
+    'pepperoni', 'chorizo', 'veal', 'venison', 'bison'
+]
+
+# Animal products for vegan
+ANIMAL_KEYWORDS = [
+    'milk', 'cheese', 'butter', 'egg', 'cream', 'yogurt', 'honey',
+    'whey', 'casein', 'lactose', 'ghee', 'buttermilk', 'sour cream',
+    'mayonnaise', 'mayo', 'gelatin', 'lard'
+]
+
+# High carb foods for keto
+HIGH_CARB_KEYWORDS = [
+    'bread', 'pasta', 'rice', 'potato', 'flour', 'sugar',
+    'noodle', 'tortilla', 'bagel', 'cereal', 'oat', 'quinoa',
+    'corn', 'wheat', 'barley', 'couscous'
+]
+
+KEYWORD_CATEGORIES = {
+    'meat': MEAT_KEYWORDS,
+    'animal': ANIMAL_KEYWORDS,
+    'high_carb': HIGH_CARB_KEYWORDS,
+}
+
+# Diet -> keyword categories a recipe must NOT mention to fit the diet.
+# Add a diet here and it gets its own is_<diet> column on the next run.
+DIET_RULES = {
+    'vegetarian': ['meat'],
+    'vegan': ['meat', 'animal'],
+    'keto': ['high_carb'],
+}
+
+# Ids per IN (...) query when classifying selected recipes
+ID_CHUNK_SIZE = 500
+
+# Other names users give the diets above
+DIET_ALIASES = {
+    'low carb': 'keto',
+    'ketogenic': 'keto',
+}
+
+
+def _keyword_forms(keyword: str) -> List[str]:
+    """Spellings a keyword is matched as, besides the -s/-es plural. EX: "anchovy" -> ["anchovy", "anchovies"]"""
+    forms = [keyword]
+    if keyword.endswith('y') and keyword[-2:-1] not in 'aeiou':
+        forms.append(keyword[:-1] + 'ies')
+    return forms
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Build a regex alternation shaped like a prefix tree.
+    EX: ["cod", "corn", "crab"] -> "c(?:o(?:d|rn)|rab)"
+
+    Python's re tries alternatives one by one, so sharing prefixes means
+    each text position is checked against a handful of branches instead
+    of every keyword.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def to_pattern(node: Dict) -> str:
+        is_word_end = '' in node
+        branches = [
+            re.escape(char).replace(r"\ ", r"\s+") + to_pattern(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_word_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_word_end else group
+
+    return to_pattern(trie)
+
+
+def _build_keyword_matcher():
+    """
+    Compile every keyword of every category into one regex.
+
+    The regex is a prefix-tree alternation, so the longest keyword wins
+    ("ground beef" over "beef"), and word boundaries stop "egg" from
+    matching "eggplant" or "chop" from matching "chopped". Optional -s/-es
+    keeps plurals matching.
+    """
+    categories_by_form: Dict[str, Set[str]] = {}
+    for category, keywords in KEYWORD_CATEGORIES.items():
+        for keyword in keywords:
+            for form in _keyword_forms(keyword):
+                categories_by_form.setdefault(form, set()).add(category)
+
+    # Cheap first-letter lookahead skips most word starts before the tree is tried
+    first_letters = "".join(sorted({form[0] for form in categories_by_form}))
+    pattern = rf"\b(?=[{first_letters}])({_trie_pattern(list(categories_by_form))})(?:e?s)?\b"
+    return re.compile(pattern), categories_by_form
+
+
+# Built once at import and shared by every classification
+KEYWORD_PATTERN, _CATEGORIES_BY_FORM = _build_keyword_matcher()
+
+
+def find_categories(recipe_text: str) -> Set[str]:
+    """
+    Find which keyword categories a recipe mentions, in one pass over the text.
+    EX: "grilled chicken with rice" -> {"meat", "high_carb"}
+
+    Args:
+        recipe_text: Lowercased recipe text
+
+    Returns:
+        Set of category names from KEYWORD_CATEGORIES
+    """
+    found: Set[str] = set()
+    for match in KEYWORD_PATTERN.finditer(recipe_text):
+        found |= _CATEGORIES_BY_FORM[" ".join(match.group(1).split())]
+        if len(found) == len(KEYWORD_CATEGORIES):
+            break
+    return found
+
+
+def diet_column(diet: str) -> str:
+    """Column that stores the classification for a diet. EX: "vegan" -> "is_vegan" """
+    return f"is_{diet}"
+
+
+def resolve_diets(diet_restrictions: List[str]) -> List[str]:
+    """
+    Map user diet restrictions to the diets in DIET_RULES.
+    EX: ["low_carb", "vegan", "high_protein"] -> ["keto", "vegan"]
+
+    Restrictions without a rule (e.g. high_protein) are ignored, as before.
+    """
+    diets = []
+    for restriction in diet_restrictions:
+        restriction_lower = restriction.lower().replace('_', ' ')
+        for name in list(DIET_RULES) + list(DIET_ALIASES):
+            if name in restriction_lower:
+                diet = DIET_ALIASES.get(name, name)
+                if diet not in diets:
+                    diets.append(diet)
+    return diets
+
+
+def classify_text(recipe_text: str) -> Dict[str, bool]:
+    """
+    Decide which diets a recipe fits.
+
+    Args:
+        recipe_text: Lowercased ingredients, title and instructions
+
+    Returns:
+        Dict of diet name -> True if the recipe fits that diet
+    """
+    found = find_categories(recipe_text)
+    return {
+        diet: not any(category in found for category in categories)
+        for diet, categories in DIET_RULES.items()
+    }
+
+
+def recipe_text(title: str, ingredients: str, instructions: str) -> str:
+    """Text the diet rules are checked against."""
+    return (
+        (ingredients or '') + ' ' +
+        (title or '') + ' ' +
+        (instructions or '')
+    ).lower()
+
+
+def has_diet_columns(conn, diets: List[str] = None) -> bool:
+    """Check whether the recipes table stores classifications for these diets (default: all)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recipes)")}
+    return all(diet_column(diet) in columns for diet in (diets or DIET_RULES))
+
+
+def classify_recipes(conn, recipe_ids: List[int] = None, commit: bool = True) -> int:
+    """
+    Add any missing diet columns and (re)classify recipes.
+
+    Args:
+        conn: Writable SQLite connection to the recipe database
+        recipe_ids: Only classify these recipes (default: all)
+        commit: Commit when done; pass False to keep the changes in the
+            caller's transaction
+
+    Returns:
+        Number of recipes classified
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recipes)")}
+    for diet in DIET_RULES:
+        column = diet_column(diet)
+        if column not in columns:
+            conn.execute(f"ALTER TABLE recipes ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        # Partial index: the lookup is always "fits this diet"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_recipes_{column} ON recipes(id) WHERE {column} = 1")
+
+    query = "SELECT id, Title, Ingredients, Instructions FROM recipes"
+    if recipe_ids is None:
+        batches = [(query, [])]
+    else:
+        ids = list(recipe_ids)
+        batches = [
+            (query + f" WHERE id IN ({', '.join('?' for _ in chunk)})", chunk)
+            for chunk in (ids[start:start + ID_CHUNK_SIZE] for start in range(0, len(ids), ID_CHUNK_SIZE))
+        ]
+
+    set_clause = ", ".join(f"{diet_column(diet)} = ?" for diet in DIET_RULES)
+    count = 0
+    for batch_query, params in batches:
+        updates = []
+        for recipe_id, title, ingredients, instructions in conn.execute(batch_query, params).fetchall():
+            flags = classify_text(recipe_text(title, ingredients, instructions))
+            updates.append([int(flags[diet]) for diet in DIET_RULES] + [recipe_id])
+        conn.executemany(f"UPDATE recipes SET {set_clause} WHERE id = ?", updates)
+        count += len(updates)
+
+    if commit:
+        conn.commit()
+    return count
+
+
+def main():
+    # Imported here so the CLI follows the same default path as the app
+    from recommender import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Store diet classifications for every recipe")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the recipe database")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        start = time.perf_counter()
+        count = classify_recipes(conn)
+        elapsed = time.perf_counter() - start
+        print(f"Classified {count} recipes for {', '.join(DIET_RULES)} in {elapsed:.2f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,11 @@ Prints:
 - Intent classification accuracy
 - Recipe relevance (>= 80% ingredient match)
 - Average backend response time
+- Diet keyword matcher speed (single-pass regex vs. per-keyword loop)
+- Batch scoring throughput (sparse matrix vs. one search per query)
+- Spelling correction: trigram index build time, lookup latency and accuracy
 """
+import random
 import time
 from typing import List
 
@@ -25,7 +29,18 @@ from intents import (
         INTENT_OTHER,
 )
 
-from recommender import search_recipes_by_ingredients  
+from recommender import (
+        search_recipes_by_ingredients,
+        get_recipes_by_ids,
+        search_recipes_batch,
+        get_ingredient_index,
+)
+from spelling import TrigramIndex
+from diets import (
+        DIET_RULES,
+        KEYWORD_CATEGORIES,
+        classify_text,
+)
 
 # =====================
 # 1) INTENT ACCURACY
@@ -154,11 +169,12 @@ def _match_ratio(user_ings: List[str], recipe_ings: List[str]) -> float:
 RELEVANCE_TEST_CASES = [ case for case in INTENT_TESTS if case["expected"] == INTENT_INGREDIENT ]
 
 
-def test_recipe_relevance(threshold: float = 0.8, max_recipes: int = 5) -> None:
+def test_recipe_relevance(threshold: float = 0.8, max_recipes: int = 5, ranking: str = "count") -> None:
     """Measure % of recipes with >= threshold ingredient match.
 
     Uses determine_intent(msg) to get the ingredients list, then checks how
-    well the recommended recipes match those ingredients.
+    well the recommended recipes match those ingredients. `ranking` picks
+    the search ranking mode ("count" or "idf").
     """
 
     if search_recipes_by_ingredients is None:
@@ -168,7 +184,7 @@ def test_recipe_relevance(threshold: float = 0.8, max_recipes: int = 5) -> None:
     total_recipes = 0
     relevant_recipes = 0
 
-    print("Running recipe relevance test...")
+    print(f"Running recipe relevance test (ranking={ranking})...")
 
     for case in RELEVANCE_TEST_CASES:
         intent_result = determine_intent(case["msg"])
@@ -178,11 +194,14 @@ def test_recipe_relevance(threshold: float = 0.8, max_recipes: int = 5) -> None:
         if not user_ings:
             continue
 
-        recipes = search_recipes_by_ingredients(user_ings) or []  # type: ignore
+        recipes = search_recipes_by_ingredients(user_ings, ranking=ranking) or []  # type: ignore
         recipes = recipes[:max_recipes]
 
-        for r in recipes:
-            recipe_ings = r.get("ingredients") or r.get("Ingredients")
+        # Search results only carry a preview; score against the full ingredient lists
+        full_recipes = get_recipes_by_ids([r["id"] for r in recipes], columns=["ingredients"])
+
+        for r in full_recipes:
+            recipe_ings = r.get("ingredients")
             ratio = _match_ratio(user_ings, recipe_ings)
             total_recipes += 1
             if ratio >= threshold:
@@ -202,20 +221,27 @@ def test_recipe_relevance(threshold: float = 0.8, max_recipes: int = 5) -> None:
 # 3) PERFORMANCE / RESPONSE TIME
 # =====================
 
-def test_performance(num_runs: int = 20) -> None:
-    """Measure average time for search_recipes_by_ingredients calls."""
+def test_performance(num_runs: int = 20, ranking: str = "count") -> None:
+    """Measure average time for search_recipes_by_ingredients calls (cache bypassed)."""
 
     if search_recipes_by_ingredients is None:
         print("[SKIP] search_recipes_by_ingredients could not be imported. ")
         return
 
-    print(f"Running performance test over {num_runs} runs...")
+    print(f"Running performance test over {num_runs} runs (ranking={ranking})...")
+
+    # Build the ingredient index first so only searching is timed
+    search_recipes_by_ingredients(["salt"], ranking=ranking, use_cache=False)
 
     start = time.perf_counter()
 
     for _ in range(num_runs):
         # Simple fixed query – adjust ingredients if you want
-        search_recipes_by_ingredients(["chicken", "rice", "eggs", "bread", "squash", "broccoli", ]) 
+        search_recipes_by_ingredients(
+            ["chicken", "rice", "eggs", "bread", "squash", "broccoli", ],
+            ranking=ranking,
+            use_cache=False
+        )
 
     end = time.perf_counter()
 
@@ -223,6 +249,137 @@ def test_performance(num_runs: int = 20) -> None:
     print(f"Average backend response time ≈ {avg_seconds*1000:.1f} ms per call")
 
 
+# =====================
+# 4) DIET MATCHER PERFORMANCE
+# =====================
+
+def _classify_text_per_keyword(recipe_text: str) -> dict:
+    """The original diet check: one substring scan of the text per keyword per diet."""
+    return {
+        diet: not any(
+            keyword in recipe_text
+            for category in categories
+            for keyword in KEYWORD_CATEGORIES[category]
+        )
+        for diet, categories in DIET_RULES.items()
+    }
+
+
+def _long_recipe_text(num_steps: int, with_keywords: bool = False) -> str:
+    """Build a long instruction text; keyword-free text is the worst case for both matchers."""
+    steps = [
+        "chop the onions and carrots finely",
+        "heat the olive oil in a large skillet over medium heat",
+        "add the eggplant and saute until golden",
+        "season with salt, pepper and a pinch of cumin",
+        "simmer gently for ten minutes, stirring occasionally",
+    ]
+    if with_keywords:
+        steps.append("stir in the rice, the butter and the chicken")
+    return ". ".join(steps[i % len(steps)] for i in range(num_steps))
+
+
+def test_diet_matcher_performance(num_runs: int = 200, num_steps: int = 200) -> None:
+    """Compare the compiled single-pass diet matcher with the per-keyword loop."""
+
+    for label, with_keywords in (("no keyword hits", False), ("typical recipe", True)):
+        text = _long_recipe_text(num_steps, with_keywords)
+        print(f"Running diet matcher benchmark ({label}) on {len(text)} chars x {num_runs} runs...")
+
+        timings = {}
+        for name, classify in (("per-keyword loop", _classify_text_per_keyword), ("single-pass regex", classify_text)):
+            start = time.perf_counter()
+            for _ in range(num_runs):
+                classify(text)
+            timings[name] = (time.perf_counter() - start) / num_runs
+
+        for name, seconds in timings.items():
+            print(f"  {name:<18} ≈ {seconds*1000:.3f} ms per recipe")
+
+        speedup = timings["per-keyword loop"] / timings["single-pass regex"] if timings["single-pass regex"] else 0.0
+        print(f"  Single-pass speedup ≈ {speedup:.1f}x")
+
+
+# =====================
+# 5) BATCH SCORING THROUGHPUT
+# =====================
+
+BATCH_INGREDIENTS = [
+    "chicken", "rice", "eggs", "tomato", "garlic", "onion", "pasta", "beef",
+    "potato", "cheese", "spinach", "tofu", "broccoli", "salmon", "lemon",
+    "butter", "flour", "milk", "mushroom", "olive oil",
+]
+
+
+def test_batch_scoring_performance(num_queries: int = 2000, max_results: int = 10, seed: int = 0) -> None:
+    """Compare queries/second of one search per query with one batched matrix scoring call."""
+
+    rng = random.Random(seed)
+    queries = [rng.sample(BATCH_INGREDIENTS, rng.randint(1, 5)) for _ in range(num_queries)]
+    print(f"Running batch scoring benchmark on {num_queries} queries...")
+
+    # Build the index and matrix first so only scoring is timed
+    search_recipes_batch(queries[:1], max_results)
+
+    start = time.perf_counter()
+    for ingredients in queries:
+        search_recipes_by_ingredients(ingredients, max_results=max_results, engine="index", use_cache=False)
+    one_by_one = time.perf_counter() - start
+
+    start = time.perf_counter()
+    search_recipes_batch(queries, max_results)
+    batched = time.perf_counter() - start
+
+    print(f"  one search per query ≈ {num_queries / one_by_one:.0f} queries/s")
+    print(f"  batched matrix       ≈ {num_queries / batched:.0f} queries/s")
+
+
+# =====================
+# 6) SPELLING CORRECTION
+# =====================
+
+# Typo -> ingredient it should be corrected to
+SPELLING_TESTS = {
+    "brocoli": "broccoli",
+    "tomatos": "tomatoes",
+    "chiken": "chicken",
+    "onoin": "onion",
+    "garlick": "garlic",
+    "spinich": "spinach",
+    "mushrom": "mushroom",
+    "potatos": "potatoes",
+    "cinamon": "cinnamon",
+    "parmesean": "parmesan",
+}
+
+
+def test_spelling_correction(num_runs: int = 200) -> None:
+    """Report trigram index build time, per-word lookup latency and how many typos get fixed."""
+
+    index = get_ingredient_index()
+
+    start = time.perf_counter()
+    spelling = TrigramIndex(index.doc_freqs())
+    build_seconds = time.perf_counter() - start
+    print(f"Built trigram index over {len(spelling.words)} words in {build_seconds*1000:.1f} ms")
+
+    # Only typos whose intended ingredient is in this catalog can be fixed
+    cases = {typo: expected for typo, expected in SPELLING_TESTS.items() if expected in spelling.doc_freqs}
+    if not cases:
+        print("[SKIP] None of the spelling test ingredients are in the recipe vocabulary.")
+        return
+
+    correct = sum(1 for typo, expected in cases.items() if spelling.correct(typo) == expected)
+    print(f"Spelling accuracy = {correct / len(cases) * 100:.1f}% ({correct}/{len(cases)})")
+
+    start = time.perf_counter()
+    for _ in range(num_runs):
+        for typo in cases:
+            spelling.correct(typo)
+    per_lookup = (time.perf_counter() - start) / (num_runs * len(cases))
+    print(f"Average correction time ≈ {per_lookup*1e6:.0f} µs per misspelled word")
+
+
 # =====================
 # MAIN
 # =====================
@@ -232,7 +389,18 @@ if __name__ == "__main__":
     test_intent_accuracy()
 
     print("=== Recipe Relevance Test ===")
-    test_recipe_relevance()
+    for ranking in ("count", "idf"):
+        test_recipe_relevance(ranking=ranking)
 
     print("=== Performance Test ===")
-    test_performance()
+    for ranking in ("count", "idf"):
+        test_performance(ranking=ranking)
+
+    print("=== Diet Matcher Performance ===")
+    test_diet_matcher_performance()
+
+    print("=== Batch Scoring Performance ===")
+    test_batch_scoring_performance()
+
+    print("=== Spelling Correction ===")
+    test_spelling_correction()
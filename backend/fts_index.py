@@ -0,0 +1,131 @@
+"""
+SQLite FTS5 index over recipe titles and ingredients.
+
+Creates an external-content FTS5 table that mirrors recipes(Title, Ingredients)
+so ingredient searches can use MATCH + bm25() ranking inside SQLite.
+
+Usage:
+    python fts_index.py              # build (or rebuild) the index
+    python fts_index.py --drop       # remove the index and its triggers
+    python fts_index.py --db PATH    # use a different database file
+"""
+import argparse
+import sqlite3
+import time
+from typing import List
+
+FTS_TABLE = "recipes_fts"
+
+# Column weights passed to bm25(): a title hit counts double an ingredient hit
+BM25_WEIGHTS = (2.0, 1.0)
+
+# Keep the FTS table in sync when rows are written through SQL
+_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, Title, Ingredients)
+            VALUES (new.id, new.Title, new.Ingredients);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, Title, Ingredients)
+            VALUES ('delete', old.id, old.Title, old.Ingredients);
+        END
+    """,
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON recipes BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, Title, Ingredients)
+            VALUES ('delete', old.id, old.Title, old.Ingredients);
+            INSERT INTO {FTS_TABLE}(rowid, Title, Ingredients)
+            VALUES (new.id, new.Title, new.Ingredients);
+        END
+    """,
+}
+
+
+def has_fts_index(conn) -> bool:
+    """Check whether the FTS table exists in this database."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (FTS_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def build_match_query(ingredients: List[str]) -> str:
+    """
+    Turn a list of ingredients into an FTS5 MATCH expression.
+    EX: ["tomato sauce", "rice"] -> '"tomato sauce" OR "rice"'
+
+    Each ingredient is quoted as a phrase so user text can never be parsed
+    as FTS5 query syntax.
+    """
+    phrases = []
+    for ingredient in ingredients:
+        text = ingredient.strip()
+        if text:
+            phrases.append('"' + text.replace('"', '""') + '"')
+    return " OR ".join(phrases)
+
+
+def drop_fts_index(conn) -> None:
+    """Remove the FTS table and its sync triggers."""
+    for trigger in _TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.commit()
+
+
+def build_fts_index(conn) -> int:
+    """
+    Create (or rebuild) the FTS table from the recipes table.
+
+    Args:
+        conn: Writable SQLite connection to the recipe database
+
+    Returns:
+        Number of recipes indexed
+    """
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            Title, Ingredients,
+            content='recipes', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    """)
+    for sql in _TRIGGERS.values():
+        conn.execute(sql)
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    conn.commit()
+
+    return conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+
+def main():
+    # Imported here so the CLI follows the same default path as the app
+    from recommender import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Build the recipes FTS5 index")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the recipe database")
+    parser.add_argument("--drop", action="store_true", help="Drop the FTS index instead of building it")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.drop:
+            drop_fts_index(conn)
+            print(f"Dropped {FTS_TABLE} from {args.db}")
+            return
+
+        start = time.perf_counter()
+        count = build_fts_index(conn)
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {count} recipes into {FTS_TABLE} in {elapsed:.2f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
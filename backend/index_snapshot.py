@@ -0,0 +1,453 @@
+"""
+Binary, memory-mapped snapshot of the search index.
+
+Building the ingredient index means scanning the whole recipes table in
+every worker process, and every worker then keeps its own copy. A snapshot
+stores the same data as flat arrays in one file:
+
+    recipe ids, ingredient-list lengths, diet flags    (one entry per recipe)
+    vocabulary + postings                              (one entry per token)
+    titles + ingredient previews                       (one entry per recipe)
+
+Workers open it with mmap and read the arrays in place, so starting up is
+a file map and all workers share the operating system's single cached copy.
+A snapshot is used only while the database's edit counter (see
+catalog.ensure_edit_tracking) is the one it was built at.
+
+Usage:
+    python index_snapshot.py                 # write data/index.snapshot
+    python index_snapshot.py --out PATH      # somewhere else
+    python index_snapshot.py --db PATH       # from a different database file
+"""
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence, Set as AbstractSet
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from catalog import ensure_edit_tracking, get_catalog_version, get_edit_version
+from diets import DIET_RULES, diet_column, has_diet_columns
+from ingredient_index import IngredientIndex, length_factor
+
+MAGIC = b"CHEFIDX\0"
+FORMAT_VERSION = 2
+
+# Diet flags are one 4-byte bit field per recipe
+DIET_FLAG_BITS = 32
+
+# Magic, format version, length of the JSON metadata that follows
+_HEADER = struct.Struct("<8sII")
+
+# Characters of Ingredients stored per recipe for result previews
+PREVIEW_CHARS = 300
+
+
+def _pad(offset: int) -> int:
+    """Round up to 8 bytes so every array starts aligned."""
+    return (offset + 7) & ~7
+
+
+def _offsets_and_blob(strings: List[str]):
+    """Concatenate UTF-8 strings; offsets[i]:offsets[i + 1] is string i."""
+    offsets = array("I", [0])
+    parts = []
+    total = 0
+    for value in strings:
+        encoded = value.encode("utf-8")
+        parts.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+    return offsets, b"".join(parts)
+
+
+def catalog_fingerprint(conn) -> Dict:
+    """
+    What a snapshot must match to be used with a database.
+
+    Cheap to check at start-up: the edit counter (see
+    catalog.ensure_edit_tracking) changes with every write to the recipes
+    table, in-place edits and diets.py included.
+    """
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM recipes").fetchone()[0]
+    return {
+        "catalog_version": get_catalog_version(conn),
+        "edit_version": get_edit_version(conn),
+        "max_recipe_id": max_id,
+    }
+
+
+def write_snapshot(conn, path: str) -> Dict:
+    """
+    Build the index from a recipe database and write it as a snapshot file.
+
+    The file is written next to `path` and renamed over it, so processes
+    that have the old snapshot mapped keep a complete file.
+
+    Args:
+        conn: SQLite connection to the recipe database
+        path: Snapshot file to write
+
+    Returns:
+        The snapshot's metadata
+    """
+    diets = list(DIET_RULES) if has_diet_columns(conn) else []
+    if len(diets) > DIET_FLAG_BITS:
+        raise ValueError(
+            f"Index snapshots hold flags for at most {DIET_FLAG_BITS} diets, DIET_RULES has {len(diets)}"
+        )
+    flag_columns = "".join(f", {diet_column(diet)}" for diet in diets)
+
+    # Later writes to the recipes table bump the edit counter, which makes
+    # the snapshot stale; read the counter and every row in one transaction
+    ensure_edit_tracking(conn)
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        meta = catalog_fingerprint(conn)
+        index = IngredientIndex.build(conn)
+        rows = conn.execute(f"""
+            SELECT id, Title, substr(Ingredients, 1, ?){flag_columns}
+            FROM recipes ORDER BY id
+        """, (PREVIEW_CHARS,)).fetchall()
+    finally:
+        conn.rollback()
+
+    recipe_ids = array("I")
+    doc_lengths = array("I")
+    diet_flags = array("I")
+    diet_counts = [0] * len(diets)
+    titles = []
+    previews = []
+    for row in rows:
+        recipe_id, title, preview = row[0], row[1], row[2]
+        recipe_ids.append(recipe_id)
+        doc_lengths.append(index.doc_lengths.get(recipe_id, 0))
+        flags = 0
+        for bit, flag in enumerate(row[3:]):
+            if flag:
+                flags |= 1 << bit
+                diet_counts[bit] += 1
+        diet_flags.append(flags)
+        titles.append(title or "")
+        previews.append(preview or "")
+
+    vocabulary = index.vocabulary
+    vocab_offsets, vocab_blob = _offsets_and_blob(vocabulary)
+    posting_offsets = array("I", [0])
+    postings = array("I")
+    for token in vocabulary:
+        postings.extend(sorted(index.postings[token]))
+        posting_offsets.append(len(postings))
+    title_offsets, title_blob = _offsets_and_blob(titles)
+    preview_offsets, preview_blob = _offsets_and_blob(previews)
+
+    sections = {
+        "recipe_ids": recipe_ids.tobytes(),
+        "doc_lengths": doc_lengths.tobytes(),
+        "diet_flags": diet_flags.tobytes(),
+        "vocab_offsets": vocab_offsets.tobytes(),
+        "vocab": vocab_blob,
+        "posting_offsets": posting_offsets.tobytes(),
+        "postings": postings.tobytes(),
+        "title_offsets": title_offsets.tobytes(),
+        "titles": title_blob,
+        "preview_offsets": preview_offsets.tobytes(),
+        "previews": preview_blob,
+    }
+
+    meta.update({
+        "recipe_count": len(recipe_ids),
+        "vocabulary_size": len(vocabulary),
+        "diets": diets,
+        "diet_counts": diet_counts,
+        "preview_chars": PREVIEW_CHARS,
+        "total_length": sum(doc_lengths),
+        "created_at": time.time(),
+    })
+
+    # Sections start after the metadata, whose length depends on the section
+    # offsets; lay out again until the start position stops moving
+    start = 0
+    while True:
+        offset = start
+        meta["sections"] = {}
+        for name, data in sections.items():
+            meta["sections"][name] = [offset, len(data)]
+            offset = _pad(offset + len(data))
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        needed = _pad(_HEADER.size + len(meta_bytes))
+        if needed <= start:
+            break
+        start = needed
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        for name, data in sections.items():
+            f.seek(meta["sections"][name][0])
+            f.write(data)
+    os.replace(tmp_path, path)
+    return meta
+
+
+class _Vocabulary(Sequence):
+    """Sorted tokens, decoded from the mapped file on access (works with bisect)."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class _Postings(Mapping):
+    """Token -> set of recipe ids, read from the mapped postings array."""
+
+    def __init__(self, vocabulary: _Vocabulary, offsets, postings):
+        self._vocabulary = vocabulary
+        self._offsets = offsets
+        self._postings = postings
+
+    def _position(self, token: str) -> int:
+        position = bisect_left(self._vocabulary, token)
+        if position < len(self._vocabulary) and self._vocabulary[position] == token:
+            return position
+        raise KeyError(token)
+
+    def __getitem__(self, token: str) -> Set[int]:
+        position = self._position(token)
+        return set(self._postings[self._offsets[position]:self._offsets[position + 1]])
+
+    def iter_ids(self) -> Iterator[Tuple[str, Sequence]]:
+        """(token, recipe ids) in vocabulary order; the ids are views of the mapped array."""
+        offsets = self._offsets
+        for position, token in enumerate(self._vocabulary):
+            yield token, self._postings[offsets[position]:offsets[position + 1]]
+
+    def doc_freqs(self) -> Dict[str, int]:
+        """Token -> number of recipes, from the offsets alone."""
+        offsets = self._offsets
+        return {token: offsets[position + 1] - offsets[position] for position, token in enumerate(self._vocabulary)}
+
+    def __iter__(self):
+        return iter(self._vocabulary)
+
+    def __len__(self) -> int:
+        return len(self._vocabulary)
+
+
+class _DocLengths(Mapping):
+    """Recipe id -> ingredient-list length, read from the mapped arrays."""
+
+    def __init__(self, recipe_ids, lengths):
+        self._recipe_ids = recipe_ids
+        self._lengths = lengths
+
+    def __getitem__(self, recipe_id: int) -> int:
+        row = bisect_left(self._recipe_ids, recipe_id)
+        if row < len(self._recipe_ids) and self._recipe_ids[row] == recipe_id:
+            return self._lengths[row]
+        raise KeyError(recipe_id)
+
+    def __iter__(self):
+        return iter(self._recipe_ids)
+
+    def __len__(self) -> int:
+        return len(self._recipe_ids)
+
+    def items(self):
+        return zip(self._recipe_ids, self._lengths)
+
+    def values(self):
+        return iter(self._lengths)
+
+
+class _LengthFactors(Mapping):
+    """Recipe id -> BM25 length factor, computed from the mapped lengths on access."""
+
+    def __init__(self, doc_lengths: _DocLengths, average_length: float):
+        self._doc_lengths = doc_lengths
+        self._average_length = average_length
+
+    def __getitem__(self, recipe_id: int) -> float:
+        return length_factor(self._doc_lengths[recipe_id], self._average_length)
+
+    def __iter__(self):
+        return iter(self._doc_lengths)
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+
+class _DietRecipeIds(AbstractSet):
+    """Ids of recipes with one diet flag set, read from the mapped arrays."""
+
+    def __init__(self, recipe_ids, flags, bit: int, count: int):
+        self._recipe_ids = recipe_ids
+        self._flags = flags
+        self._bit = bit
+        self._count = count
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # Results of -, | and & are ordinary sets
+        return set(iterable)
+
+    def __contains__(self, recipe_id) -> bool:
+        row = bisect_left(self._recipe_ids, recipe_id)
+        return (
+            row < len(self._recipe_ids)
+            and self._recipe_ids[row] == recipe_id
+            and bool(self._flags[row] & self._bit)
+        )
+
+    def __iter__(self):
+        bit = self._bit
+        for recipe_id, flags in zip(self._recipe_ids, self._flags):
+            if flags & bit:
+                yield recipe_id
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SnapshotIndex(IngredientIndex):
+    """
+    IngredientIndex backed by a memory-mapped snapshot file.
+
+    Searches work exactly like on an index built from the database;
+    postings, diet sets and BM25 length factors are read from the file
+    instead of living on the heap. The index is read-only: with_changes()
+    returns an ordinary in-memory IngredientIndex.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Snapshot file written by write_snapshot()
+        """
+        super().__init__()
+        if sys.byteorder != "little" or array("I").itemsize != 4:
+            raise ValueError("Index snapshots need a little-endian platform with 4-byte unsigned ints")
+
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, meta_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Chefbot index snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+        self.meta = json.loads(self._mmap[_HEADER.size:_HEADER.size + meta_length])
+
+        view = memoryview(self._mmap)
+
+        def section(name: str, typecode: Optional[str] = None):
+            offset, length = self.meta["sections"][name]
+            data = view[offset:offset + length]
+            return data.cast(typecode) if typecode else data
+
+        self._recipe_ids = section("recipe_ids", "I")
+        self._diet_flags = section("diet_flags", "I")
+        self._title_offsets = section("title_offsets", "I")
+        self._titles = section("titles")
+        self._preview_offsets = section("preview_offsets", "I")
+        self._previews = section("previews")
+
+        doc_lengths = section("doc_lengths", "I")
+        self._snapshot_vocabulary = _Vocabulary(section("vocab_offsets", "I"), section("vocab"))
+        self.postings = _Postings(self._snapshot_vocabulary, section("posting_offsets", "I"), section("postings", "I"))
+        self.doc_lengths = _DocLengths(self._recipe_ids, doc_lengths)
+        self.recipe_count = len(self._recipe_ids)
+        self._total_length = self.meta["total_length"]
+        self._length_factors_dirty = True
+
+    @property
+    def vocabulary(self) -> Sequence:
+        return self._snapshot_vocabulary
+
+    def add_recipe(self, recipe_id: int, ingredients: str) -> None:
+        raise TypeError("Snapshot indexes are read-only; use with_changes()")
+
+    def matches(self, conn) -> bool:
+        """Check that the snapshot was built from the database as it is now."""
+        fingerprint = catalog_fingerprint(conn)
+        if fingerprint["edit_version"] is None:
+            # Edit tracking was removed; in-place edits can't be ruled out
+            return False
+        return all(self.meta.get(key) == value for key, value in fingerprint.items())
+
+    @property
+    def length_factors(self) -> Mapping:
+        return _LengthFactors(self.doc_lengths, self.average_doc_length or 1.0)
+
+    def doc_freqs(self) -> Dict[str, int]:
+        return self.postings.doc_freqs()
+
+    def iter_postings(self) -> Iterator[Tuple[str, Sequence]]:
+        return self.postings.iter_ids()
+
+    def diet_recipe_ids(self, diet: str) -> Optional[AbstractSet]:
+        """Ids of recipes fitting a diet (read from the mapped flags), or None if the snapshot has no flags for it."""
+        if diet not in self.meta["diets"]:
+            return None
+        position = self.meta["diets"].index(diet)
+        return _DietRecipeIds(self._recipe_ids, self._diet_flags, 1 << position, self.meta["diet_counts"][position])
+
+    def result_rows(self, recipe_ids: List[int]) -> Dict[int, Dict]:
+        """id, Title and Preview of recipes, keyed by id (like the database rows)."""
+        rows = {}
+        for recipe_id in recipe_ids:
+            row = bisect_left(self._recipe_ids, recipe_id)
+            if row >= len(self._recipe_ids) or self._recipe_ids[row] != recipe_id:
+                continue
+            title = self._titles[self._title_offsets[row]:self._title_offsets[row + 1]]
+            preview = self._previews[self._preview_offsets[row]:self._preview_offsets[row + 1]]
+            rows[recipe_id] = {
+                'id': recipe_id,
+                'Title': title.tobytes().decode("utf-8"),
+                'Preview': preview.tobytes().decode("utf-8"),
+            }
+        return rows
+
+
+def main():
+    # Imported here so the CLI follows the same default paths as the app
+    from recommender import DB_PATH, INDEX_SNAPSHOT_PATH
+
+    parser = argparse.ArgumentParser(description="Write a memory-mappable snapshot of the search index")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the recipe database")
+    parser.add_argument("--out", default=INDEX_SNAPSHOT_PATH, help="Snapshot file to write")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        start = time.perf_counter()
+        meta = write_snapshot(conn, args.out)
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(args.out) / (1024 * 1024)
+        print(
+            f"Wrote {args.out} ({size_mb:.1f} MB): {meta['recipe_count']} recipes, "
+            f"{meta['vocabulary_size']} tokens, catalog version {meta['catalog_version']} in {elapsed:.2f}s"
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Inverted ingredient index.
+
+Maps every word that appears in a recipe's ingredient list to the set of
+recipe ids containing it, so ingredient searches become posting-list
+lookups instead of a LIKE scan over the whole recipes table.
+
+The index also keeps what weighted ranking needs: document frequencies
+(the size of each posting list) and the number of distinct ingredient
+words per recipe.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+# Words are runs of letters; quantities, units in digits and punctuation are ignored
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+# BM25 parameters for weighted_scores(): K1 caps how much one ingredient
+# can add, B is how strongly long ingredient lists are penalised
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def length_factor(doc_length: int, average_length: float) -> float:
+    """1 / (1 + K1 * length norm), the per-recipe part of a BM25 term weight."""
+    return 1 / (1 + BM25_K1 * (1 - BM25_B + BM25_B * doc_length / average_length))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split ingredient text into lowercase word tokens.
+    EX: "2 cups Chopped Tomatoes" -> ["cups", "chopped", "tomatoes"]
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class IngredientIndex:
+    """
+    Ingredient token -> recipe id inverted index.
+
+    A query ingredient matches a recipe when every word of the ingredient is
+    a prefix of some word in the recipe's ingredients. This keeps the old
+    substring behaviour for the common cases ("tomato" matches "tomatoes")
+    while only touching the postings of matching words.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.recipe_count = 0
+        # Recipe id -> number of distinct ingredient words (the BM25 document length)
+        self.doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        # Recipe id -> BM25 length factor, recomputed after recipes are added
+        self._length_factors: Dict[int, float] = {}
+        self._length_factors_dirty = False
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, conn) -> "IngredientIndex":
+        """
+        Build the index from the recipes table.
+
+        Args:
+            conn: Open SQLite connection to the recipe database
+
+        Returns:
+            A populated IngredientIndex
+        """
+        index = cls()
+        cursor = conn.execute("SELECT id, Ingredients FROM recipes")
+        for recipe_id, ingredients in cursor:
+            index.add_recipe(recipe_id, ingredients or "")
+        return index
+
+    def add_recipe(self, recipe_id: int, ingredients: str) -> None:
+        """Add one recipe's ingredient text to the index."""
+        tokens = set(tokenize(ingredients))
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                self.postings[token] = {recipe_id}
+                self._vocabulary_dirty = True
+            else:
+                posting.add(recipe_id)
+        self.doc_lengths[recipe_id] = len(tokens)
+        self._total_length += len(tokens)
+        self._length_factors_dirty = True
+        self.recipe_count += 1
+
+    def with_changes(self, removed_ids: Set[int], added: Dict[int, str]) -> "IngredientIndex":
+        """
+        Copy of the index with some recipes removed and others (re)added.
+
+        The copy shares every posting list it doesn't change, so updating a
+        few recipes costs one pass over the vocabulary instead of a rebuild,
+        and searches can keep using this index while the copy is made.
+
+        Args:
+            removed_ids: Recipes to drop (deleted, or about to be re-added)
+            added: Recipe id -> ingredient text to add
+
+        Returns:
+            The updated index
+        """
+        index = IngredientIndex()
+        index.postings = dict(self.postings)
+        index.doc_lengths = dict(self.doc_lengths)
+        copied: Set[str] = set()
+
+        stale = set(removed_ids) | set(added)
+        if stale:
+            for token, posting in self.postings.items():
+                if stale.isdisjoint(posting):
+                    continue
+                remaining = posting - stale
+                if remaining:
+                    index.postings[token] = remaining
+                    copied.add(token)
+                else:
+                    del index.postings[token]
+            for recipe_id in stale:
+                index.doc_lengths.pop(recipe_id, None)
+
+        for recipe_id, ingredients in added.items():
+            tokens = set(tokenize(ingredients))
+            for token in tokens:
+                if token not in copied:
+                    index.postings[token] = set(index.postings.get(token, ()))
+                    copied.add(token)
+                index.postings[token].add(recipe_id)
+            index.doc_lengths[recipe_id] = len(tokens)
+
+        index.recipe_count = len(index.doc_lengths)
+        index._total_length = sum(index.doc_lengths.values())
+        index._vocabulary_dirty = True
+        index._length_factors_dirty = True
+        return index
+
+    @property
+    def average_doc_length(self) -> float:
+        """Mean number of distinct ingredient words per recipe."""
+        return self._total_length / self.recipe_count if self.recipe_count else 0.0
+
+    @property
+    def length_factors(self) -> Dict[int, float]:
+        """Recipe id -> 1 / (1 + K1 * length norm), the per-recipe part of a BM25 term weight."""
+        if self._length_factors_dirty:
+            with self._lock:
+                average_length = self.average_doc_length or 1.0
+                self._length_factors = {
+                    recipe_id: length_factor(length, average_length)
+                    for recipe_id, length in self.doc_lengths.items()
+                }
+                self._length_factors_dirty = False
+        return self._length_factors
+
+    def doc_freqs(self) -> Dict[str, int]:
+        """Token -> number of recipes containing it."""
+        return {token: len(posting) for token, posting in self.postings.items()}
+
+    def iter_postings(self) -> Iterator[Tuple[str, Iterable[int]]]:
+        """(token, recipe ids) for every token, in vocabulary order."""
+        for token in self.vocabulary:
+            yield token, self.postings[token]
+
+    def idf(self, doc_freq: int) -> float:
+        """
+        BM25 inverse document frequency of something found in doc_freq recipes.
+        EX: "salt" (in most recipes) -> close to 0, "saffron" (in a few) -> large
+        """
+        n = self.recipe_count
+        return math.log(1 + (n - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """Sorted list of every indexed token."""
+        if self._vocabulary_dirty:
+            with self._lock:
+                self._vocabulary = sorted(self.postings)
+                self._vocabulary_dirty = False
+        return self._vocabulary
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Return every indexed token that starts with prefix."""
+        vocabulary = self.vocabulary
+        position = bisect_left(vocabulary, prefix)
+        matches = []
+        while position < len(vocabulary):
+            token = vocabulary[position]
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+            position += 1
+        return matches
+
+    def lookup(self, ingredient: str) -> Set[int]:
+        """
+        Find the recipes that contain an ingredient.
+
+        Args:
+            ingredient: Ingredient as typed by the user (e.g. "tomato sauce")
+
+        Returns:
+            Set of matching recipe ids
+        """
+        words = tokenize(ingredient)
+        if not words:
+            return set()
+
+        result = None
+        for word in words:
+            matched: Set[int] = set()
+            for token in self._expand_prefix(word):
+                matched |= self.postings[token]
+            result = matched if result is None else result & matched
+            if not result:
+                return set()
+        return result
+
+    def match_counts(self, ingredients: Iterable[str]) -> Dict[int, int]:
+        """
+        Count how many of the given ingredients each recipe contains.
+
+        Args:
+            ingredients: List of ingredient names to search for
+
+        Returns:
+            Dict of recipe id -> number of matching ingredients (only recipes
+            matching at least one ingredient are included)
+        """
+        counts: Dict[int, int] = {}
+        for ingredient in ingredients:
+            for recipe_id in self.lookup(ingredient):
+                counts[recipe_id] = counts.get(recipe_id, 0) + 1
+        return counts
+
+    def weighted_scores(self, ingredients: Iterable[str]) -> Dict[int, Tuple[float, int]]:
+        """
+        Score recipes by how informative their matching ingredients are.
+
+        Each matched ingredient adds its BM25 weight: its idf (rare
+        ingredients count more than "salt"), scaled down for recipes with
+        long ingredient lists. The sum is multiplied by the share of the
+        user's ingredients the recipe covers, so a recipe using everything
+        the user has beats one that only matches a single rare ingredient.
+
+        Args:
+            ingredients: List of ingredient names to search for
+
+        Returns:
+            Dict of recipe id -> (score, number of matching ingredients)
+        """
+        ingredients = list(ingredients)
+        length_factors = self.length_factors
+        scores: Dict[int, float] = {}
+        counts: Dict[int, int] = {}
+
+        for ingredient in ingredients:
+            matches = self.lookup(ingredient)
+            if not matches:
+                continue
+            weight = self.idf(len(matches)) * (BM25_K1 + 1)
+            for recipe_id in matches:
+                scores[recipe_id] = scores.get(recipe_id, 0.0) + weight * length_factors[recipe_id]
+                counts[recipe_id] = counts.get(recipe_id, 0) + 1
+
+        total = len(ingredients)
+        return {
+            recipe_id: (score * counts[recipe_id] / total, counts[recipe_id])
+            for recipe_id, score in scores.items()
+        }
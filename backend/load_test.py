@@ -0,0 +1,352 @@
+"""
+Concurrent load generator that replays chat transcripts.
+
+Each transcript is one session's messages in order. Sessions arrive at
+--rate per second (or back to back with --rate 0) and up to --concurrency
+of them talk to the backend at once; within a session every message waits
+for the previous reply, like a real user. Reports throughput, latency
+percentiles and error rates per intent, and how much memory the server,
+its session store and its search cache grew.
+
+Transcripts are JSONL, one session per line:
+    {"session_id": "optional-id", "messages": ["hi", "I want a vegan meal", "I have tofu", "2"]}
+(lines with a single "message" are grouped by session_id in file order).
+Without --transcripts, --sessions conversations are built from
+DEFAULT_CONVERSATIONS.
+
+Usage:
+    python load_test.py                                  # in-process, Flask test client
+    python load_test.py --transcripts chats.jsonl --concurrency 32 --rate 50
+    python load_test.py --url http://localhost:5000 --server-pid 1234
+    python load_test.py --json report.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CONVERSATIONS = [
+    ["hi", "I have chicken and rice", "1", "2"],
+    ["hello", "I want a vegan meal", "I have tofu, beans and tomato", "3"],
+    ["I want a keto dinner with beef and cauliflower", "1", "clear diet", "I have eggs and cheese", "2"],
+    ["I have brocoli and garlic", "1"],
+    ["I want a vegetarian meal", "I have pasta, spinach and mushrooms", "2", "I have lentils", "1"],
+    ["hi", "plan my meals for the week", "I have salmon and lemon", "4"],
+    ["I have potatoes", "5", "I have potatoes and onion", "1"],
+]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def load_transcripts(path: str) -> List[Tuple[Optional[str], List[str]]]:
+    """Read (session id or None, messages) pairs from a JSONL file."""
+    sessions: Dict[str, List[str]] = {}
+    transcripts = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "messages" in record:
+                transcripts.append((record.get("session_id"), list(record["messages"])))
+            elif "message" in record and record.get("session_id"):
+                if record["session_id"] not in sessions:
+                    sessions[record["session_id"]] = []
+                    transcripts.append((record["session_id"], sessions[record["session_id"]]))
+                sessions[record["session_id"]].append(record["message"])
+            else:
+                raise ValueError(f"{path}:{line_number}: expected 'messages', or 'session_id' and 'message'")
+    return transcripts
+
+
+def default_transcripts(count: int, seed: int = 0) -> List[Tuple[Optional[str], List[str]]]:
+    """`count` sessions picked from DEFAULT_CONVERSATIONS."""
+    rng = random.Random(seed)
+    return [(None, list(rng.choice(DEFAULT_CONVERSATIONS))) for _ in range(count)]
+
+
+class AppTarget:
+    """The Flask app in this process, through one test client per thread."""
+
+    name = "app (in-process)"
+
+    def __init__(self):
+        import app as chat_app  # starts the app's warm-up
+
+        self._app = chat_app
+        self._local = threading.local()
+        chat_app.warmup.wait()
+        # One INFO line per message would drown the report
+        logging.getLogger().setLevel(logging.WARNING)
+
+    def send(self, session_id: str, message: str) -> Tuple[int, Dict]:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.app.test_client()
+        response = client.post('/chat', json={'message': message}, headers={'X-Session-Id': session_id})
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def health(self) -> Dict:
+        return self._app.app.test_client().get('/health').get_json()
+
+    def rss_mb(self) -> Optional[float]:
+        return _rss_mb(os.getpid())
+
+
+class HttpTarget:
+    """A running server (app.py or asgi_app.py) over HTTP."""
+
+    def __init__(self, base_url: str, server_pid: Optional[int] = None, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.server_pid = server_pid
+        self.timeout = timeout
+        self.name = self.base_url
+
+    def send(self, session_id: str, message: str) -> Tuple[int, Dict]:
+        request = urllib.request.Request(
+            self.base_url + "/chat",
+            data=json.dumps({"message": message}).encode(),
+            headers={"Content-Type": "application/json", "X-Session-Id": session_id},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b"{}")
+            except ValueError:
+                return e.code, {}
+
+    def health(self) -> Dict:
+        try:
+            with urllib.request.urlopen(self.base_url + "/health", timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, OSError, ValueError):
+            return {}
+
+    def rss_mb(self) -> Optional[float]:
+        return _rss_mb(self.server_pid) if self.server_pid else None
+
+
+def _session_id(run_prefix: str, transcript_id: Optional[str], index: int) -> str:
+    """
+    Session id to send for a transcript.
+
+    Transcript ids are hashed into ids the server accepts ("s1" or "user 7"
+    would be replaced with a new session on every message) and prefixed
+    with the run, so repeated runs don't continue each other's sessions.
+    """
+    if transcript_id is None:
+        return f"load-{run_prefix}-{index:06d}"
+    digest = hashlib.sha1(str(transcript_id).encode("utf-8")).hexdigest()[:16]
+    return f"load-{run_prefix}-{digest}"
+
+
+def replay(target, transcripts: List[Tuple[Optional[str], List[str]]], concurrency: int,
+           rate: float = 0.0, think_time: float = 0.0, seed: int = 0) -> Dict:
+    """
+    Replay transcripts against a target.
+
+    Args:
+        target: AppTarget or HttpTarget
+        transcripts: (session id or None, messages) pairs
+        concurrency: Sessions talking at the same time
+        rate: New sessions per second, Poisson arrivals (0 = as fast as workers free up)
+        think_time: Seconds between a reply and the session's next message
+        seed: Seed for arrival times
+
+    Returns:
+        Throughput, per-intent latency percentiles and error counts
+    """
+    run_prefix = uuid.uuid4().hex[:8]
+    pending: "queue.Queue[Optional[Tuple[str, List[str]]]]" = queue.Queue(maxsize=concurrency * 2)
+    lock = threading.Lock()
+    # Intent -> [latencies], and intent -> error count
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    sessions_done = 0
+
+    def worker() -> None:
+        nonlocal sessions_done
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            session_id, messages = item
+            for turn, message in enumerate(messages):
+                if turn and think_time:
+                    time.sleep(think_time)
+                start = time.perf_counter()
+                try:
+                    status, body = target.send(session_id, message)
+                except Exception as e:
+                    # Connection errors, non-JSON bodies, ...: count it and keep going
+                    status, body = 0, {"error_details": str(e)}
+                elapsed = time.perf_counter() - start
+
+                intent = (body.get("intent_data") or {}).get("intent", "unknown")
+                failed = status != 200 or body.get("error", False)
+                with lock:
+                    latencies.setdefault(intent, []).append(elapsed)
+                    if failed:
+                        errors[intent] = errors.get(intent, 0) + 1
+            with lock:
+                sessions_done += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    next_arrival = start
+    for index, (session_id, messages) in enumerate(transcripts):
+        if rate > 0:
+            next_arrival += rng.expovariate(rate)
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        pending.put((_session_id(run_prefix, session_id, index), messages))
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    per_intent = {}
+    all_latencies = []
+    for intent, values in sorted(latencies.items()):
+        values.sort()
+        all_latencies.extend(values)
+        per_intent[intent] = _latency_summary(values, errors.get(intent, 0))
+    all_latencies.sort()
+
+    total = len(all_latencies)
+    return {
+        "sessions": sessions_done,
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        "overall": _latency_summary(all_latencies, sum(errors.values())),
+        "per_intent": per_intent,
+    }
+
+
+def _latency_summary(sorted_latencies: List[float], error_count: int) -> Dict:
+    count = len(sorted_latencies)
+    return {
+        "count": count,
+        "errors": error_count,
+        "error_rate": round(error_count / count, 4) if count else 0.0,
+        "p50_ms": round(_percentile(sorted_latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(sorted_latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(sorted_latencies, 0.99) * 1000, 2),
+    }
+
+
+def _memory_snapshot(target) -> Dict:
+    health = target.health()
+    sessions = health.get("sessions", {})
+    cache = health.get("search_cache", {})
+    rss = target.rss_mb()
+    return {
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "sessions": sessions.get("sessions"),
+        "session_bytes": sessions.get("bytes"),
+        "search_cache_entries": cache.get("size"),
+    }
+
+
+def _growth(before: Dict, after: Dict) -> Dict:
+    return {
+        key: round(after[key] - before[key], 2) if before.get(key) is not None and after.get(key) is not None else None
+        for key in before
+    }
+
+
+def print_report(target_name: str, results: Dict, memory: Dict) -> None:
+    print(f"{results['sessions']} sessions, {results['requests']} messages against {target_name} "
+          f"in {results['seconds']}s = {results['requests_per_second']} req/s\n")
+
+    print(f"{'intent':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'err %':>8}")
+    print("-" * 74)
+    rows = list(results["per_intent"].items()) + [("(all)", results["overall"])]
+    for intent, r in rows:
+        print(
+            f"{intent:<20}{r['count']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['errors']:>8}{r['error_rate'] * 100:>7.1f}%"
+        )
+
+    print("\nServer memory (before -> after, growth):")
+    for key, growth in memory["growth"].items():
+        before, after = memory["before"][key], memory["after"][key]
+        if before is None and after is None:
+            print(f"  {key:<22} n/a")
+        else:
+            print(f"  {key:<22} {before} -> {after} ({growth:+})" if growth is not None else f"  {key:<22} {before} -> {after}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay chat transcripts against the backend under concurrent load")
+    parser.add_argument("--transcripts", metavar="JSONL", help="Sessions to replay (default: built-in conversations)")
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions to build when no transcripts are given")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the transcripts this many times")
+    parser.add_argument("--concurrency", type=int, default=16, help="Sessions talking at the same time")
+    parser.add_argument("--rate", type=float, default=0.0, help="New sessions per second (0 = as fast as possible)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a reply and the next message")
+    parser.add_argument("--url", help="Server to load (default: the Flask app in this process)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, to report its memory growth")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for built-in sessions and arrival times")
+    parser.add_argument("--json", metavar="PATH", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.transcripts:
+        transcripts = load_transcripts(args.transcripts)
+    else:
+        transcripts = default_transcripts(args.sessions, args.seed)
+    if args.repeat > 1:
+        # Repeats are new sessions, unless the transcripts name their own
+        transcripts = transcripts * args.repeat
+
+    target = HttpTarget(args.url, args.server_pid) if args.url else AppTarget()
+
+    before = _memory_snapshot(target)
+    results = replay(target, transcripts, args.concurrency, args.rate, args.think_ms / 1000, args.seed)
+    after = _memory_snapshot(target)
+    memory = {"before": before, "after": after, "growth": _growth(before, after)}
+
+    print_report(target.name, results, memory)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"target": target.name, "results": results, "memory": memory}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Sparse recipe x ingredient matrix for vectorized scoring.
+
+Turns the inverted ingredient index into a binary CSR matrix (one row per
+recipe, one column per ingredient token) so match counts for every recipe
+come from one sparse matrix product, and a whole batch of queries can be
+scored with one matrix-matrix product.
+
+Needs numpy and scipy (optional: pip install numpy scipy).
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # The "matrix" search engine is unavailable without them
+    np = None
+    sparse = None
+
+from ingredient_index import IngredientIndex, tokenize
+
+
+def matrix_available() -> bool:
+    """Check whether numpy and scipy are installed."""
+    return np is not None and sparse is not None
+
+
+class IngredientMatrix:
+    """
+    Binary recipe x token matrix with batch top-k scoring.
+
+    Matching follows IngredientIndex: an ingredient matches a recipe when
+    every word of it is a prefix of one of the recipe's ingredient tokens.
+    """
+
+    def __init__(self, matrix, recipe_ids, vocabulary: List[str]):
+        """
+        Args:
+            matrix: CSR matrix, recipes x vocabulary, 1 where the token occurs
+            recipe_ids: Recipe id of each matrix row, ascending
+            vocabulary: Sorted tokens, one per matrix column
+        """
+        self.matrix = matrix
+        self.recipe_ids = recipe_ids
+        self.vocabulary = vocabulary
+        self._diet_masks: Dict[str, "np.ndarray"] = {}
+
+    @classmethod
+    def from_index(cls, index: IngredientIndex) -> "IngredientMatrix":
+        """Build the matrix from an inverted index's postings."""
+        if not matrix_available():
+            raise ImportError("The matrix engine needs numpy and scipy (pip install numpy scipy)")
+
+        vocabulary = list(index.vocabulary)
+        all_ids: Set[int] = set()
+        for _, posting in index.iter_postings():
+            all_ids.update(posting)
+        recipe_ids = np.array(sorted(all_ids), dtype=np.int64)
+        row_of = {recipe_id: row for row, recipe_id in enumerate(recipe_ids.tolist())}
+
+        rows = []
+        cols = []
+        for col, (_, posting) in enumerate(index.iter_postings()):
+            rows.extend(row_of[recipe_id] for recipe_id in posting)
+            cols.extend([col] * len(posting))
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+            shape=(len(recipe_ids), len(vocabulary))
+        )
+        return cls(matrix, recipe_ids, vocabulary)
+
+    def _prefix_columns(self, word: str) -> List[int]:
+        """Columns of every token that starts with word."""
+        start = bisect_left(self.vocabulary, word)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(word):
+            end += 1
+        return list(range(start, end))
+
+    def diet_mask(self, diet: str, recipe_ids: Set[int]) -> "np.ndarray":
+        """Boolean row mask of recipes fitting a diet (cached per diet)."""
+        mask = self._diet_masks.get(diet)
+        if mask is None:
+            mask = np.isin(self.recipe_ids, np.fromiter(recipe_ids, dtype=np.int64, count=len(recipe_ids)))
+            self._diet_masks[diet] = mask
+        return mask
+
+    def match_counts_batch(self, queries: List[List[str]]):
+        """
+        Count matching ingredients for every recipe and every query.
+
+        Args:
+            queries: Ingredient lists, one per query
+
+        Returns:
+            CSC matrix, recipes x queries, of match counts
+        """
+        # Every distinct word becomes one column of the word matrix W
+        # (vocabulary x words), 1 where a token starts with the word
+        word_col: Dict[str, int] = {}
+        w_rows, w_cols = [], []
+        # Every (query, ingredient) becomes one column of the ingredient matrix
+        ingredient_words: List[List[int]] = []
+        ingredient_query: List[int] = []
+
+        for q, ingredients in enumerate(queries):
+            for ingredient in ingredients:
+                words = tokenize(ingredient)
+                if not words:
+                    continue
+                cols = []
+                for word in words:
+                    if word not in word_col:
+                        word_col[word] = len(word_col)
+                        prefix_cols = self._prefix_columns(word)
+                        w_rows.extend(prefix_cols)
+                        w_cols.extend([word_col[word]] * len(prefix_cols))
+                    cols.append(word_col[word])
+                ingredient_words.append(cols)
+                ingredient_query.append(q)
+
+        n_recipes = self.matrix.shape[0]
+        if not ingredient_words:
+            return sparse.csc_matrix((n_recipes, len(queries)), dtype=np.int32)
+
+        word_matrix = sparse.csr_matrix(
+            (np.ones(len(w_rows), dtype=np.int32), (w_rows, w_cols)),
+            shape=(len(self.vocabulary), len(word_col))
+        )
+
+        # Recipe x word: does the recipe have a token starting with the word?
+        word_hits = (self.matrix @ word_matrix).tocsc()
+        word_hits.data[:] = 1
+
+        # Recipe x ingredient: an ingredient matches when all its words hit.
+        # Summing the word hits and keeping entries equal to the word count
+        # does this for all ingredients in one product.
+        i_rows, i_cols = [], []
+        for i, cols in enumerate(ingredient_words):
+            i_rows.extend(cols)
+            i_cols.extend([i] * len(cols))
+        ingredient_matrix = sparse.csr_matrix(
+            (np.ones(len(i_rows), dtype=np.int32), (i_rows, i_cols)),
+            shape=(len(word_col), len(ingredient_words))
+        )
+        ingredient_hits = (word_hits @ ingredient_matrix).tocoo()
+        words_needed = np.array([len(cols) for cols in ingredient_words], dtype=np.int32)
+        matched = ingredient_hits.data == words_needed[ingredient_hits.col]
+        ingredient_hits = sparse.csr_matrix(
+            (np.ones(int(matched.sum()), dtype=np.int32), (ingredient_hits.row[matched], ingredient_hits.col[matched])),
+            shape=(n_recipes, len(ingredient_words))
+        )
+
+        # Recipe x query: sum the matching ingredients of each query
+        query_matrix = sparse.csr_matrix(
+            (np.ones(len(ingredient_query), dtype=np.int32), (np.arange(len(ingredient_query)), ingredient_query)),
+            shape=(len(ingredient_words), len(queries))
+        )
+        return (ingredient_hits @ query_matrix).tocsc()
+
+    def top_k_batch(
+        self,
+        queries: List[List[str]],
+        k: int,
+        mask: Optional["np.ndarray"] = None
+    ) -> List[List[Tuple[int, int]]]:
+        """
+        Best k recipes for each query.
+
+        Args:
+            queries: Ingredient lists, one per query
+            k: Results per query
+            mask: Optional boolean row mask; recipes outside it are skipped
+
+        Returns:
+            For each query, (recipe id, match count) pairs, highest count
+            first and lowest id first among ties
+        """
+        counts = self.match_counts_batch(queries)
+        results = []
+
+        for q in range(len(queries)):
+            start, end = counts.indptr[q], counts.indptr[q + 1]
+            rows = counts.indices[start:end]
+            scores = counts.data[start:end]
+
+            if mask is not None:
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+
+            if len(rows) > k:
+                # Rows are in id order, so a larger key means more matches, then lower id
+                keys = scores.astype(np.int64) * (self.matrix.shape[0] + 1) - rows
+                best = np.argpartition(-keys, k - 1)[:k]
+                rows, scores = rows[best], scores[best]
+
+            order = np.lexsort((rows, -scores))
+            results.append([
+                (int(self.recipe_ids[rows[i]]), int(scores[i]))
+                for i in order
+            ])
+        return results
@@ -0,0 +1,222 @@
+"""
+Request and stage metrics in Prometheus text format.
+
+Counters and histograms are plain Python objects guarded by one lock
+each, so request threads (Flask) and the ASGI thread pool can update
+them concurrently and /metrics always sees consistent totals. Recording
+is a perf_counter() call, a bisect and a dict update; nothing is
+formatted until /metrics is scraped.
+
+Numbers are per process: with several worker processes, let Prometheus
+sum them (one scrape target per worker).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Add amount to the series with these labels."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value of one series (0 if never incremented)."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Labels -> [count per bucket (+ one overflow bucket), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe how long the with-block takes (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """Number of observations in one series."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge (or counter) read from a function when /metrics is scraped."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self._read())}"]
+
+
+class Registry:
+    """The metrics of one process, rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric; returns it, so definitions can be one line."""
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge") -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, read, kind))
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "chefbot_requests_total", "Chat requests by endpoint, intent and HTTP status",
+    ["endpoint", "intent", "status"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "chefbot_request_duration_seconds", "Time to answer a chat message, by intent",
+    ["intent"]
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "chefbot_stage_duration_seconds",
+    "Time spent in each stage of answering a message "
+    "(determine_intent, session_load, search, filter_by_diet, format_response, recipe_lookup, session_save)",
+    ["stage"]
+)
+SEARCH_CANDIDATES = REGISTRY.counter(
+    "chefbot_search_candidates_total", "Recipes matching at least one ingredient, before diet filtering",
+    ["engine"]
+)
+DIET_FILTERED = REGISTRY.counter(
+    "chefbot_diet_filtered_total", "Candidate recipes the diet filter discarded",
+    ["engine"]
+)
+SEARCH_RESULTS = REGISTRY.counter(
+    "chefbot_search_results_total", "Recipes returned by searches (after diet filtering and the result limit)"
+)
+
+
+def stage(name: str):
+    """Context manager timing one stage of a request: `with stage("search"): ...`"""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def observe_request(endpoint: str, intent: str, status: int, seconds: float) -> None:
+    """Count one finished chat request and record its latency."""
+    REQUESTS.inc(endpoint=endpoint, intent=intent, status=status)
+    REQUEST_SECONDS.observe(seconds, intent=intent)
@@ -0,0 +1,351 @@
+"""
+Ingredient normalization.
+
+The parsing and cleaning steps from preprocessing.ipynb as an importable
+module, plus a CLI that stores every recipe's ingredients as canonical
+ingredient ids:
+
+    ingredients(id, name)                       one row per canonical name
+    recipe_ingredients(recipe_id, ingredient_id)
+
+"2 cups Chopped Tomatoes" and "1 tomato, diced" both become "tomato", so
+the "normalized" search engine matches integer ids instead of scanning
+the raw Ingredients text.
+
+Usage:
+    python preprocessing.py              # (re)build the ingredient tables
+    python preprocessing.py --db PATH    # use a different database file
+"""
+import argparse
+import ast
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# =====================
+# Parsing + cleaning (from preprocessing.ipynb)
+# =====================
+
+def ensure_ingredient_list(value) -> List[str]:
+    """
+    Returns a Python list of ingredient strings.
+    Accepts:
+        - list
+        - string list repr "['a','b']"
+        - comma / newline / semicolon separated string "a, b, c"
+    """
+    if isinstance(value, list):
+        return value
+    if value is None:
+        return []
+    if isinstance(value, str):
+        s = value.strip()
+
+        # Try literal list "[...]"
+        if s.startswith("["):
+            try:
+                parsed = ast.literal_eval(s)
+                if isinstance(parsed, list):
+                    return [str(x) for x in parsed]
+            except (ValueError, SyntaxError):
+                pass
+
+        # fallback: split by commas
+        return [p.strip() for p in re.split(r",|\n|;", s) if p.strip()]
+
+    return [str(value)]
+
+
+# Allowed chars (keep fractions, slash, hyphen, parentheses, units)
+_allowed_chars_re = re.compile(r"[^0-9a-zA-Z\s\.,\-/()¼½¾⅓⅔⅛⅜⅝⅞%°–—']")
+
+
+def normalize_ingredient_item(text) -> str:
+    """
+    Lowercase, normalize unicode, and remove unwanted symbols
+    while keeping quantities (½, 1/3), slashes, hyphens, etc.
+    """
+    if text is None:
+        return ""
+
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    text = _allowed_chars_re.sub(" ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+# Extract ingredient names (strip quantity + unit)
+UNITS = {
+    "cup","cups","c","tbsp","tbsp.","tablespoon","tablespoons",
+    "tbs","tbs.","tsp","tsp.","teaspoon","teaspoons","t",
+    "oz","oz.","ounce","ounces","lb","lb.","lbs","lbs.","pound","pounds",
+    "g","g.","gram","grams","kg","kg.","kilogram","kilograms",
+    "ml","ml.","l","l.","liter","liters","pinch","dash","clove","cloves",
+    "slice","slices","package","packages","can","cans","stick","sticks",
+    "bunch","sprig","sprigs","piece","pieces","bag","bags","box","boxes",
+    "quart","quart.","pint","pint.","large","small","medium","jar","jars",
+    "container","containers","fillet","fillets","pkg","pkgs"
+}
+
+_num_re = re.compile(r"^\d+([.,]\d+)?$")
+_fraction_re = re.compile(r"^\d+\/\d+$")
+_unicode_frac_re = re.compile(r"^[¼½¾⅓⅔⅛⅜⅝⅞]+$")
+_range_re = re.compile(r"^\d+[-–—]\d+$")
+_digitstart_re = re.compile(r"^\d")
+
+_strip_punct = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def extract_ingredient_name(ingredient: str) -> str:
+    """
+    Remove quantities + units from the beginning of an ingredient string.
+    Example:
+        '1 1/2 cups chopped onions' → 'chopped onions'
+        '3–4 lb. pork shoulder' → 'pork shoulder'
+    """
+    if not ingredient:
+        return ""
+
+    tokens = ingredient.split()
+    i = 0
+    n = len(tokens)
+
+    while i < n:
+        tok = tokens[i].strip(",.()").lower()
+
+        # Numbers / decimals / fractions / unicode fractions / ranges
+        if (_num_re.match(tok)
+            or _fraction_re.match(tok)
+            or _unicode_frac_re.match(tok)
+            or _range_re.match(tok)
+            or _digitstart_re.match(tok)):
+            i += 1
+            continue
+
+        # Units (cup, tbsp, lb, etc.)
+        if tok.rstrip(".") in UNITS:
+            i += 1
+            continue
+
+        # Found ingredient name
+        break
+
+    name = " ".join(tokens[i:]).strip()
+    name = _strip_punct.sub("", name)
+    return name.lower()
+
+
+# =====================
+# Canonical ingredient names
+# =====================
+
+# Preparation words dropped from the front of a name ("chopped onions" -> "onions")
+PREPARATION_WORDS = {
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed",
+    "ground", "fresh", "freshly", "dried", "frozen", "finely", "roughly",
+    "thinly", "coarsely", "peeled", "cooked", "melted", "softened", "beaten",
+}
+
+# Words that end in "s" but are not plurals
+SINGULAR_WORDS = {
+    "asparagus", "couscous", "hummus", "molasses", "swiss", "grits",
+    "bass", "citrus", "octopus", "hibiscus",
+}
+
+_word_re = re.compile(r"[a-z]+")
+
+
+def singularize(word: str) -> str:
+    """
+    Fold a plural ingredient word to its singular.
+    EX: "tomatoes" -> "tomato", "berries" -> "berry", "onions" -> "onion"
+    """
+    if word in SINGULAR_WORDS or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes") or word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def canonical_words(text: str) -> List[str]:
+    """Lowercase, singular words of a name. EX: "Red Bell Peppers" -> ["red", "bell", "pepper"]"""
+    return [singularize(word) for word in _word_re.findall(text.lower())]
+
+
+def canonical_ingredient(ingredient: str) -> str:
+    """
+    Canonical name of one raw ingredient line.
+    EX: "2 cups chopped tomatoes, drained (optional)" -> "tomato"
+
+    Quantities and units are stripped, then anything after the first comma
+    or in parentheses, then leading preparation words; the remaining words
+    are singularized.
+    """
+    name = extract_ingredient_name(normalize_ingredient_item(ingredient))
+    name = re.sub(r"\([^)]*\)", " ", name).split(",")[0]
+    words = canonical_words(name)
+    while words and words[0] in PREPARATION_WORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+def recipe_ingredient_names(ingredients) -> List[str]:
+    """Distinct canonical ingredient names of a recipe's Ingredients value, in order."""
+    names = []
+    for item in ensure_ingredient_list(ingredients):
+        name = canonical_ingredient(item)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+# =====================
+# Ingredient tables
+# =====================
+
+def has_ingredient_tables(conn) -> bool:
+    """Check whether the normalized ingredient tables exist."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('ingredients', 'recipe_ingredients')"
+    ).fetchall()
+    return len(rows) == 2
+
+
+def create_ingredient_tables(conn) -> None:
+    """Create the ingredient tables and their indexes if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    # The primary key serves "ingredients of a recipe"; the second index serves
+    # "recipes with an ingredient", which is what search uses
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL,
+            PRIMARY KEY (recipe_id, ingredient_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient
+        ON recipe_ingredients(ingredient_id, recipe_id)
+    """)
+
+
+def _ingredient_id(conn, name: str, ids: Dict[str, int]) -> int:
+    ingredient_id = ids.get(name)
+    if ingredient_id is None:
+        ingredient_id = conn.execute("INSERT INTO ingredients (name) VALUES (?)", (name,)).lastrowid
+        ids[name] = ingredient_id
+    return ingredient_id
+
+
+def store_recipe_ingredients(conn, recipes: Iterable[Tuple[int, str]]) -> int:
+    """
+    Replace the normalized ingredients of some recipes.
+
+    Args:
+        conn: Writable SQLite connection (tables must exist)
+        recipes: (recipe id, raw Ingredients text) pairs
+
+    Returns:
+        Number of recipes stored
+    """
+    ids = {name: ingredient_id for ingredient_id, name in conn.execute("SELECT id, name FROM ingredients")}
+    count = 0
+    for recipe_id, ingredients in recipes:
+        conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+        conn.executemany(
+            "INSERT INTO recipe_ingredients (recipe_id, ingredient_id) VALUES (?, ?)",
+            [(recipe_id, _ingredient_id(conn, name, ids)) for name in recipe_ingredient_names(ingredients)]
+        )
+        count += 1
+    return count
+
+
+def build_ingredient_tables(conn) -> Tuple[int, int]:
+    """
+    Rebuild the ingredient tables from the recipes table.
+
+    Returns:
+        (number of recipes, number of distinct ingredients)
+    """
+    conn.execute("DROP TABLE IF EXISTS recipe_ingredients")
+    conn.execute("DROP TABLE IF EXISTS ingredients")
+    create_ingredient_tables(conn)
+
+    recipes = conn.execute("SELECT id, Ingredients FROM recipes").fetchall()
+    count = store_recipe_ingredients(conn, recipes)
+    conn.commit()
+
+    ingredient_count = conn.execute("SELECT COUNT(*) FROM ingredients").fetchone()[0]
+    return count, ingredient_count
+
+
+class IngredientVocabulary:
+    """
+    In-memory copy of the ingredients table for turning user input into ids.
+
+    A user ingredient matches every canonical ingredient whose name contains
+    all of its words, so "chicken" finds "chicken", "chicken breast" and
+    "boneless chicken thigh".
+    """
+
+    def __init__(self, names: Dict[int, str]):
+        """
+        Args:
+            names: Ingredient id -> canonical name
+        """
+        self.names = names
+        self._ids_by_word: Dict[str, Set[int]] = {}
+        for ingredient_id, name in names.items():
+            for word in name.split():
+                self._ids_by_word.setdefault(word, set()).add(ingredient_id)
+
+    @classmethod
+    def load(cls, conn) -> "IngredientVocabulary":
+        """Load the ingredients table."""
+        return cls({ingredient_id: name for ingredient_id, name in conn.execute("SELECT id, name FROM ingredients")})
+
+    def lookup(self, ingredient: str) -> Set[int]:
+        """
+        Ids of the canonical ingredients a user ingredient refers to.
+        EX: "Tomatoes" -> ids of "tomato", "cherry tomato", "tomato sauce", ...
+        """
+        result: Optional[Set[int]] = None
+        for word in canonical_words(ingredient):
+            ids = self._ids_by_word.get(word, set())
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return set(result or ())
+
+
+def main():
+    # Imported here so the CLI follows the same default path as the app
+    from recommender import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Store canonical ingredient ids for every recipe")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the recipe database")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        start = time.perf_counter()
+        recipe_count, ingredient_count = build_ingredient_tables(conn)
+        elapsed = time.perf_counter() - start
+        print(f"Stored {ingredient_count} canonical ingredients for {recipe_count} recipes in {elapsed:.2f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Opt-in per-request profiling.
+
+A chat request runs under cProfile when
+  - it asks for it (X-Chefbot-Profile: 1 header or ?profile=1) and
+    CHEFBOT_PROFILE_ENABLED=1, or
+  - it is picked by sampling (CHEFBOT_PROFILE_SAMPLE_RATE, e.g. 0.01 for 1%).
+
+Each profiled request writes <timestamp>-<request id>-<pid>-<n>.prof to
+CHEFBOT_PROFILE_DIR; the request id is taken from X-Request-Id (or
+generated) and returned in the X-Request-Id response header. Requests that
+are not profiled pay for one random() call at most. One request is profiled
+at a time; requests picked while another is being profiled run normally.
+
+Both servers profile the same work: the session, search and reply part of
+a request (chat_service.handle_chat / handle_chat_batch), not body parsing
+or intent detection.
+
+Aggregate the dumps into a hot-function report with:
+    python profiling.py                          # top 25 by cumulative time
+    python profiling.py --top 40 --sort tottime
+    python profiling.py --match 1a2b3c           # only some request ids
+"""
+import argparse
+import cProfile
+import glob
+import itertools
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Header/query flags a client uses to ask for a profile
+PROFILE_HEADER = 'X-Chefbot-Profile'
+PROFILE_QUERY_PARAM = 'profile'
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# Requests may only ask for profiling when this is on
+PROFILE_ENABLED = os.environ.get('CHEFBOT_PROFILE_ENABLED', '0') == '1'
+
+# Fraction of all chat requests profiled without being asked (0 = none)
+PROFILE_SAMPLE_RATE = float(os.environ.get('CHEFBOT_PROFILE_SAMPLE_RATE', '0'))
+
+PROFILE_DIR = os.environ.get(
+    'CHEFBOT_PROFILE_DIR',
+    os.path.join(os.path.dirname(__file__), 'data', 'profiles')
+)
+
+T = TypeVar("T")
+
+_unsafe_chars_re = re.compile(r"[^A-Za-z0-9_-]")
+
+# Held while a request is being profiled
+_profile_lock = threading.Lock()
+
+# Numbers profile files written by this process
+_profile_counter = itertools.count(1)
+
+
+def is_flag_set(value: Optional[str]) -> bool:
+    """Whether a header/query value turns profiling on ("1", "true", "yes")."""
+    return value is not None and value.strip().lower() in ("1", "true", "yes")
+
+
+def should_profile(requested: bool) -> bool:
+    """
+    Decide whether to profile a request.
+
+    Args:
+        requested: The client sent the profile header or query flag
+
+    Returns:
+        True if the request asked and profiling is enabled, or it was sampled
+    """
+    if requested and PROFILE_ENABLED:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def request_id(value: Optional[str] = None) -> str:
+    """A request id safe to use in a file name: the client's (cleaned up) or a new one."""
+    if value:
+        cleaned = _unsafe_chars_re.sub("", value)[:64]
+        if cleaned:
+            return cleaned
+    return uuid.uuid4().hex
+
+
+def profile_path(request_id: str, profile_dir: str = PROFILE_DIR) -> str:
+    """
+    Where the profile of a request is written.
+
+    The process id and a per-process counter keep profiles of requests that
+    reuse an X-Request-Id within the same second from overwriting each other.
+    """
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request_id}-{os.getpid()}-{next(_profile_counter)}.prof"
+    return os.path.join(profile_dir, name)
+
+
+def profile_call(request_id: str, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run func(*args, **kwargs) under cProfile and write the profile.
+
+    One request is profiled at a time: Python 3.12+ allows only one active
+    profiler per interpreter, so a request that comes in while another is
+    being profiled simply runs unprofiled. Call this in the thread that does
+    the request's work; before 3.12 only that thread is recorded, from 3.12
+    on the profile also includes whatever other threads ran meanwhile. A
+    profile that can't be written is logged; the request still gets its result.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        logger.info(f"Not profiling request {request_id}: another request is being profiled")
+        return func(*args, **kwargs)
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # A profiler outside this module is active
+            logger.info(f"Not profiling request {request_id}: {e}")
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _write_profile(profiler, request_id, time.perf_counter() - start)
+    finally:
+        _profile_lock.release()
+
+
+def _write_profile(profiler: cProfile.Profile, request_id: str, elapsed: float) -> None:
+    path = profile_path(request_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        logger.info(f"Profiled request {request_id} ({elapsed * 1000:.1f} ms) -> {path}")
+    except OSError as e:
+        logger.warning(f"Could not write profile for request {request_id}: {e}")
+
+
+def aggregate_profiles(paths: List[str]) -> Optional[pstats.Stats]:
+    """Merge profile dumps into one Stats (None if there are none)."""
+    stats = None
+    for path in paths:
+        try:
+            if stats is None:
+                stats = pstats.Stats(path)
+            else:
+                stats.add(path)
+        except (OSError, TypeError, EOFError) as e:
+            logger.warning(f"Skipping unreadable profile {path}: {e}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the hottest functions across profiled requests")
+    parser.add_argument("--dir", default=PROFILE_DIR, help="Directory with .prof dumps")
+    parser.add_argument("--match", default="", help="Only dumps whose file name contains this (e.g. a request id)")
+    parser.add_argument("--top", type=int, default=25, help="Number of functions to show")
+    parser.add_argument(
+        "--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"],
+        help="Sort by time including callees, time in the function itself, or calls"
+    )
+    args = parser.parse_args()
+
+    paths = sorted(path for path in glob.glob(os.path.join(args.dir, "*.prof")) if args.match in os.path.basename(path))
+    stats = aggregate_profiles(paths)
+    if stats is None:
+        print(f"No profiles in {args.dir}")
+        return
+
+    print(f"{len(paths)} profiled requests from {args.dir}\n")
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,1060 @@
-import sqlite3
 import os
-from typing import List, Dict, Optional
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional, Set, Tuple
+
+from db_pool import ConnectionPool
+from diets import DIET_RULES, diet_column, has_diet_columns, resolve_diets, classify_text, recipe_text
+from ingredient_index import IngredientIndex
+from fts_index import FTS_TABLE, BM25_WEIGHTS, build_match_query, has_fts_index
+from matrix_index import IngredientMatrix, matrix_available
+from spelling import TrigramIndex
+from preprocessing import IngredientVocabulary, canonical_words, has_ingredient_tables
+from catalog import changes_since, get_catalog_version
+from index_snapshot import SnapshotIndex
+from metrics import DIET_FILTERED, SEARCH_CANDIDATES, stage
+
+logger = logging.getLogger(__name__)
+
+# Path to the SQLite database (CHEFBOT_DB_PATH points the app at another
+# catalog, e.g. one written by synthetic_catalog.py)
+DB_PATH = os.environ.get('CHEFBOT_DB_PATH', os.path.join(os.path.dirname(__file__), 'data', '5k-recipes.db'))
+
+# Default search engine: "index" (inverted ingredient index), "fts" (SQLite FTS5
+# with bm25 ranking, needs `python fts_index.py`), "matrix" (sparse matrix
+# scoring, needs numpy + scipy), "normalized" (canonical ingredient ids, needs
+# `python preprocessing.py`) or "like" (table scan)
+SEARCH_ENGINE = os.environ.get('CHEFBOT_SEARCH_ENGINE', 'index')
+
+# Default ranking: "count" (most matching ingredients first) or "idf"
+# (BM25-weighted, so rare ingredients count more than common ones)
+RANKING_MODES = ("count", "idf")
+RANKING = os.environ.get('CHEFBOT_RANKING', 'count')
+
+# Memory-mapped index snapshot written by `python index_snapshot.py`; used
+# instead of building the ingredient index when it matches the database
+INDEX_SNAPSHOT_PATH = os.environ.get(
+    'CHEFBOT_INDEX_SNAPSHOT',
+    os.path.join(os.path.dirname(__file__), 'data', 'index.snapshot')
+)
+
+# Read-only connection pool settings
+DB_POOL_SIZE = int(os.environ.get('CHEFBOT_DB_POOL_SIZE', '8'))
+DB_IMMUTABLE = os.environ.get('CHEFBOT_DB_IMMUTABLE', '0') == '1'
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# Search results carry only an ingredient preview; full recipes are loaded
+# with get_recipe_by_id() when a user opens one
+PREVIEW_LINES = 3
+PREVIEW_CHARS = 300
+
+# Recipe dict key -> recipes table column
+RECIPE_COLUMNS = {
+    'title': 'Title',
+    'ingredients': 'Ingredients',
+    'instructions': 'Instructions',
+}
+
+# Ids per IN (...) query; stays well under SQLite's bound-parameter limit
+RECIPE_ID_CHUNK_SIZE = 500
+
+# Inverted ingredient index, built lazily on the first search
+_ingredient_index: Optional[IngredientIndex] = None
+_ingredient_index_lock = threading.Lock()
+
+# Sparse recipe x ingredient matrix, built lazily from the index for the matrix engine
+_ingredient_matrix: Optional[IngredientMatrix] = None
+_ingredient_matrix_lock = threading.Lock()
+
+# Canonical ingredient names/ids for the normalized engine, loaded lazily
+_ingredient_vocabulary: Optional[IngredientVocabulary] = None
+_ingredient_vocabulary_lock = threading.Lock()
+
+# Trigram index over the ingredient vocabulary for spelling correction, built lazily
+_spelling_index: Optional[TrigramIndex] = None
+_spelling_index_lock = threading.Lock()
+
+# Diet -> ids of recipes classified as fitting it, loaded lazily from the is_<diet> columns
+_diet_recipe_ids: Dict[str, Set[int]] = {}
+_diet_recipe_ids_lock = threading.Lock()
+
+# Search result cache settings (size 0 disables the cache)
+SEARCH_CACHE_SIZE = int(os.environ.get('CHEFBOT_SEARCH_CACHE_SIZE', '1024'))
+SEARCH_CACHE_TTL = float(os.environ.get('CHEFBOT_SEARCH_CACHE_TTL', '300'))
+
+
+class SearchCache:
+    """
+    Bounded LRU cache of search results with a time-to-live.
+    
+    Thread-safe; keeps hit/miss/eviction counters for monitoring.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+    
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        """Return a copy of the cached results for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        # Copies, so callers can't change what later requests get
+        return [dict(recipe) for recipe in results]
+    
+    def put(self, key: Tuple, results: List[Dict]) -> None:
+        """Store results under key, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        
+        results = [dict(recipe) for recipe in results]
+        with self._lock:
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+    
+    def clear(self) -> None:
+        """Drop every entry (e.g. after the database changed)."""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+    
+    def invalidate_where(self, is_stale: Callable[[Tuple, List[Dict]], bool]) -> int:
+        """
+        Drop the entries for which is_stale(key, results) is true.
+        
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [key for key, (_, results) in self._entries.items() if is_stale(key, results)]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+        return len(stale)
+    
+    def stats(self) -> Dict:
+        """Counters plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        stats["ttl"] = self.ttl
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_search_cache = SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+# (path, mtime, size) of the database files the cached data was built from
+_db_signature: Optional[Tuple] = None
+_db_signature_lock = threading.Lock()
+
+# Engines whose matches follow the ingredient index's prefix rules (normalized
+# through canonical words), so catalog changes can invalidate only the cached
+# searches they affect; entries from other engines are dropped on any change
+PREFIX_MATCH_ENGINES = {"index", "matrix", "normalized"}
+
+# Catalog version (see catalog.py) the in-memory indexes and cache are up to date with
+_catalog_version: Optional[int] = None
+
+# Fallback warnings already logged (missing tables/packages), so they aren't repeated per search
+_warned: Set[str] = set()
+_warned_lock = threading.Lock()
+
+
+def _current_db_signature() -> Tuple:
+    """Identify the current state of the database file (and its WAL, if any)."""
+    signature = [DB_PATH]
+    for path in (DB_PATH, DB_PATH + '-wal'):
+        try:
+            stat = os.stat(path)
+            signature.extend([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            signature.extend([None, None])
+    return tuple(signature)
+
+
+def _check_db_changed() -> None:
+    """
+    Bring cached results and in-memory indexes up to date if the database file changed.
+    
+    When the change came from catalog.py ingests this process can follow
+    (the change log goes back to our catalog version), only the changed
+    recipes are patched in. Anything else, including edits that didn't go
+    through catalog.py (direct SQL, re-running diets.py, fts_index.py or
+    preprocessing.py), drops everything to be rebuilt.
+    """
+    global _db_signature, _catalog_version
+    
+    signature = _current_db_signature()
+    if signature == _db_signature:
+        return
+    
+    with _db_signature_lock:
+        if signature == _db_signature:
+            return
+        
+        conn = get_db_connection()
+        try:
+            changes = None if _catalog_version is None else changes_since(conn, _catalog_version)
+            version = changes[0] if changes is not None else get_catalog_version(conn)
+        finally:
+            release_db_connection(conn)
+        
+        if _db_signature is not None:
+            # The file changed but the catalog version didn't: not an ingest
+            if changes is not None and changes[1]:
+                _apply_catalog_changes(changes[1])
+                logger.info(f"Applied changes to {len(changes[1])} recipes (catalog version {version})")
+            else:
+                logger.info("Recipe database changed; clearing search cache and indexes")
+                _reset_derived_data()
+        _catalog_version = version
+        _db_signature = signature
+
+
+def _warn_once(message: str) -> None:
+    """Log a fallback warning the first time it happens (again after the database changes)."""
+    with _warned_lock:
+        if message in _warned:
+            return
+        _warned.add(message)
+    logger.warning(message)
+
+
+def _reset_derived_data() -> None:
+    """Drop the search cache and every in-memory index; they are rebuilt on next use."""
+    global _ingredient_index, _ingredient_matrix, _spelling_index, _ingredient_vocabulary
+    
+    _search_cache.clear()
+    with _warned_lock:
+        _warned.clear()
+    with _ingredient_index_lock:
+        _ingredient_index = None
+    with _ingredient_matrix_lock:
+        _ingredient_matrix = None
+    with _spelling_index_lock:
+        _spelling_index = None
+    with _ingredient_vocabulary_lock:
+        _ingredient_vocabulary = None
+    with _diet_recipe_ids_lock:
+        _diet_recipe_ids.clear()
+
+
+def _apply_catalog_changes(recipe_ids: Set[int]) -> None:
+    """
+    Update in-memory data for recipes that were added, updated or deleted.
+    
+    Updated structures are built next to the old ones and swapped in, so
+    searches running meanwhile keep using a consistent old version.
+    """
+    global _ingredient_index, _ingredient_matrix, _spelling_index, _ingredient_vocabulary
+    
+    # Current state of the changed recipes; ids that are gone were deleted
+    current = {
+        recipe['id']: recipe['ingredients'] or ''
+        for recipe in get_recipes_by_ids(sorted(recipe_ids), columns=['ingredients'])
+    }
+    
+    with _ingredient_index_lock:
+        if _ingredient_index is not None:
+            _ingredient_index = _ingredient_index.with_changes(recipe_ids, current)
+    
+    # Cheap to rebuild from the index / tables, so just drop them
+    with _ingredient_matrix_lock:
+        _ingredient_matrix = None
+    with _spelling_index_lock:
+        _spelling_index = None
+    with _ingredient_vocabulary_lock:
+        _ingredient_vocabulary = None
+    
+    with _diet_recipe_ids_lock:
+        diets = list(_diet_recipe_ids)
+    if diets:
+        fitting = _load_diet_flags(list(current), diets)
+        with _diet_recipe_ids_lock:
+            for diet in diets:
+                if diet in _diet_recipe_ids:
+                    _diet_recipe_ids[diet] = (_diet_recipe_ids[diet] - recipe_ids) | fitting[diet]
+    
+    # A cached search is stale if a changed recipe was in its results or
+    # now matches one of its ingredients. Matching is checked with the
+    # ingredient index's prefix rules, which only hold for the engines in
+    # PREFIX_MATCH_ENGINES; "fts" (porter stems) and "like" (substrings)
+    # entries always go, as do "idf" ones, whose scores depend on the
+    # whole catalog.
+    changed = IngredientIndex()
+    for recipe_id, ingredients in current.items():
+        changed.add_recipe(recipe_id, ingredients + ' ' + ' '.join(canonical_words(ingredients)))
+    
+    def is_stale(key: Tuple, results: List[Dict]) -> bool:
+        if key[4] == "idf" or key[3] not in PREFIX_MATCH_ENGINES:
+            return True
+        if any(recipe['id'] in recipe_ids for recipe in results):
+            return True
+        return any(
+            changed.lookup(ingredient) or changed.lookup(' '.join(canonical_words(ingredient)))
+            for ingredient in key[0]
+        )
+    
+    _search_cache.invalidate_where(is_stale)
+
+
+def _load_diet_flags(recipe_ids: List[int], diets: List[str]) -> Dict[str, Set[int]]:
+    """Diet -> which of the given recipes fit it, read from the is_<diet> columns."""
+    fitting: Dict[str, Set[int]] = {diet: set() for diet in diets}
+    columns = ", ".join(diet_column(diet) for diet in diets)
+    
+    conn = get_db_connection()
+    try:
+        for start in range(0, len(recipe_ids), RECIPE_ID_CHUNK_SIZE):
+            chunk = recipe_ids[start:start + RECIPE_ID_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in conn.execute(f"SELECT id, {columns} FROM recipes WHERE id IN ({placeholders})", chunk):
+                for diet, flag in zip(diets, row[1:]):
+                    if flag:
+                        fitting[diet].add(row[0])
+    finally:
+        release_db_connection(conn)
+    return fitting
+
+
+def get_search_cache_stats() -> Dict:
+    """Hit/miss/eviction counters of the search result cache."""
+    return _search_cache.stats()
+
+
+def _search_cache_key(
+    ingredients: List[str],
+    max_results: int,
+    engine: str,
+    diets: List[str],
+    ranking: str = "count"
+) -> Tuple:
+    """Cache key that ignores ingredient order, case and surrounding spaces."""
+    normalized = tuple(sorted(ingredient.strip().lower() for ingredient in ingredients))
+    return (normalized, tuple(sorted(diets)), max_results, engine, ranking)
+
+
+def get_pool() -> ConnectionPool:
+    """Return the shared read-only connection pool for DB_PATH."""
+    global _pool
+    
+    with _pool_lock:
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH, size=DB_POOL_SIZE, immutable=DB_IMMUTABLE)
+        return _pool
+
+
+def get_pool_stats() -> Dict:
+    """Size and usage counters of the connection pool."""
+    return get_pool().stats()
 
-# Path to the SQLite database
-DB_PATH = os.path.join(os.path.dirname(__file__), 'data', '5k-recipes.db')
 
 def get_db_connection():
-    """Create a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # This allows us to access columns by name
-    return conn
+    """
+    Borrow a read-only database connection from the pool.
+    
+    Rows can be accessed by column name. Hand the connection back with
+    release_db_connection() instead of closing it.
+    """
+    return get_pool().acquire()
+
+
+def release_db_connection(conn) -> None:
+    """Return a connection borrowed with get_db_connection() to the pool."""
+    get_pool().release(conn)
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """
+    Return the shared inverted ingredient index, loading it on first use.
+    
+    Maps the index snapshot at INDEX_SNAPSHOT_PATH when it was built from
+    the database as it is now; otherwise builds the index from the recipes
+    table (once per process).
+    """
+    global _ingredient_index
+    
+    if _ingredient_index is None:
+        with _ingredient_index_lock:
+            if _ingredient_index is None:
+                start = time.perf_counter()
+                conn = get_db_connection()
+                try:
+                    index = _load_index_snapshot(conn)
+                    if index is None:
+                        index = IngredientIndex.build(conn)
+                        source = "recipes table"
+                    else:
+                        source = INDEX_SNAPSHOT_PATH
+                finally:
+                    release_db_connection(conn)
+                _ingredient_index = index
+                logger.info(
+                    f"Loaded ingredient index for {index.recipe_count} recipes from {source} "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+    return _ingredient_index
+
+
+def _load_index_snapshot(conn) -> Optional[SnapshotIndex]:
+    """Map the index snapshot if there is one and it matches the database."""
+    if not os.path.exists(INDEX_SNAPSHOT_PATH):
+        return None
+    try:
+        snapshot = SnapshotIndex(INDEX_SNAPSHOT_PATH)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring index snapshot {INDEX_SNAPSHOT_PATH}: {e}")
+        return None
+    if not snapshot.matches(conn):
+        logger.warning(f"Index snapshot {INDEX_SNAPSHOT_PATH} is out of date (run index_snapshot.py); building from the database")
+        return None
+    return snapshot
+
+
+def _current_snapshot() -> Optional[SnapshotIndex]:
+    """The mapped snapshot, if the current index is one (it stops being one once recipes change)."""
+    index = _ingredient_index
+    return index if isinstance(index, SnapshotIndex) else None
+
+
+def get_ingredient_vocabulary(conn=None) -> IngredientVocabulary:
+    """
+    Return the canonical ingredient vocabulary, loading it from the ingredients table on first use.
+    
+    Args:
+        conn: Connection the caller already holds, used for the load instead
+            of taking a second one from the pool (which could wait forever
+            once every pooled connection is held by a caller waiting here)
+    """
+    global _ingredient_vocabulary
+    
+    if _ingredient_vocabulary is None:
+        with _ingredient_vocabulary_lock:
+            if _ingredient_vocabulary is None:
+                if conn is not None:
+                    _ingredient_vocabulary = IngredientVocabulary.load(conn)
+                else:
+                    conn = get_db_connection()
+                    try:
+                        _ingredient_vocabulary = IngredientVocabulary.load(conn)
+                    finally:
+                        release_db_connection(conn)
+    return _ingredient_vocabulary
+
+
+def get_spelling_index() -> TrigramIndex:
+    """Return the shared trigram spelling index, building it from the ingredient index on first use."""
+    global _spelling_index
+    
+    if _spelling_index is None:
+        index = get_ingredient_index()
+        with _spelling_index_lock:
+            if _spelling_index is None:
+                _spelling_index = TrigramIndex.from_index(index)
+    return _spelling_index
+
+
+def correct_ingredients(ingredients: List[str]) -> List[str]:
+    """
+    Fix typos in ingredient names using the ingredient vocabulary.
+    EX: ["brocoli", "chiken"] -> ["broccoli", "chicken"]
+    
+    Words that already match a recipe ingredient are left unchanged.
+    
+    Args:
+        ingredients: Ingredient names as extracted from the user's message
+    
+    Returns:
+        The ingredients with misspelled words replaced, in the same order
+    """
+    if not ingredients:
+        return []
+    
+    _check_db_changed()
+    spelling = get_spelling_index()
+    return [spelling.correct(ingredient) for ingredient in ingredients]
+
+
+def get_ingredient_matrix() -> IngredientMatrix:
+    """
+    Return the shared sparse ingredient matrix, building it on first use.
+    
+    Built from the inverted index, so it never scans the table again.
+    """
+    global _ingredient_matrix
+    
+    if _ingredient_matrix is None:
+        index = get_ingredient_index()
+        with _ingredient_matrix_lock:
+            if _ingredient_matrix is None:
+                _ingredient_matrix = IngredientMatrix.from_index(index)
+    return _ingredient_matrix
+
+
+def get_diet_recipe_ids(diet: str) -> Set[int]:
+    """
+    Return the ids of recipes classified as fitting a diet.
+    
+    Loaded once per process from the index snapshot's diet flags, or else
+    from the precomputed is_<diet> column.
+    """
+    if diet not in _diet_recipe_ids:
+        with _diet_recipe_ids_lock:
+            snapshot = _current_snapshot()
+            recipe_ids = snapshot.diet_recipe_ids(diet) if snapshot is not None else None
+            if recipe_ids is not None and diet not in _diet_recipe_ids:
+                _diet_recipe_ids[diet] = recipe_ids
+            if diet not in _diet_recipe_ids:
+                conn = get_db_connection()
+                try:
+                    rows = conn.execute(f"SELECT id FROM recipes WHERE {diet_column(diet)} = 1")
+                    _diet_recipe_ids[diet] = {row[0] for row in rows}
+                finally:
+                    release_db_connection(conn)
+    return _diet_recipe_ids[diet]
+
+
+def load_diet_filters() -> List[str]:
+    """
+    Load the recipe id sets of every diet that has precomputed flags.
+    
+    Returns:
+        The diets loaded (empty if diets.py hasn't been run)
+    """
+    conn = get_db_connection()
+    try:
+        diets = [diet for diet in DIET_RULES if has_diet_columns(conn, [diet])]
+    finally:
+        release_db_connection(conn)
+    
+    for diet in diets:
+        get_diet_recipe_ids(diet)
+    return diets
+
+
+def _diet_clause(diets: List[str], table: str = "") -> str:
+    """SQL predicate that keeps only recipes fitting every diet (empty if no diets)."""
+    prefix = f"{table}." if table else ""
+    return "".join(f" AND {prefix}{diet_column(diet)} = 1" for diet in diets)
 
 
 def search_recipes_by_ingredients(
     ingredients: List[str], 
-    max_results: int = 20  # Increased from 5 to 20 for better filtering
+    max_results: int = 20,  # Increased from 5 to 20 for better filtering
+    engine: str = SEARCH_ENGINE,
+    diet_restrictions: Optional[List[str]] = None,
+    use_cache: bool = True,
+    ranking: str = RANKING
 ) -> List[Dict]:
     """
     Search for recipes that match the given ingredients.
     
+    Results are cached per (ingredient set, diets, max_results, engine,
+    ranking) until they expire or the database file changes.
+    
     Args:
         ingredients: List of ingredient names to search for
         max_results: Maximum number of recipes to return
+        engine: "index" to use the inverted ingredient index, "fts" to
+            query the FTS5 table ranked by bm25(), "matrix" to score with
+            the sparse ingredient matrix, "normalized" to match canonical
+            ingredient ids, "like" to scan the recipes table with LIKE
+        diet_restrictions: Only return recipes fitting these diets. Uses the
+            precomputed is_<diet> columns (see diets.py) when they exist
+        use_cache: Set to False to always run the search
+        ranking: "count" to rank by number of matching ingredients, "idf"
+            to rank by BM25-weighted matches times ingredient coverage.
+            "idf" is scored over the inverted index whatever the engine.
     
     Returns:
-        List of matching recipe dictionaries
+        List of matching recipes, best matches first. Each has id, title,
+        ingredients_preview and match_count (plus score with ranking="idf");
+        use get_recipe_by_id() for the full ingredients and instructions.
     """
     if not ingredients:
         return []
+    if ranking not in RANKING_MODES:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    if ranking == "idf":
+        engine = "index"
+    
+    _check_db_changed()
+    diets = resolve_diets(diet_restrictions or [])
+    
+    if use_cache:
+        key = _search_cache_key(ingredients, max_results, engine, diets, ranking)
+        cached = _search_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    results = _search_uncached(ingredients, max_results, engine, diets, diet_restrictions, ranking)
+    
+    if use_cache:
+        _search_cache.put(key, results)
+    return results
+
+
+def _search_uncached(
+    ingredients: List[str],
+    max_results: int,
+    engine: str,
+    diets: List[str],
+    diet_restrictions: Optional[List[str]],
+    ranking: str = "count"
+) -> List[Dict]:
+    """Run a search with diet filtering pushed into the engine when possible."""
+    if diets:
+        conn = get_db_connection()
+        try:
+            diets_precomputed = has_diet_columns(conn, diets)
+        finally:
+            release_db_connection(conn)
+        
+        if not diets_precomputed:
+            # Old behaviour: over-fetch and filter the full recipe text in Python
+            _warn_once("Diet columns not found (run diets.py); filtering results in Python")
+            results = _run_search(engine, ingredients, max_results * 3, [], ranking)
+            full_recipes = get_recipes_by_ids([result['id'] for result in results])
+            with stage("filter_by_diet"):
+                kept = {recipe['id'] for recipe in filter_by_diet(full_recipes, diet_restrictions)}
+            DIET_FILTERED.inc(len(full_recipes) - len(kept), engine=engine)
+            return [result for result in results if result['id'] in kept][:max_results]
+    
+    return _run_search(engine, ingredients, max_results, diets, ranking)
+
+
+def _run_search(
+    engine: str,
+    ingredients: List[str],
+    max_results: int,
+    diets: List[str],
+    ranking: str = "count"
+) -> List[Dict]:
+    """Dispatch a search to the selected engine."""
+    if ranking == "idf":
+        return _search_with_index_weighted(ingredients, max_results, diets)
+    if engine == "index":
+        return _search_with_index(ingredients, max_results, diets)
+    if engine == "fts":
+        return _search_with_fts(ingredients, max_results, diets)
+    if engine == "matrix":
+        return _search_batch_with_matrix([ingredients], max_results, diets)[0]
+    if engine == "normalized":
+        return _search_with_ingredient_ids(ingredients, max_results, diets)
+    if engine == "like":
+        return _search_with_like(ingredients, max_results, diets)
+    raise ValueError(f"Unknown search engine: {engine}")
+
+
+def _ingredients_preview(ingredients: str) -> str:
+    """First PREVIEW_LINES ingredient lines, which is all the result list shows."""
+    return '\n'.join(ingredients.split('\n')[:PREVIEW_LINES])
+
+
+def _lean_recipe(row, match_count: int) -> Dict:
+    """Search result row: enough for the result list, not the full recipe."""
+    return {
+        'id': row['id'],
+        'title': row['Title'],
+        'ingredients_preview': _ingredients_preview(row['Preview'] or ''),
+        'match_count': match_count
+    }
+
+
+def _like_score(ingredients: List[str], column: str = "Ingredients") -> Tuple[str, List[str]]:
+    """
+    SQL expression counting how many ingredients appear in a column, plus its parameters.
+    
+    One 0/1 term per ingredient; LIKE is already case-insensitive for ASCII.
+    Wildcards typed by the user are escaped so they match literally.
+    """
+    score_terms = []
+    params = []
+    
+    for ingredient in ingredients:
+        score_terms.append(f"({column} LIKE ? ESCAPE '\\')")
+        escaped = ingredient.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.append(f"%{escaped}%")
+    
+    return " + ".join(score_terms), params
+
+
+def _search_with_index(ingredients: List[str], max_results: int, diets: List[str]) -> List[Dict]:
+    """Find candidates and match counts from the inverted index, then load only the top rows."""
+    counts = get_ingredient_index().match_counts(ingredients)
+    candidates = counts.items()
+    SEARCH_CANDIDATES.inc(len(counts), engine="index")
+    
+    if diets:
+        with stage("filter_by_diet"):
+            for diet in diets:
+                allowed = get_diet_recipe_ids(diet)
+                candidates = [(recipe_id, count) for recipe_id, count in candidates if recipe_id in allowed]
+        DIET_FILTERED.inc(len(counts) - len(candidates), engine="index")
+    
+    # Highest match count first, lowest id breaks ties (the old table order)
+    top = heapq.nsmallest(max_results, candidates, key=lambda item: (-item[1], item[0]))
+    if not top:
+        return []
+    
+    rows = _load_result_rows([recipe_id for recipe_id, _ in top])
+    return [
+        _lean_recipe(rows[recipe_id], match_count)
+        for recipe_id, match_count in top
+        if recipe_id in rows
+    ]
+
+
+def _search_with_index_weighted(ingredients: List[str], max_results: int, diets: List[str]) -> List[Dict]:
+    """Rank index matches by BM25-weighted score, keeping only the top rows in a bounded heap."""
+    scores = get_ingredient_index().weighted_scores(ingredients)
+    candidates = scores.items()
+    SEARCH_CANDIDATES.inc(len(scores), engine="index")
+    
+    if diets:
+        with stage("filter_by_diet"):
+            for diet in diets:
+                allowed = get_diet_recipe_ids(diet)
+                candidates = [item for item in candidates if item[0] in allowed]
+        DIET_FILTERED.inc(len(scores) - len(candidates), engine="index")
+    
+    # Highest score first, then more matches, then lowest id
+    top = heapq.nsmallest(max_results, candidates, key=lambda item: (-item[1][0], -item[1][1], item[0]))
+    if not top:
+        return []
+    
+    rows = _load_result_rows([recipe_id for recipe_id, _ in top])
+    results = []
+    for recipe_id, (score, match_count) in top:
+        if recipe_id in rows:
+            recipe = _lean_recipe(rows[recipe_id], match_count)
+            recipe['score'] = round(score, 4)
+            results.append(recipe)
+    return results
+
+
+def _load_result_rows(recipe_ids: List[int]) -> Dict:
+    """Load the result list columns (id, Title, Preview) for ranked ids, keyed by id."""
+    snapshot = _current_snapshot()
+    if snapshot is not None and snapshot.meta["preview_chars"] >= PREVIEW_CHARS:
+        return snapshot.result_rows(recipe_ids)
     
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Build SQL query to search for recipes containing any of the ingredients
-        # Using LIKE for partial matching
-        conditions = []
-        params = []
-        
-        for ingredient in ingredients:
-            conditions.append("LOWER(Ingredients) LIKE ?")
-            params.append(f"%{ingredient.lower()}%")
-        
-        # Combine conditions with OR
-        where_clause = " OR ".join(conditions)
-        
-        query = f"""
-            SELECT id, Title, Ingredients, Instructions
-            FROM recipes
-            WHERE {where_clause}
-            LIMIT ?
-        """
-        params.append(max_results * 3)  # Get 3x more results to allow for filtering
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        rows = {}
+        for start in range(0, len(recipe_ids), RECIPE_ID_CHUNK_SIZE):
+            chunk = recipe_ids[start:start + RECIPE_ID_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"""
+                SELECT id, Title, substr(Ingredients, 1, ?) AS Preview
+                FROM recipes
+                WHERE id IN ({placeholders})
+            """, [PREVIEW_CHARS] + chunk)
+            rows.update((row['id'], row) for row in cursor.fetchall())
+        return rows
+    
+    finally:
+        release_db_connection(conn)
+
+
+def search_recipes_batch(
+    queries: List[List[str]],
+    max_results: int = 20,
+    diet_restrictions: Optional[List[str]] = None
+) -> List[List[Dict]]:
+    """
+    Score many ingredient queries at once with the sparse ingredient matrix.
+    
+    One sparse matrix product scores every query against every recipe, and
+    the result rows for all queries are loaded together, so offline
+    evaluation and cache warm-up avoid one search per query. Results are
+    not cached.
+    
+    Args:
+        queries: Ingredient lists, one per query
+        max_results: Maximum number of recipes per query
+        diet_restrictions: Only return recipes fitting these diets
+    
+    Returns:
+        One list of matching recipes per query, in the same format as
+        search_recipes_by_ingredients()
+    """
+    _check_db_changed()
+    diets = resolve_diets(diet_restrictions or [])
+    
+    if diets:
+        conn = get_db_connection()
+        try:
+            diets_precomputed = has_diet_columns(conn, diets)
+        finally:
+            release_db_connection(conn)
         
-        # Convert rows to dictionaries and calculate match scores
+        if not diets_precomputed:
+            return [
+                search_recipes_by_ingredients(ingredients, max_results, "matrix", diet_restrictions, use_cache=False)
+                for ingredients in queries
+            ]
+    
+    return _search_batch_with_matrix(queries, max_results, diets)
+
+
+def search_recipes_many(
+    queries: List[List[str]],
+    max_results: int = 20,
+    diet_restrictions: Optional[List[str]] = None,
+    engine: str = SEARCH_ENGINE,
+    ranking: str = RANKING
+) -> List[List[Dict]]:
+    """
+    Run several searches with the same diet filter, as one call.
+
+    Returns exactly what calling search_recipes_by_ingredients() for each
+    query would, but queries already in the search cache are answered from
+    it, repeated queries run once, and with the index or matrix engine the
+    rest are scored together by search_recipes_batch() (the matrix ranks
+    the same way: most matches, then lowest id). Other engines and
+    ranking="idf" run the remaining queries one by one. Results are cached.
+
+    Args:
+        queries: Ingredient lists, one per search
+        max_results: Maximum number of recipes per search
+        diet_restrictions: Only return recipes fitting these diets
+        engine: Search engine, see search_recipes_by_ingredients()
+        ranking: "count" or "idf", see search_recipes_by_ingredients()
+
+    Returns:
+        One list of matching recipes per query, in query order
+    """
+    if ranking not in RANKING_MODES:
+        raise ValueError(f"Unknown ranking: {ranking}")
+    if ranking == "idf":
+        engine = "index"
+
+    _check_db_changed()
+    diets = resolve_diets(diet_restrictions or [])
+
+    results: List[Optional[List[Dict]]] = [None] * len(queries)
+    # Cache key -> (ingredients, positions of the queries asking for it)
+    pending: Dict[Tuple, Tuple[List[str], List[int]]] = {}
+    for position, ingredients in enumerate(queries):
+        if not ingredients:
+            results[position] = []
+            continue
+        key = _search_cache_key(ingredients, max_results, engine, diets, ranking)
+        if key not in pending:
+            cached = _search_cache.get(key)
+            if cached is not None:
+                results[position] = cached
+                continue
+            pending[key] = (ingredients, [])
+        pending[key][1].append(position)
+
+    if pending:
+        misses = [ingredients for ingredients, _ in pending.values()]
+        if ranking == "count" and engine in ("index", "matrix") and len(misses) > 1:
+            found = search_recipes_batch(misses, max_results, diet_restrictions)
+        else:
+            found = [
+                _search_uncached(ingredients, max_results, engine, diets, diet_restrictions, ranking)
+                for ingredients in misses
+            ]
+
+        for (key, (_, positions)), recipes in zip(pending.items(), found):
+            _search_cache.put(key, recipes)
+            for position in positions:
+                results[position] = [dict(recipe) for recipe in recipes]
+
+    return results
+
+
+def _search_batch_with_matrix(queries: List[List[str]], max_results: int, diets: List[str]) -> List[List[Dict]]:
+    """Score queries with the sparse matrix (inverted index without numpy/scipy)."""
+    if not matrix_available():
+        _warn_once("numpy/scipy not installed; scoring the batch with the ingredient index")
+        return [_search_with_index(ingredients, max_results, diets) if ingredients else [] for ingredients in queries]
+    
+    matrix = get_ingredient_matrix()
+    mask = None
+    for diet in diets:
+        diet_mask = matrix.diet_mask(diet, get_diet_recipe_ids(diet))
+        mask = diet_mask if mask is None else mask & diet_mask
+    
+    tops = matrix.top_k_batch(queries, max_results, mask)
+    rows = _load_result_rows(list({recipe_id for top in tops for recipe_id, _ in top}))
+    
+    return [
+        [_lean_recipe(rows[recipe_id], match_count) for recipe_id, match_count in top if recipe_id in rows]
+        for top in tops
+    ]
+
+
+def _search_with_fts(ingredients: List[str], max_results: int, diets: List[str]) -> List[Dict]:
+    """Let SQLite's FTS5 table find and rank the top recipes with bm25()."""
+    match_query = build_match_query(ingredients)
+    if not match_query:
+        return []
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Check for the table while we hold the connection, but fall back only
+        # after releasing it so the fallback never waits on our own connection
+        fts_available = has_fts_index(conn)
         recipes = []
-        for row in rows:
-            recipe = {
-                'id': row['id'],
-                'title': row['Title'],
-                'ingredients': row['Ingredients'],
-                'instructions': row['Instructions']
-            }
+        
+        if fts_available:
+            # match_count is only evaluated for the top rows that get returned
+            score_expr, score_params = _like_score(ingredients, "r.Ingredients")
             
-            # Count how many search ingredients match
-            ingredients_lower = row['Ingredients'].lower()
-            matches = sum(1 for ing in ingredients if ing.lower() in ingredients_lower)
-            recipe['match_count'] = matches
+            # bm25() is lower-is-better, so ascending order puts the best match first
+            cursor.execute(f"""
+                SELECT r.id, r.Title, substr(r.Ingredients, 1, ?) AS Preview,
+                       {score_expr} AS match_count
+                FROM {FTS_TABLE}
+                JOIN recipes r ON r.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH ?{_diet_clause(diets, "r")}
+                ORDER BY bm25({FTS_TABLE}, ?, ?)
+                LIMIT ?
+            """, (PREVIEW_CHARS, *score_params, match_query, *BM25_WEIGHTS, max_results))
+            
+            recipes = [_lean_recipe(row, row['match_count']) for row in cursor.fetchall()]
+    
+    finally:
+        release_db_connection(conn)
+    
+    if not fts_available:
+        _warn_once(f"{FTS_TABLE} not found (run fts_index.py); falling back to the ingredient index")
+        return _search_with_index(ingredients, max_results, diets)
+    return recipes
+
+
+def _search_with_ingredient_ids(ingredients: List[str], max_results: int, diets: List[str]) -> List[Dict]:
+    """
+    Match canonical ingredient ids in recipe_ingredients (see preprocessing.py).
+    
+    Each user ingredient becomes the ids of the canonical ingredients it
+    refers to; the query counts, per recipe, how many of the user's
+    ingredients have at least one matching id.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        tables_available = has_ingredient_tables(conn)
+        recipes = []
+        
+        if tables_available:
+            vocabulary = get_ingredient_vocabulary(conn)
+            pairs = [
+                (group, ingredient_id)
+                for group, ingredient in enumerate(ingredients)
+                for ingredient_id in vocabulary.lookup(ingredient)
+            ]
             
-            recipes.append(recipe)
+            if pairs:
+                values = ", ".join("(?, ?)" for _ in pairs)
+                params = [value for pair in pairs for value in pair]
+                
+                cursor.execute(f"""
+                    WITH wanted(grp, ingredient_id) AS (VALUES {values})
+                    SELECT r.id, r.Title, substr(r.Ingredients, 1, ?) AS Preview, top.match_count
+                    FROM (
+                        SELECT ri.recipe_id, COUNT(DISTINCT wanted.grp) AS match_count
+                        FROM wanted
+                        JOIN recipe_ingredients ri ON ri.ingredient_id = wanted.ingredient_id
+                        GROUP BY ri.recipe_id
+                    ) top
+                    JOIN recipes r ON r.id = top.recipe_id
+                    WHERE 1 = 1{_diet_clause(diets, "r")}
+                    ORDER BY top.match_count DESC, r.id
+                    LIMIT ?
+                """, (*params, PREVIEW_CHARS, max_results))
+                
+                recipes = [_lean_recipe(row, row['match_count']) for row in cursor.fetchall()]
+    
+    finally:
+        release_db_connection(conn)
+    
+    if not tables_available:
+        _warn_once("recipe_ingredients not found (run preprocessing.py); falling back to the ingredient index")
+        return _search_with_index(ingredients, max_results, diets)
+    return recipes
+
+
+def _search_with_like(ingredients: List[str], max_results: int, diets: List[str]) -> List[Dict]:
+    """
+    Search by scanning the recipes table with LIKE (no index required).
+    
+    The match count is computed in SQL and the ranking happens in the query
+    (ORDER BY match_count DESC LIMIT k), so the result is the true top-k over
+    the whole table and only the winning rows are returned to Python.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        score_expr, params = _like_score(ingredients)
         
-        # Sort by match count (descending)
-        recipes.sort(key=lambda x: x['match_count'], reverse=True)
+        # Rank ids only in the inner query (it scans id + Ingredients), then
+        # join back to fetch the result list columns for the top max_results
+        query = f"""
+            SELECT r.id, r.Title, substr(r.Ingredients, 1, ?) AS Preview, top.match_count
+            FROM (
+                SELECT id, {score_expr} AS match_count
+                FROM recipes
+                WHERE match_count > 0{_diet_clause(diets)}
+                ORDER BY match_count DESC, id
+                LIMIT ?
+            ) AS top
+            JOIN recipes r ON r.id = top.id
+            ORDER BY top.match_count DESC, top.id
+        """
+        cursor.execute(query, [PREVIEW_CHARS] + params + [max_results])
         
-        return recipes[:max_results]  # Return only max_results after sorting
+        return [_lean_recipe(row, row['match_count']) for row in cursor.fetchall()]
     
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def filter_by_diet(recipes: List[Dict], diet_restrictions: List[str]) -> List[Dict]:
     """
     Filter recipes by diet restrictions.
     
+    Searches already filter by diet when given diet_restrictions; this is
+    for recipe lists that come from elsewhere.
+    
     Args:
         recipes: List of recipe dictionaries
         diet_restrictions: List of diet restriction strings
@@ -93,72 +1062,21 @@ def filter_by_diet(recipes: List[Dict], diet_restrictions: List[str]) -> List[Di
     Returns:
         Filtered list of recipes
     """
-    if not diet_restrictions:
+    diets = resolve_diets(diet_restrictions or [])
+    if not diets:
         return recipes
     
     filtered = []
     
-    # Expanded meat keywords for vegetarian/vegan
-    meat_keywords = [
-        'chicken', 'beef', 'pork', 'lamb', 'turkey', 'duck', 'goose',
-        'meat', 'bacon', 'sausage', 'ham', 'prosciutto', 'salami',
-        'fish', 'salmon', 'tuna', 'cod', 'shrimp', 'crab', 'lobster',
-        'anchovy', 'sardine', 'trout', 'tilapia', 'halibut',
-        'steak', 'ribs', 'chop', 'cutlet', 'ground beef', 'ground pork',
-        'pepperoni', 'chorizo', 'veal', 'venison', 'bison'
-    ]
-    
-    # Animal products for vegan
-    animal_keywords = [
-        'milk', 'cheese', 'butter', 'egg', 'cream', 'yogurt', 'honey',
-        'whey', 'casein', 'lactose', 'ghee', 'buttermilk', 'sour cream',
-        'mayonnaise', 'mayo', 'gelatin', 'lard'
-    ]
-    
-    # High carb foods for keto
-    high_carb = [
-        'bread', 'pasta', 'rice', 'potato', 'flour', 'sugar',
-        'noodle', 'tortilla', 'bagel', 'cereal', 'oat', 'quinoa',
-        'corn', 'wheat', 'barley', 'couscous'
-    ]
-    
     for recipe in recipes:
         # Check ingredients, title, and instructions
-        recipe_text = (
-            recipe.get('ingredients', '') + ' ' + 
-            recipe.get('title', '') + ' ' +
+        fits = classify_text(recipe_text(
+            recipe.get('title', ''),
+            recipe.get('ingredients', ''),
             recipe.get('instructions', '')
-        ).lower()
-        
-        is_valid = True
-        
-        for diet in diet_restrictions:
-            diet_lower = diet.lower().replace('_', ' ')
-            
-            # Check for vegetarian (no meat)
-            if 'vegetarian' in diet_lower:
-                if any(meat in recipe_text for meat in meat_keywords):
-                    is_valid = False
-                    break
-            
-            # Check for vegan (no meat AND no animal products)
-            if 'vegan' in diet_lower:
-                # Check for meat
-                if any(meat in recipe_text for meat in meat_keywords):
-                    is_valid = False
-                    break
-                # Check for animal products
-                if any(animal in recipe_text for animal in animal_keywords):
-                    is_valid = False
-                    break
-            
-            # Check for keto/low carb (ONLY apply this if keto/low carb is specified)
-            if 'keto' in diet_lower or 'low_carb' in diet_lower or 'low carb' in diet_lower:
-                if any(carb in recipe_text for carb in high_carb):
-                    is_valid = False
-                    break
+        ))
         
-        if is_valid:
+        if all(fits[diet] for diet in diets):
             filtered.append(recipe)
     
     return filtered
@@ -174,29 +1092,56 @@ def get_recipe_by_id(recipe_id: int) -> Optional[Dict]:
     Returns:
         Recipe dictionary or None if not found
     """
+    recipes = get_recipes_by_ids([recipe_id])
+    return recipes[0] if recipes else None
+
+
+def get_recipes_by_ids(recipe_ids: List[int], columns: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Get many recipes with one query per RECIPE_ID_CHUNK_SIZE ids.
+    
+    Args:
+        recipe_ids: Recipe database IDs
+        columns: Recipe keys to load (any of 'title', 'ingredients',
+            'instructions'); 'id' is always included. Default: all
+    
+    Returns:
+        Recipe dictionaries in the order the ids were given. Ids that are
+        not found are skipped.
+    """
+    columns = list(RECIPE_COLUMNS) if columns is None else columns
+    unknown = [column for column in columns if column != 'id' and column not in RECIPE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown recipe columns: {', '.join(unknown)}")
+    
+    keys = ['id'] + [column for column in RECIPE_COLUMNS if column in columns]
+    select = ", ".join(['id'] + [RECIPE_COLUMNS[key] for key in keys[1:]])
+    
+    unique_ids = list(dict.fromkeys(recipe_ids))
+    if not unique_ids:
+        return []
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            SELECT id, Title, Ingredients, Instructions
-            FROM recipes
-            WHERE id = ?
-        """, (recipe_id,))
-        
-        row = cursor.fetchone()
+        found = {}
+        for start in range(0, len(unique_ids), RECIPE_ID_CHUNK_SIZE):
+            chunk = unique_ids[start:start + RECIPE_ID_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"""
+                SELECT {select}
+                FROM recipes
+                WHERE id IN ({placeholders})
+            """, chunk)
+            
+            for row in cursor.fetchall():
+                found[row[0]] = dict(zip(keys, row))
         
-        if row:
-            return {
-                'id': row['id'],
-                'title': row['Title'],
-                'ingredients': row['Ingredients'],
-                'instructions': row['Instructions']
-            }
-        return None
+        return [dict(found[recipe_id]) for recipe_id in recipe_ids if recipe_id in found]
     
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 def format_recipe_response(recipes: List[Dict], searched_ingredients: List[str]) -> str:
@@ -225,9 +1170,9 @@ def format_recipe_response(recipes: List[Dict], searched_ingredients: List[str])
         title = recipe.get('title', 'Unknown Recipe')
         match_count = recipe.get('match_count', 0)
         
-        # Get first few ingredients for preview
-        ingredients = recipe.get('ingredients', '')
-        ingredients_list = ingredients.split('\n')[:3]  # Show first 3 ingredients
+        # Get first few ingredients for preview (search results only carry a preview)
+        ingredients = recipe.get('ingredients_preview') or recipe.get('ingredients', '')
+        ingredients_list = ingredients.split('\n')[:PREVIEW_LINES]  # Show first 3 ingredients
         ingredients_preview = ', '.join([ing.strip() for ing in ingredients_list if ing.strip()])
         
         response_lines.append(
@@ -291,4 +1236,4 @@ def get_recipe_count() -> int:
         count = cursor.fetchone()[0]
         return count
     finally:
-        conn.close()
\ No newline at end of file
+        release_db_connection(conn)
\ No newline at end of file
@@ -0,0 +1,368 @@
+"""
+Per-user chat session storage.
+
+Each session holds the user's diet restrictions and the recipe ids from
+their last search. Two backends implement the same interface:
+
+- MemorySessionBackend: in-process, evicts least-recently-used sessions
+  when they sit idle too long, when there are too many, or when their
+  estimated memory use goes over the cap.
+- SQLiteSessionBackend: a shared SQLite file in WAL mode, so several
+  worker processes see the same sessions.
+
+Pick one with create_session_backend() / CHEFBOT_SESSION_BACKEND.
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# Session ids sent by clients must look like this (uuid4 hex and similar)
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+# Session ids per IN (...) query; older SQLite allows 999 parameters
+ID_CHUNK_SIZE = 500
+
+
+def new_session_id() -> str:
+    """Generate a random session id."""
+    return uuid.uuid4().hex
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """Check that a client-supplied session id is safe to use as a key."""
+    return bool(session_id) and SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def empty_session() -> Dict:
+    """State of a session that has not sent anything yet."""
+    return {
+        'diet_restrictions': [],
+        'last_intent': None,
+        'last_result_ids': []  # Recipe ids from the last search, in display order
+    }
+
+
+def _copy_session(session: Dict) -> Dict:
+    """Copy a session deep enough that callers can't change the stored lists."""
+    return {key: list(value) if isinstance(value, list) else value for key, value in session.items()}
+
+
+def estimate_session_size(session: Dict) -> int:
+    """Rough number of bytes a session keeps alive."""
+    size = sys.getsizeof(session)
+    for key, value in session.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class SessionBackend(ABC):
+    """
+    Interface every session backend implements.
+
+    get() hands out a copy and save() writes the whole session back, so a
+    request reads its session once and writes it once. get_many() and
+    save_many() do the same for a batch of sessions in one round trip.
+    """
+
+    def get(self, session_id: str) -> Dict:
+        """Return a copy of the session, or a fresh one if it doesn't exist."""
+        return self.get_many([session_id])[session_id]
+
+    def save(self, session_id: str, session: Dict) -> None:
+        """Store a session."""
+        self.save_many({session_id: session})
+
+    @abstractmethod
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Return copies of several sessions, keyed by id."""
+
+    @abstractmethod
+    def save_many(self, sessions: Dict[str, Dict]) -> None:
+        """Store several sessions at once."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Forget a session."""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Backend name plus session counts and counters."""
+
+
+class MemorySessionBackend(SessionBackend):
+    """
+    Thread-safe in-memory session store with LRU and idle-timeout eviction.
+
+    Only visible to the process that owns it.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_sessions: Most sessions kept at once
+            idle_timeout: Seconds without a request before a session is dropped
+            max_bytes: Cap on the estimated memory used by all sessions
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+
+        # session id -> (last access time, session, estimated size); oldest access first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "expired": 0, "evicted": 0}
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Dict]:
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            self._expire_idle(now)
+            for session_id in session_ids:
+                entry = self._sessions.get(session_id)
+                if entry is None:
+                    result[session_id] = empty_session()
+                    continue
+
+                _, session, size = entry
+                self._sessions[session_id] = (now, session, size)
+                self._sessions.move_to_end(session_id)
+                result[session_id] = _copy_session(session)
+        return result
+
+    def save_many(self, sessions: Dict[str, Dict]) -> None:
+        """Store sessions, evicting others if the store is over its limits."""
+        now = time.monotonic()
+        with self._lock:
+            for session_id, session in sessions.items():
+                session = _copy_session(session)
+                size = estimate_session_size(session)
+
+                old = self._sessions.pop(session_id, None)
+                if old is None:
+                    self._stats["created"] += 1
+                else:
+                    self._total_bytes -= old[2]
+
+                self._sessions[session_id] = (now, session, size)
+                self._total_bytes += size
+
+            self._expire_idle(now)
+            while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+            ):
+                self._pop_oldest()
+                self._stats["evicted"] += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["backend"] = "memory"
+            stats["sessions"] = len(self._sessions)
+            stats["bytes"] = self._total_bytes
+        stats["max_sessions"] = self.max_sessions
+        stats["max_bytes"] = self.max_bytes
+        stats["idle_timeout"] = self.idle_timeout
+        return stats
+
+    def _pop_oldest(self) -> None:
+        _, (_, _, size) = self._sessions.popitem(last=False)
+        self._total_bytes -= size
+
+    def _expire_idle(self, now: float) -> None:
+        # Entries are ordered by last access, so expired ones are all at the front
+        while self._sessions:
+            last_access = next(iter(self._sessions.values()))[0]
+            if now - last_access <= self.idle_timeout:
+                break
+            self._pop_oldest()
+            self._stats["expired"] += 1
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sessions in a shared SQLite file (WAL mode), for running several workers.
+
+    Each session is one JSON row. Every thread gets its own connection.
+    Idle and excess sessions are pruned at most every `prune_interval`
+    seconds instead of on every write, so between clean-ups the store can
+    go over its limits by what was written since the last one.
+    """
+
+    def __init__(self, db_path: str, max_sessions: int = 100000, idle_timeout: float = 3600,
+                 prune_interval: float = 60, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            db_path: Session database file (created if missing)
+            max_sessions: Most sessions kept; the least recently saved go first
+            idle_timeout: Seconds without a request before a session is dropped
+            prune_interval: Seconds between clean-ups of idle/excess sessions
+            max_bytes: Cap on the stored session JSON; the least recently
+                saved sessions go first
+        """
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.prune_interval = prune_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._stats = {"expired": 0, "evicted": 0}
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous = NORMAL")  # safe with WAL, avoids an fsync per commit
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Dict]:
+        session_ids = list(dict.fromkeys(session_ids))
+        result = {session_id: empty_session() for session_id in session_ids}
+        if not session_ids:
+            return result
+
+        oldest_allowed = time.time() - self.idle_timeout
+        conn = self._connection()
+        for start in range(0, len(session_ids), ID_CHUNK_SIZE):
+            chunk = session_ids[start:start + ID_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = conn.execute(f"""
+                SELECT session_id, data FROM sessions
+                WHERE session_id IN ({placeholders}) AND last_access >= ?
+            """, chunk + [oldest_allowed])
+
+            for session_id, data in rows:
+                session = empty_session()
+                session.update(json.loads(data))
+                result[session_id] = session
+        return result
+
+    def save_many(self, sessions: Dict[str, Dict]) -> None:
+        if not sessions:
+            return
+
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (session_id, data, last_access) VALUES (?, ?, ?)",
+                [(session_id, json.dumps(session), now) for session_id, session in sessions.items()]
+            )
+        self._maybe_prune(now)
+
+    def delete(self, session_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        count = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = "sqlite"
+        stats["sessions"] = count
+        stats["max_sessions"] = self.max_sessions
+        stats["max_bytes"] = self.max_bytes
+        stats["idle_timeout"] = self.idle_timeout
+        return stats
+
+    def _maybe_prune(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+
+        conn = self._connection()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM sessions WHERE last_access < ?", (now - self.idle_timeout,)
+            ).rowcount
+            evicted = conn.execute("""
+                DELETE FROM sessions WHERE session_id IN (
+                    SELECT session_id FROM sessions
+                    ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_sessions,)).rowcount
+            total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(length(CAST(data AS BLOB))), 0) FROM sessions"
+            ).fetchone()[0]
+            if total_bytes > self.max_bytes:
+                # Keep the most recently saved sessions that fit in max_bytes
+                evicted += conn.execute("""
+                    DELETE FROM sessions WHERE session_id IN (
+                        SELECT session_id FROM (
+                            SELECT session_id, SUM(length(CAST(data AS BLOB))) OVER (
+                                ORDER BY last_access DESC, session_id ROWS UNBOUNDED PRECEDING
+                            ) AS kept_bytes
+                            FROM sessions
+                        ) WHERE kept_bytes > ?
+                    )
+                """, (self.max_bytes,)).rowcount
+
+        with self._lock:
+            self._stats["expired"] += expired
+            self._stats["evicted"] += evicted
+
+
+def create_session_backend() -> SessionBackend:
+    """
+    Build the session backend selected by environment variables.
+
+    CHEFBOT_SESSION_BACKEND: "memory" (default) or "sqlite"
+    CHEFBOT_SESSION_DB: session database file for the sqlite backend
+    CHEFBOT_MAX_SESSIONS, CHEFBOT_SESSION_IDLE_TIMEOUT: limits for both
+    CHEFBOT_SESSION_MAX_BYTES: size cap for both (estimated memory for
+        "memory", stored JSON for "sqlite"; defaults 64 MB and 256 MB)
+    """
+    backend = os.environ.get('CHEFBOT_SESSION_BACKEND', 'memory')
+    max_sessions = int(os.environ.get('CHEFBOT_MAX_SESSIONS', '10000'))
+    idle_timeout = float(os.environ.get('CHEFBOT_SESSION_IDLE_TIMEOUT', '3600'))
+
+    if backend == 'memory':
+        return MemorySessionBackend(
+            max_sessions=max_sessions,
+            idle_timeout=idle_timeout,
+            max_bytes=int(os.environ.get('CHEFBOT_SESSION_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+    if backend == 'sqlite':
+        default_path = os.path.join(os.path.dirname(__file__), 'data', 'sessions.db')
+        return SQLiteSessionBackend(
+            os.environ.get('CHEFBOT_SESSION_DB', default_path),
+            max_sessions=max_sessions,
+            idle_timeout=idle_timeout,
+            max_bytes=int(os.environ.get('CHEFBOT_SESSION_MAX_BYTES', str(256 * 1024 * 1024)))
+        )
+    raise ValueError(f"Unknown session backend: {backend}")
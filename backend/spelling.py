@@ -0,0 +1,158 @@
+"""
+Typo-tolerant ingredient lookup.
+
+Users type "brocoli", "tomatos" or "chiken", which match nothing in the
+ingredient index. A trigram index over the index vocabulary finds the few
+words that share letter triples with the typo, and only those are compared
+by edit distance, so correcting a word never scans the whole vocabulary.
+"""
+import heapq
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from ingredient_index import IngredientIndex, TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Vocabulary words found in fewer recipes than this are never suggested
+# (they are mostly typos in the recipe data itself)
+MIN_DOC_FREQ = 2
+
+# Words shorter than this are left alone; too many short words are one edit apart
+MIN_WORD_LENGTH = 4
+
+# Candidates (by shared trigrams) compared by edit distance per word
+MAX_CANDIDATES = 20
+
+
+def trigrams(word: str) -> List[str]:
+    """
+    Letter triples of a word, padded so the start and end count too.
+    EX: "rice" -> ["$$r", "$ri", "ric", "ice", "ce$"]
+    """
+    padded = f"$${word}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def max_edits(word: str) -> int:
+    """Edit distance allowed for a word: 1 for short words, 2 otherwise."""
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance between a and b (insert, delete, replace, or swap two
+    neighbouring letters: "onoin" -> "onion" is one edit), giving up once
+    it exceeds limit.
+
+    Returns:
+        The distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TrigramIndex:
+    """
+    Trigram -> word index over the ingredient vocabulary.
+
+    correct() keeps words that already match the ingredient index (also as
+    a prefix, like "tomato" for "tomatoes") and replaces unknown words with
+    the closest vocabulary word within max_edits(); ties go to the word
+    found in more recipes.
+    """
+
+    def __init__(self, doc_freqs: Dict[str, int]):
+        """
+        Args:
+            doc_freqs: Vocabulary word -> number of recipes containing it
+        """
+        self.vocabulary = sorted(doc_freqs)
+        self.doc_freqs = doc_freqs
+        # Suggestion candidates: frequent enough words, by position in self.words
+        self.words = [
+            word for word in self.vocabulary
+            if len(word) >= MIN_WORD_LENGTH - 1 and doc_freqs[word] >= MIN_DOC_FREQ
+        ]
+        self.postings: Dict[str, List[int]] = {}
+        for position, word in enumerate(self.words):
+            for trigram in set(trigrams(word)):
+                self.postings.setdefault(trigram, []).append(position)
+
+    @classmethod
+    def from_index(cls, index: IngredientIndex) -> "TrigramIndex":
+        """Build from the vocabulary and posting sizes of an ingredient index."""
+        start = time.perf_counter()
+        spelling = cls(index.doc_freqs())
+        logger.info(
+            f"Built trigram index over {len(spelling.words)} words "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return spelling
+
+    def is_known(self, word: str) -> bool:
+        """Check whether a word is a vocabulary word or a prefix of one."""
+        position = bisect_left(self.vocabulary, word)
+        return position < len(self.vocabulary) and self.vocabulary[position].startswith(word)
+
+    def suggest(self, word: str) -> Optional[str]:
+        """
+        Closest frequent vocabulary word to a misspelled word.
+        EX: "brocoli" -> "broccoli"
+
+        Returns:
+            The suggestion, or None if nothing is within max_edits(word)
+        """
+        limit = max_edits(word)
+        shared: Dict[int, int] = {}
+        for trigram in set(trigrams(word)):
+            for position in self.postings.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+
+        # Only the words sharing the most trigrams can be a few edits away
+        candidates = heapq.nlargest(MAX_CANDIDATES, shared, key=shared.get)
+
+        best = None
+        best_key = None
+        for position in candidates:
+            candidate = self.words[position]
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            key = (distance, -self.doc_freqs[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def correct(self, ingredient: str) -> str:
+        """
+        Fix misspelled words in an ingredient, keeping everything else.
+        EX: "chiken brest" -> "chicken breast"
+        """
+        def fix(match) -> str:
+            word = match.group(0)
+            if len(word) < MIN_WORD_LENGTH or self.is_known(word):
+                return word
+            return self.suggest(word) or word
+
+        return TOKEN_PATTERN.sub(fix, ingredient.lower())
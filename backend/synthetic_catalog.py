@@ -0,0 +1,273 @@
+"""
+Synthetic recipe catalog for scale testing.
+
+Writes a recipes table with the same columns as the real catalog
+(id, Title, Ingredients, Instructions) at any size, with statistics
+taken from an existing database:
+
+    ingredients      drawn in proportion to how many source recipes use
+                     them, so common ones stay common and the long tail
+                     stays long
+    ingredient lines real source lines for the drawn ingredient
+                     ("2 cups chopped tomatoes"), so quantities, units and
+                     preparation words look like the real data
+    list lengths     drawn from the source's ingredients-per-recipe counts
+    titles           main ingredients + a dish word from the source titles
+    instructions     templated steps over the recipe's ingredients
+
+A real catalog's vocabulary keeps growing with its size; --novel-rate
+puts a modifier from the source ("smoked", "red", ...) in front of that
+fraction of ingredients, so large catalogs get a bigger vocabulary too.
+
+Everything runs offline and is reproducible with --seed. Point the app at
+the result with CHEFBOT_DB_PATH, and build the derived tables as usual
+(diets.py, fts_index.py, preprocessing.py, index_snapshot.py with --db).
+
+Usage:
+    python synthetic_catalog.py --recipes 100000 --out data/100k-recipes.db
+    python synthetic_catalog.py --recipes 1000000 --out /tmp/1m.db --seed 7
+    python synthetic_catalog.py --source other.db --recipes 50000 --out 50k.db
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+from preprocessing import canonical_ingredient, ensure_ingredient_list
+
+# Recipes written per transaction
+BATCH_SIZE = 10000
+
+# Source lines kept per ingredient to pick ingredient text from
+LINES_PER_INGREDIENT = 8
+
+# Most ingredients a generated recipe can have
+MAX_INGREDIENTS = 30
+
+RECIPES_SCHEMA = "CREATE TABLE recipes (id INTEGER PRIMARY KEY, Title TEXT, Ingredients TEXT, Instructions TEXT)"
+
+# Steps the instructions are built from; {a}/{b} are ingredient names
+STEP_TEMPLATES = [
+    "Preheat the oven to {temp} degrees",
+    "Combine the {a} and {b} in a large bowl",
+    "Heat the {a} in a large skillet over medium heat",
+    "Add the {a} and cook for {minutes} minutes, stirring occasionally",
+    "Stir in the {a} and {b}",
+    "Simmer until the {a} is tender, about {minutes} minutes",
+    "Transfer to a baking dish and bake for {minutes} minutes",
+    "Season with the {a} and serve warm",
+    "Let cool for {minutes} minutes before serving",
+]
+
+_word_re = re.compile(r"[A-Za-z]+")
+
+
+class CatalogProfile:
+    """Ingredient, length and title statistics of a source catalog."""
+
+    def __init__(self):
+        self.ingredient_counts: Counter = Counter()
+        self.lines: Dict[str, List[str]] = {}
+        self.list_lengths: List[int] = []
+        self.dish_words: Counter = Counter()
+        self.step_counts: List[int] = []
+        self.newline_instructions = 0
+        self.recipe_count = 0
+
+    @classmethod
+    def from_db(cls, conn) -> "CatalogProfile":
+        """Read every source recipe once and collect its statistics."""
+        profile = cls()
+        for title, ingredients, instructions in conn.execute("SELECT Title, Ingredients, Instructions FROM recipes"):
+            profile.add_recipe(title or "", ingredients or "", instructions or "")
+        if not profile.ingredient_counts:
+            raise ValueError("The source catalog has no ingredients to learn from")
+        return profile
+
+    def add_recipe(self, title: str, ingredients: str, instructions: str) -> None:
+        self.recipe_count += 1
+        items = ingredients.split("\n") if "\n" in ingredients else ensure_ingredient_list(ingredients)
+
+        names = set()
+        for line in items:
+            line = line.strip()
+            name = canonical_ingredient(line)
+            if not name or name in names:
+                continue
+            names.add(name)
+            self.ingredient_counts[name] += 1
+            samples = self.lines.setdefault(name, [])
+            if len(samples) < LINES_PER_INGREDIENT:
+                samples.append(line)
+        if names:
+            self.list_lengths.append(len(names))
+
+        words = _word_re.findall(title)
+        if words:
+            self.dish_words[words[-1].title()] += 1
+
+        if "\n" in instructions:
+            self.newline_instructions += 1
+            steps = [step for step in instructions.split("\n") if step.strip()]
+        else:
+            steps = [step for step in instructions.split(". ") if step.strip()]
+        if steps:
+            self.step_counts.append(len(steps))
+
+    def modifiers(self) -> List[str]:
+        """First words of multi-word ingredient names ("smoked", "red", "greek", ...)."""
+        return sorted({name.split()[0] for name in self.ingredient_counts if " " in name})
+
+
+class _WeightedSampler:
+    """Draws items in proportion to their weights (bisect over cumulative weights)."""
+
+    def __init__(self, weights: Dict[str, int]):
+        self.items = list(weights)
+        self.cumulative = []
+        total = 0
+        for item in self.items:
+            total += weights[item]
+            self.cumulative.append(total)
+        self.total = total
+
+    def draw(self, rng: random.Random) -> str:
+        return self.items[bisect_right(self.cumulative, rng.random() * self.total)]
+
+    def draw_distinct(self, rng: random.Random, k: int) -> List[str]:
+        """k different items (fewer if there aren't k), most likely first."""
+        k = min(k, len(self.items))
+        chosen: Dict[str, None] = {}
+        attempts = 0
+        while len(chosen) < k and attempts < k * 20:
+            chosen[self.draw(rng)] = None
+            attempts += 1
+        return list(chosen)
+
+
+def generate_recipes(profile: CatalogProfile, count: int, seed: int = 0,
+                     novel_rate: float = 0.0) -> Iterator[Tuple[int, str, str, str]]:
+    """
+    Yield `count` synthetic (id, Title, Ingredients, Instructions) rows.
+
+    Args:
+        profile: Statistics of the source catalog
+        count: Number of recipes
+        seed: Random seed (same seed + profile = same catalog)
+        novel_rate: Fraction of ingredients given a modifier (new names)
+    """
+    rng = random.Random(seed)
+    sampler = _WeightedSampler(profile.ingredient_counts)
+    dishes = _WeightedSampler(profile.dish_words) if profile.dish_words else None
+    modifiers = profile.modifiers()
+    newline_steps = profile.newline_instructions * 2 >= len(profile.step_counts)
+
+    for recipe_id in range(1, count + 1):
+        length = min(rng.choice(profile.list_lengths) if profile.list_lengths else 8, MAX_INGREDIENTS)
+        names = sampler.draw_distinct(rng, length)
+
+        lines = []
+        for name in names:
+            line = rng.choice(profile.lines[name])
+            if modifiers and rng.random() < novel_rate:
+                modifier = rng.choice(modifiers)
+                if modifier not in name.split():
+                    line = line.replace(name.split()[-1], f"{modifier} {name.split()[-1]}", 1)
+            lines.append(line)
+
+        main = [name.split()[-1].title() for name in names[:2]]
+        dish = dishes.draw(rng) if dishes else "Bake"
+        title = " ".join(main + ([dish] if dish not in main else []))
+
+        steps = []
+        step_count = rng.choice(profile.step_counts) if profile.step_counts else 5
+        for _ in range(max(1, min(step_count, 20))):
+            a, b = rng.sample(names, 2) if len(names) >= 2 else (names or ["mixture"]) * 2
+            steps.append(rng.choice(STEP_TEMPLATES).format(
+                a=a,
+                b=b,
+                temp=rng.choice((325, 350, 375, 400, 425)),
+                minutes=rng.randint(2, 45),
+            ))
+        instructions = "\n".join(step + "." for step in steps) if newline_steps else ". ".join(steps)
+
+        yield recipe_id, title, "\n".join(lines), instructions
+
+
+def write_catalog(path: str, rows: Iterator[Tuple[int, str, str, str]]) -> int:
+    """
+    Write rows into a new database's recipes table.
+
+    Returns:
+        Number of recipes written
+    """
+    conn = sqlite3.connect(path)
+    try:
+        # A throwaway file being built from scratch: skip the journal and fsyncs
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(RECIPES_SCHEMA)
+
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany("INSERT INTO recipes VALUES (?, ?, ?, ?)", batch)
+                conn.commit()
+                written += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO recipes VALUES (?, ?, ?, ?)", batch)
+            conn.commit()
+            written += len(batch)
+        return written
+    finally:
+        conn.close()
+
+
+def main():
+    # Imported here so the CLI follows the same default path as the app
+    from recommender import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic recipe catalog with realistic ingredient frequencies")
+    parser.add_argument("--source", default=DB_PATH, help="Database to take vocabulary and frequencies from")
+    parser.add_argument("--out", required=True, help="Database file to create")
+    parser.add_argument("--recipes", type=int, default=100000, help="Number of recipes to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--novel-rate", type=float, default=0.02, help="Fraction of ingredients given new names")
+    parser.add_argument("--force", action="store_true", help="Overwrite --out if it exists")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.out) == os.path.abspath(args.source):
+        parser.error("--out must be a different file than --source")
+    if os.path.exists(args.out):
+        if not args.force:
+            parser.error(f"{args.out} exists (use --force to overwrite)")
+        os.remove(args.out)
+
+    start = time.perf_counter()
+    source = sqlite3.connect(f"file:{args.source}?mode=ro", uri=True)
+    try:
+        profile = CatalogProfile.from_db(source)
+    finally:
+        source.close()
+    print(
+        f"Profiled {profile.recipe_count} source recipes: {len(profile.ingredient_counts)} ingredients "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+    start = time.perf_counter()
+    written = write_catalog(args.out, generate_recipes(profile, args.recipes, args.seed, args.novel_rate))
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(args.out) / (1024 * 1024)
+    print(f"Wrote {written} recipes to {args.out} ({size_mb:.1f} MB) in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
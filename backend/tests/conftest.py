@@ -0,0 +1,72 @@
+"""
+Shared fixtures: a small generated recipe database with every derived
+table (diet flags, canonical ingredients, FTS), and the recommender
+pointed at it with fresh caches.
+"""
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recommender  # noqa: E402
+from diets import classify_recipes  # noqa: E402
+from fts_index import build_fts_index  # noqa: E402
+from preprocessing import build_ingredient_tables  # noqa: E402
+
+# Single words that are neither prefixes nor substrings of each other, so
+# every engine's matching rules (prefix, substring, canonical id) agree
+INGREDIENTS = [
+    "chicken", "rice", "garlic", "onion", "tofu", "spinach", "salmon", "lemon",
+    "beef", "bacon", "cheese", "milk", "butter", "flour", "honey", "mushroom",
+]
+
+RECIPE_COUNT = 300
+
+
+def make_recipes(count: int = RECIPE_COUNT, seed: int = 7):
+    """(id, Title, Ingredients, Instructions) rows over INGREDIENTS."""
+    rng = random.Random(seed)
+    rows = []
+    for recipe_id in range(1, count + 1):
+        chosen = rng.sample(INGREDIENTS, rng.randint(2, 6))
+        ingredients = "\n".join(f"{rng.randint(1, 3)} cup {name}" for name in chosen)
+        title = " ".join(name.title() for name in chosen[:2]) + " Bake"
+        instructions = ". ".join(f"Add the {name}" for name in chosen)
+        rows.append((recipe_id, title, ingredients, instructions))
+    return rows
+
+
+def reset_recommender() -> None:
+    """Forget every cache, index and pool connection the recommender holds."""
+    recommender._reset_derived_data()
+    recommender._db_signature = None
+    recommender._catalog_version = None
+    if recommender._pool is not None:
+        recommender._pool.close()
+        recommender._pool = None
+
+
+@pytest.fixture
+def recipe_db(tmp_path, monkeypatch):
+    """Path of a fresh recipe database the recommender searches."""
+    path = str(tmp_path / "recipes.db")
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE recipes (id INTEGER PRIMARY KEY, Title TEXT, Ingredients TEXT, Instructions TEXT)")
+        conn.executemany("INSERT INTO recipes VALUES (?, ?, ?, ?)", make_recipes())
+        conn.commit()
+        classify_recipes(conn)
+        build_ingredient_tables(conn)
+        build_fts_index(conn)
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(recommender, "DB_PATH", path)
+    monkeypatch.setattr(recommender, "INDEX_SNAPSHOT_PATH", str(tmp_path / "index.snapshot"))
+    reset_recommender()
+    yield path
+    reset_recommender()
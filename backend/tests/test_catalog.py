@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+import recommender
+from catalog import ingest_recipes
+from index_snapshot import SnapshotIndex, write_snapshot
+from matrix_index import matrix_available
+from tests.conftest import RECIPE_COUNT
+
+ENGINES = ["index", "matrix", "normalized", "like", "fts"]
+
+SAFFRON_RICE = {
+    "title": "Saffron Rice",
+    "ingredients": "1 pinch saffron\n1 cup rice",
+    "instructions": "Steep the saffron. Cook the rice.",
+}
+# Id the database gives SAFFRON_RICE
+SAFFRON_RICE_ID = RECIPE_COUNT + 1
+
+
+def ingest(path, upserts=(), deletes=()):
+    """Change the catalog from another connection, as an ingest job would."""
+    conn = sqlite3.connect(path)
+    try:
+        return ingest_recipes(conn, upserts, deletes)
+    finally:
+        conn.close()
+
+
+def search_ids(ingredients, engine="index", use_cache=True):
+    results = recommender.search_recipes_by_ingredients(
+        ingredients, max_results=20, engine=engine, use_cache=use_cache
+    )
+    return [recipe["id"] for recipe in results]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ingest_reaches_running_process(recipe_db, engine):
+    if engine == "matrix" and not matrix_available():
+        pytest.skip("numpy/scipy not installed")
+    assert search_ids(["saffron"], engine) == []
+    tofu_ids = search_ids(["tofu"], engine)
+    assert tofu_ids
+
+    ingest(recipe_db, upserts=[SAFFRON_RICE], deletes=[tofu_ids[0]])
+
+    assert search_ids(["saffron"], engine) == [SAFFRON_RICE_ID]
+    assert tofu_ids[0] not in search_ids(["tofu"], engine)
+
+
+def test_ingest_update_changes_matches(recipe_db):
+    garlic_ids = search_ids(["garlic"])
+    recipe_id = garlic_ids[0]
+
+    ingest(recipe_db, upserts=[{"id": recipe_id, "ingredients": "1 pinch saffron"}])
+
+    assert search_ids(["saffron"]) == [recipe_id]
+    assert recipe_id not in search_ids(["garlic"])
+
+
+def test_ingest_refreshes_diet_flags(recipe_db):
+    vegan_ids = recommender.get_diet_recipe_ids("vegan")
+    assert search_ids(["saffron"]) == []
+
+    ingest(recipe_db, upserts=[SAFFRON_RICE])
+
+    # Changes are picked up by the next search
+    assert search_ids(["saffron"]) == [SAFFRON_RICE_ID]
+    assert SAFFRON_RICE_ID not in vegan_ids
+    assert SAFFRON_RICE_ID in recommender.get_diet_recipe_ids("vegan")
+
+
+def test_ingest_applies_on_top_of_snapshot(recipe_db):
+    conn = sqlite3.connect(recipe_db)
+    try:
+        write_snapshot(conn, recommender.INDEX_SNAPSHOT_PATH)
+    finally:
+        conn.close()
+    assert search_ids(["saffron"]) == []
+    assert isinstance(recommender.get_ingredient_index(), SnapshotIndex)
+
+    ingest(recipe_db, upserts=[SAFFRON_RICE])
+
+    assert search_ids(["saffron"]) == [SAFFRON_RICE_ID]
+    assert not isinstance(recommender.get_ingredient_index(), SnapshotIndex)
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+import chat_service
+from chat_service import handle_chat, handle_chat_batch
+from intents import determine_intent
+from session_store import MemorySessionBackend, new_session_id
+
+CONVERSATION = [
+    "hi",
+    "I want a vegan meal",
+    "I have tofu and rice",
+    "2",
+    "I have chicken, garlic and onion",
+    "1",
+    "clear diet",
+    "I want a keto meal with beef and spinach",
+    "3",
+]
+
+
+def interleaved_items(session_count: int = 8, seed: int = 3):
+    """Messages of several conversations, shuffled across sessions but in order within each."""
+    rng = random.Random(seed)
+    pending = {
+        new_session_id(): CONVERSATION[:rng.randint(3, len(CONVERSATION))]
+        for _ in range(session_count)
+    }
+    items = []
+    while pending:
+        session_id = rng.choice(sorted(pending))
+        items.append({"session_id": session_id, "message": pending[session_id].pop(0)})
+        if not pending[session_id]:
+            del pending[session_id]
+    return items
+
+
+def test_batch_matches_sequential_chat(recipe_db):
+    items = interleaved_items()
+    sequential_store = MemorySessionBackend()
+    expected = [
+        handle_chat(sequential_store, item["session_id"], determine_intent(item["message"]))
+        for item in items
+    ]
+
+    batch_store = MemorySessionBackend()
+    results = handle_chat_batch(batch_store, items)
+
+    assert [result["session_id"] for result in results] == [item["session_id"] for item in items]
+    assert not any(result["error"] for result in results)
+    assert [result["response"] for result in results] == expected
+    for session_id in {item["session_id"] for item in items}:
+        assert batch_store.get(session_id) == sequential_store.get(session_id)
+
+
+def test_batch_flags_empty_and_missing_sessions(recipe_db):
+    session_id = new_session_id()
+    results = handle_chat_batch(MemorySessionBackend(), [
+        {"session_id": session_id, "message": ""},
+        {"message": "hi"},
+        {"session_id": session_id, "message": "hi"},
+    ])
+
+    assert results[0]["error"] and results[0]["session_id"] == session_id
+    assert not results[1]["error"] and results[1]["session_id"] != session_id
+    assert not results[2]["error"] and results[2]["session_id"] == session_id
+
+
+def test_failed_search_group_only_fails_its_messages(recipe_db, monkeypatch):
+    search_recipes_many = chat_service.search_recipes_many
+
+    def failing_for_vegan(queries, max_results, diet_restrictions):
+        if "vegan" in diet_restrictions:
+            raise RuntimeError("vegan search failed")
+        return search_recipes_many(queries, max_results=max_results, diet_restrictions=diet_restrictions)
+
+    monkeypatch.setattr(chat_service, "search_recipes_many", failing_for_vegan)
+    vegan, other = new_session_id(), new_session_id()
+    store = MemorySessionBackend()
+    results = handle_chat_batch(store, [
+        {"session_id": vegan, "message": "I want a vegan meal"},
+        {"session_id": other, "message": "I have tofu and rice"},
+        {"session_id": vegan, "message": "I have tofu and rice"},
+        {"session_id": other, "message": "1"},
+    ])
+
+    assert [result["error"] for result in results] == [False, False, True, False]
+    assert results[2]["error_details"] == "vegan search failed"
+    # The diet set before the failure is still saved
+    assert store.get(vegan)["diet_restrictions"] == ["vegan"]
+    assert store.get(other)["last_result_ids"]
+
+
+def test_failed_message_does_not_stop_batch(recipe_db, monkeypatch):
+    def failing_on_boom(message):
+        if message == "boom":
+            raise ValueError("could not parse")
+        return determine_intent(message)
+
+    monkeypatch.setattr(chat_service, "determine_intent", failing_on_boom)
+    session_id = new_session_id()
+    results = handle_chat_batch(MemorySessionBackend(), [
+        {"session_id": session_id, "message": "boom"},
+        {"session_id": session_id, "message": "I have garlic and lemon"},
+    ])
+
+    assert results[0]["error"] and results[0]["intent_data"] is None
+    assert not results[1]["error"]
+
+
+def test_sessions_saved_when_reply_fails(recipe_db, monkeypatch):
+    def failing_respond(intent_data, session, search_results=None):
+        raise RuntimeError("reply failed")
+
+    monkeypatch.setattr(chat_service, "respond", failing_respond)
+    saved = []
+    store = MemorySessionBackend()
+    save_many = store.save_many
+    monkeypatch.setattr(store, "save_many", lambda sessions: saved.append(sorted(sessions)) or save_many(sessions))
+    session_id = new_session_id()
+
+    results = handle_chat_batch(store, [{"session_id": session_id, "message": "hi"}])
+
+    assert results[0]["error"]
+    assert saved == [[session_id]]
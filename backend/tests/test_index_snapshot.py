@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+import recommender
+from index_snapshot import SnapshotIndex, write_snapshot
+from ingredient_index import IngredientIndex
+
+QUERIES = [["chicken", "spinach"], ["tofu", "rice"], ["garlic", "onion", "lemon"]]
+
+
+@pytest.fixture
+def snapshot_path(recipe_db):
+    conn = sqlite3.connect(recipe_db)
+    try:
+        write_snapshot(conn, recommender.INDEX_SNAPSHOT_PATH)
+    finally:
+        conn.close()
+    return recommender.INDEX_SNAPSHOT_PATH
+
+
+def test_snapshot_matches_built_index(recipe_db, snapshot_path):
+    conn = sqlite3.connect(recipe_db)
+    try:
+        snapshot = SnapshotIndex(snapshot_path)
+        built = IngredientIndex.build(conn)
+        assert snapshot.matches(conn)
+    finally:
+        conn.close()
+
+    assert snapshot.recipe_count == built.recipe_count
+    assert list(snapshot.vocabulary) == built.vocabulary
+    assert snapshot.doc_freqs() == built.doc_freqs()
+    for ingredients in QUERIES:
+        assert snapshot.weighted_scores(ingredients) == pytest.approx(built.weighted_scores(ingredients))
+
+
+def test_searches_use_matching_snapshot(recipe_db, snapshot_path):
+    assert isinstance(recommender.get_ingredient_index(), SnapshotIndex)
+    for ingredients in QUERIES:
+        from_snapshot = recommender.search_recipes_by_ingredients(
+            ingredients, max_results=20, diet_restrictions=["vegetarian"], use_cache=False
+        )
+        assert from_snapshot
+        assert all(recipe["id"] in recommender.get_diet_recipe_ids("vegetarian") for recipe in from_snapshot)
+
+
+@pytest.mark.parametrize("statement, saffron_ids", [
+    ("UPDATE recipes SET Ingredients = '1 cup saffron' WHERE id = 5", {5}),
+    ("DELETE FROM recipes WHERE id = 5", set()),
+    ("INSERT INTO recipes (id, Title, Ingredients, Instructions) VALUES (301, 'Saffron Rice', '1 cup saffron', 'Stir')", {301}),
+])
+def test_snapshot_rejected_after_in_place_edit(recipe_db, snapshot_path, statement, saffron_ids):
+    conn = sqlite3.connect(recipe_db)
+    try:
+        # Edits that bypass ingest_recipes() leave the catalog version and,
+        # for updates, the recipe count and max id unchanged
+        conn.execute(statement)
+        conn.commit()
+        assert not SnapshotIndex(snapshot_path).matches(conn)
+    finally:
+        conn.close()
+
+    index = recommender.get_ingredient_index()
+    assert not isinstance(index, SnapshotIndex)
+    assert index.lookup("saffron") == saffron_ids
+    assert (5 in index.doc_lengths) != statement.startswith("DELETE")
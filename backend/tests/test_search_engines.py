@@ -0,0 +1,47 @@
+import pytest
+
+import recommender
+from matrix_index import matrix_available
+
+ENGINES = ["matrix", "normalized", "like"]
+
+QUERIES = [
+    ["chicken", "spinach"],
+    ["tofu", "rice"],
+    ["garlic", "onion", "lemon"],
+    ["beef", "bacon", "cheese", "flour"],
+]
+
+DIETS = [None, ["vegetarian"], ["vegan"], ["keto"], ["vegetarian", "keto"]]
+
+
+def search_ids(ingredients, engine, diet_restrictions):
+    results = recommender.search_recipes_by_ingredients(
+        ingredients, max_results=20, engine=engine,
+        diet_restrictions=diet_restrictions, use_cache=False
+    )
+    return [recipe["id"] for recipe in results]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("diet_restrictions", DIETS)
+@pytest.mark.parametrize("ingredients", QUERIES)
+def test_engines_return_same_ids_as_index(recipe_db, engine, ingredients, diet_restrictions):
+    if engine == "matrix" and not matrix_available():
+        pytest.skip("numpy/scipy not installed")
+    expected = search_ids(ingredients, "index", diet_restrictions)
+    assert expected
+    assert search_ids(ingredients, engine, diet_restrictions) == expected
+
+
+@pytest.mark.parametrize("diet_restrictions", DIETS[1:])
+def test_diet_results_fit_the_diet(recipe_db, diet_restrictions):
+    ids = search_ids(["chicken", "rice"], "index", diet_restrictions)
+    recipes = recommender.get_recipes_by_ids(ids)
+    assert recommender.filter_by_diet(recipes, diet_restrictions) == recipes
+
+
+def test_batch_search_matches_single_searches(recipe_db):
+    batch = recommender.search_recipes_many(QUERIES, max_results=20, diet_restrictions=["vegetarian"])
+    for ingredients, results in zip(QUERIES, batch):
+        assert [recipe["id"] for recipe in results] == search_ids(ingredients, "index", ["vegetarian"])
@@ -0,0 +1,133 @@
+"""
+Background warm-up.
+
+Runs the slow start-up work (loading the catalog, building indexes,
+filling caches) in a background thread so the server can accept
+connections right away, and keeps track of progress for the /ready
+endpoint.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# States in which /ready reports the app ready
+READY_STATES = ("ready", "skipped", "failed")
+
+
+class WarmUp:
+    """
+    Runs named steps one after another in a daemon thread.
+
+    Thread-safe status() reports which steps are done, which one is
+    running and how long each took. A failed step is logged and marks the
+    warm-up failed; the app still works, it just builds things lazily on
+    the first requests instead, so a failed warm-up still counts as ready
+    (with the error in status()). So does one skipped with skip().
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], object]]], started_at: Optional[float] = None):
+        """
+        Args:
+            steps: (name, function) pairs, run in order
+            started_at: time.perf_counter() value time-to-ready is measured
+                from (default: when start() is called)
+        """
+        self.steps = steps
+        self.started_at = started_at
+        self._lock = threading.Lock()
+        self._state = "pending"
+        self._current: Optional[str] = None
+        self._timings: Dict[str, float] = {}
+        self._error: Optional[str] = None
+        self._ready_after: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the warm-up thread (only the first call does anything)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.started_at is None:
+                self.started_at = time.perf_counter()
+            self._state = "running"
+            self._thread = threading.Thread(target=self._run, name="chefbot-warmup", daemon=True)
+        self._thread.start()
+
+    def skip(self) -> None:
+        """Don't warm up (everything is built on first use); counts as ready right away."""
+        with self._lock:
+            if self._thread is not None or self._state != "pending":
+                return
+            self._state = "skipped"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warm-up finished; returns whether it is ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_ready()
+
+    def is_ready(self) -> bool:
+        """Check whether the app can take traffic (warm-up finished, skipped or failed)."""
+        with self._lock:
+            return self._state in READY_STATES
+
+    def _run(self) -> None:
+        for name, step in self.steps:
+            with self._lock:
+                self._current = name
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Warm-up step '{name}' failed: {e}", exc_info=True)
+                with self._lock:
+                    self._state = "failed"
+                    self._current = None
+                    self._error = f"{name}: {e}"
+                    self._ready_after = time.perf_counter() - self.started_at
+                return
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"Warm-up step '{name}' done in {elapsed * 1000:.1f} ms")
+            with self._lock:
+                self._timings[name] = elapsed
+
+        ready_after = time.perf_counter() - self.started_at
+        with self._lock:
+            self._state = "ready"
+            self._current = None
+            self._ready_after = ready_after
+        logger.info(f"Ready {ready_after * 1000:.1f} ms after start")
+
+    def status(self) -> Dict:
+        """Progress of the warm-up, for the /ready endpoint."""
+        with self._lock:
+            steps = [
+                {
+                    "name": name,
+                    "status": (
+                        "done" if name in self._timings
+                        else "running" if name == self._current
+                        else "pending"
+                    ),
+                    "ms": round(self._timings[name] * 1000, 1) if name in self._timings else None
+                }
+                for name, _ in self.steps
+            ]
+            status = {
+                "ready": self._state in READY_STATES,
+                "state": self._state,
+                "completed_steps": len(self._timings),
+                "total_steps": len(self.steps),
+                "current_step": self._current,
+                "steps": steps,
+                "error": self._error,
+            }
+            if self._ready_after is not None:
+                status["ready_after_ms"] = round(self._ready_after * 1000, 1)
+            elif self.started_at is not None:
+                status["elapsed_ms"] = round((time.perf_counter() - self.started_at) * 1000, 1)
+        return status
@@ -3,7 +3,8 @@ import pandas as pd
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
 
-from recommender import search_recipes_by_ingredients, filter_by_diet # pyright: ignore[reportMissingImports]
+from recommender import search_recipes_by_ingredients, get_diet_recipe_ids, get_recipes_by_ids # pyright: ignore[reportMissingImports]
+from diets import resolve_diets # pyright: ignore[reportMissingImports]
 
 # ----------------------------
 # Helper function: simulate bot response
@@ -16,22 +17,22 @@ def get_response_from_recommender(query: str, max_results: int = 5, diet_restric
         max_results: max recipes to return
         diet_restrictions: optional list of dietary restrictions
     Returns:
-        List of recipe dictionaries
+        List of full recipe dictionaries
     """
     # Extract ingredients from query (split by commas)
     ingredients = [i.strip() for i in query.split(',') if i.strip()]
     if not ingredients:
         return []
 
-    # Get recipes
-    recipes = search_recipes_by_ingredients(ingredients, max_results=max_results*2)
-    
-    # Apply diet filter if specified
-    if diet_restrictions:
-        recipes = filter_by_diet(recipes, diet_restrictions)
+    # Get recipes (diet restrictions are applied inside the search)
+    results = search_recipes_by_ingredients(
+        ingredients,
+        max_results=max_results,
+        diet_restrictions=diet_restrictions
+    )
 
-    # Limit to max_results
-    return recipes[:max_results]
+    # Search results only carry a preview; load full recipes for scoring
+    return get_recipes_by_ids([result['id'] for result in results])
 
 # ----------------------------
 # Sample test queries
@@ -91,9 +92,14 @@ def evaluate_recommender(test_queries, max_results=5):
         # Coverage: at least one recipe returned
         coverage = int(len(recommended_recipes) > 0)
 
-        # Constraint satisfaction
+        # Constraint satisfaction, checked against the precomputed diet flags
+        # the search filters on (not re-filtered through the Python fallback)
         if diet_restrictions:
-            valid_recipes = filter_by_diet(recommended_recipes, diet_restrictions)
+            diets = resolve_diets(diet_restrictions)
+            valid_recipes = [
+                recipe for recipe in recommended_recipes
+                if all(recipe['id'] in get_diet_recipe_ids(diet) for diet in diets)
+            ]
             constraint_satisfaction = len(valid_recipes) / len(recommended_recipes) if recommended_recipes else 0
         else:
             constraint_satisfaction = None
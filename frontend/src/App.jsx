@@ -5,6 +5,8 @@ function App() {
   const [input, setInput] = useState('');
   const [messages, setMessages] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
+  // Session id issued by the backend; sent back so each tab keeps its own chat state
+  const [sessionId, setSessionId] = useState(null);
 
   // Dynamic backend URL detection - works in Codespaces and local
   const getBackendUrl = () => {
@@ -67,6 +69,7 @@ function App() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(sessionId ? { 'X-Session-Id': sessionId } : {}),
         },
         body: JSON.stringify({ message: userMessage.text }),
       });
@@ -76,6 +79,9 @@ function App() {
       }
 
       const data = await response.json();
+      if (data.session_id) {
+        setSessionId(data.session_id);
+      }
       
       // Check if there's an error in the response
       if (data.error) {